@@ -5,5 +5,8 @@ from .utility import get_summary, estimate_token_count, handle_tool_call
 from .developer import developer
 from .analyst import analyze_task
 from .qa_agent import qa_agent
+from .client import ClientManager, get_client, chat
+from .tokens import TokenCounter, ContextBudgetExceeded
+from .models import ModelPlan, ModelWarmer, model_plan
 
-__all__ = ['get_summary', 'estimate_token_count', 'handle_tool_call', 'developer', 'analyze_task', 'qa_agent'] 
\ No newline at end of file
+__all__ = ['get_summary', 'estimate_token_count', 'handle_tool_call', 'developer', 'analyze_task', 'qa_agent', 'ClientManager', 'get_client', 'chat', 'TokenCounter', 'ContextBudgetExceeded', 'ModelPlan', 'ModelWarmer', 'model_plan'] 
\ No newline at end of file
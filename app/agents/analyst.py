@@ -1,13 +1,17 @@
 """
 Analysis utilities for AI agents.
 """
-from typing import List, Dict, Tuple
-import ollama
+from typing import Callable, List, Dict, Optional, Tuple
 from ollama import ChatResponse
-from pydantic import BaseModel, Field, RootModel
+from pydantic import BaseModel, Field, RootModel, ValidationError
 from rich.console import Console
 from .prompts.backlog import BACKLOG_SYSTEM_PROMPT
 from .prompts.analyst import ANALYST_SYSTEM_PROMPT
+from .client import chat, closing_stream
+from .request_scheduler import Priority
+from .models import model_plan
+from .json_stream import JsonArrayStreamParser
+from ..telemetry import telemetry_tags
 
 
 
@@ -32,17 +36,29 @@ class Backlog(RootModel):
 
 
 # Define the Workflow model
-async def analyze_task(task: str, workflow_conversation: List[Dict]) -> Tuple[List[Dict], Backlog]:
+async def analyze_task(
+    task: str,
+    workflow_conversation: List[Dict],
+    on_task: Optional[Callable[[Task], None]] = None,
+    analysis: Optional[str] = None,
+    on_analysis: Optional[Callable[[str, List[Dict]], None]] = None,
+) -> Tuple[List[Dict], Backlog]:
     """Use R1 to analyze and plan the task.
-    
+
+    The backlog is streamed and parsed incrementally: each task is validated as soon as
+    its JSON object closes and passed to on_task, so execution can start while the rest
+    of the backlog is still being generated.
+
+    Args:
+        task: The user's request
+        workflow_conversation: Workflow conversation to extend
+        on_task: Called with each validated Task as it arrives
+        analysis: Build plan from an earlier run; skips the analyst call
+        on_analysis: Called with the build plan and the workflow conversation once the analysis is done
+
     Returns:
         Tuple[List[Dict], Backlog]: (Updated workflow conversation, Backlog of tasks)
     """
-    # Create a client for the Analysis task    
-    client = ollama.AsyncClient()
-
-    console.print("\n[yellow]Creating analysis client...[/yellow]")
-
     # Add the user prompt to the workflow conversation
     workflow_conversation.append({'role':'user', 'content':f"Break down this coding task into logical implementation steps: {task}"})
     
@@ -50,45 +66,70 @@ async def analyze_task(task: str, workflow_conversation: List[Dict]) -> Tuple[Li
     try:
         console.print("[yellow]Sending task to R1 for analysis...[/yellow]")
 
-        # Generate application build plan
-        analyst_response = ""
-        async for chunk in await client.chat(
-            model="phi4",
-            messages=[
-                {'role': 'system','content': ANALYST_SYSTEM_PROMPT},
-                {'role':'user', 'content':f"Break down this coding task into logical implementation steps: {task}"}
-            ],
-            stream=True,
-            options={'temperature': 0.3}
-        ):
-            analyst_response += chunk.message.content
-            print(f"{GREY}{chunk.message.content}{RESET}", end="", flush=True)
+        # Generate application build plan, unless an earlier run already did
+        analyst_response = analysis or ""
+        if analysis is None:
+            with telemetry_tags(agent="analyst"):
+                stream = await chat(
+                    model=model_plan.analyst,
+                    messages=[
+                        {'role': 'system','content': ANALYST_SYSTEM_PROMPT},
+                        {'role':'user', 'content':f"Break down this coding task into logical implementation steps: {task}"}
+                    ],
+                    stream=True,
+                    priority=Priority.ANALYST,
+                    options={'temperature': 0.3}
+                )
+                async with closing_stream(stream):
+                    async for chunk in stream:
+                        analyst_response += chunk.message.content
+                        print(f"{GREY}{chunk.message.content}{RESET}", end="", flush=True)
 
 
         # Add the assistant response to the workflow conversation
         workflow_conversation.append({'role':'assistant', 'content':analyst_response})
         console.print("\n[green]Analysis complete![/green]")
+        if on_analysis:
+            on_analysis(analyst_response, workflow_conversation)
 
         # Generate backlog
         console.print("\n[yellow]Generating task backlog...[/yellow]")
-        backlog_response = await client.chat(
-            model="qwen2.5-coder:14b-instruct-q4_K_M",
-            messages=[
-                {'role': 'system', 'content': BACKLOG_SYSTEM_PROMPT},
-                {'role': 'user', 'content': f'''
+        backlog_response = ""
+        parser = JsonArrayStreamParser()
+        with telemetry_tags(agent="backlog"):
+            stream = await chat(
+                model=model_plan.backlog,
+                messages=[
+                    {'role': 'system', 'content': BACKLOG_SYSTEM_PROMPT},
+                    {'role': 'user', 'content': f'''
                     Use this application build plan to generate all of the development tasks needed to build the application:
                     {analyst_response}
                     
                     Respond with JSON matching this schema: {Backlog.model_json_schema()}
                     Use exact field names and validate against dependencies
                 '''}
-            ],
-            format=Backlog.model_json_schema(),
-            options={'temperature': 0.3, 'top_k': 40, 'top_p': 0.2}
-        )
-        print(f"{GREY}{backlog_response.message.content}{RESET}", end="", flush=True)
-
-        validated_backlog = Backlog.model_validate_json(backlog_response.message.content)
+                ],
+                format=Backlog.model_json_schema(),
+                stream=True,
+                priority=Priority.BACKLOG,
+                options={'temperature': 0.3, 'top_k': 40, 'top_p': 0.2}
+            )
+            async with closing_stream(stream):
+                async for chunk in stream:
+                    backlog_response += chunk.message.content
+                    print(f"{GREY}{chunk.message.content}{RESET}", end="", flush=True)
+
+                    # Hand each task over as soon as its object is complete
+                    for task_json in parser.feed(chunk.message.content):
+                        try:
+                            streamed_task = Task.model_validate_json(task_json)
+                        except ValidationError as e:
+                            console.print(f"\n[yellow]Skipping invalid streamed task: {str(e)}[/yellow]")
+                            continue
+                        if on_task:
+                            on_task(streamed_task)
+
+        validated_backlog = Backlog.model_validate_json(backlog_response)
         console.print(f"\n[green]Received {len(validated_backlog.root)} tasks[/green]")
 
         return workflow_conversation, validated_backlog
@@ -0,0 +1,182 @@
+"""
+Content-addressed on-disk cache for LLM responses.
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+import uuid
+from ollama import ChatResponse
+from rich.console import Console
+
+console = Console()
+
+# Configuration
+CACHE_ENABLED = os.environ.get("BESPOKE_LLM_CACHE", "").lower() in ("1", "true", "yes")  # Opt-in response cache
+CACHE_DIR = Path(os.environ.get("BESPOKE_LLM_CACHE_DIR", ".bespoke_cache/llm"))  # Where cached responses are stored
+CACHE_MAX_BYTES = int(os.environ.get("BESPOKE_LLM_CACHE_MAX_MB", "256")) * 1024 * 1024  # Total size before eviction
+CACHE_MAX_ENTRIES = int(os.environ.get("BESPOKE_LLM_CACHE_MAX_ENTRIES", "5000"))  # Entry count before eviction
+CACHE_TTL = float(os.environ.get("BESPOKE_LLM_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds before an entry expires
+CACHE_MAX_TEMPERATURE = float(os.environ.get("BESPOKE_LLM_CACHE_MAX_TEMPERATURE", "0"))  # Hotter requests bypass the cache
+CACHE_RESCAN_INTERVAL = 100  # Writes between full scans that drop expired entries and correct the size totals
+
+
+def _normalize(value: Any) -> Any:
+    """Convert messages, tools and options into plain JSON-compatible data for hashing."""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        # Ollama drops empty fields before sending, so they must not change the key either
+        return {k: _normalize(v) for k, v in value.items() if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of chat responses keyed by a hash of the request.
+
+    Each entry is stored as one JSON file. Reads refresh the file's mtime, which is
+    used as the LRU clock; entries older than the TTL are treated as misses. The total
+    size and entry count are kept up to date on every write, so the directory is only
+    scanned when a limit is exceeded or every CACHE_RESCAN_INTERVAL writes.
+    """
+
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL,
+        max_temperature: float = CACHE_MAX_TEMPERATURE,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._total_bytes: Optional[int] = None  # Unknown until the first scan
+        self._count = 0
+        self._writes = 0
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash the parts of a chat request that determine its response."""
+        material = {
+            field: _normalize(request.get(field))
+            for field in ("model", "messages", "tools", "format", "options")
+        }
+        encoded = json.dumps(material, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, request: Dict[str, Any]) -> bool:
+        """Only requests sampled at or below max_temperature are deterministic enough to cache."""
+        options = _normalize(request.get("options")) or {}
+        # Ollama's default temperature is well above zero, so an unset temperature bypasses the cache
+        temperature = options.get("temperature", 0.8)
+        return temperature <= self.max_temperature
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[ChatResponse]:
+        """Get a cached response, or None on a miss or expired entry."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        # Touch the entry so it counts as recently used
+        os.utime(path)
+        console.print(f"[dim]LLM cache hit {key[:12]}[/dim]")
+        return ChatResponse.model_validate(entry["response"])
+
+    def put(self, key: str, response: ChatResponse) -> None:
+        """Store a response and evict old entries if the cache is over its limits."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent writers of the same key each get their own temporary file
+        tmp_path = path.with_suffix(f".tmp-{uuid.uuid4().hex[:8]}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "response": response.model_dump(exclude_none=True)}, f)
+            size = f.tell()
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = None
+        os.replace(tmp_path, path)
+
+        self._writes += 1
+        if self._total_bytes is None or self._writes % CACHE_RESCAN_INTERVAL == 0:
+            self.evict()
+            return
+        self._total_bytes += size - (replaced or 0)
+        self._count += replaced is None
+        if self._total_bytes > self.max_bytes or self._count > self.max_entries:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones until within the size limits.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        now = time.time()
+        entries: List[os.stat_result] = []
+        paths: List[Path] = []
+        removed = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            # mtime is refreshed on reads, so this only drops entries nobody has used within the TTL
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append(stat)
+            paths.append(path)
+
+        order = sorted(range(len(paths)), key=lambda i: entries[i].st_mtime)
+        total_bytes = sum(stat.st_size for stat in entries)
+        count = len(paths)
+        for i in order:
+            if total_bytes <= self.max_bytes and count <= self.max_entries:
+                break
+            paths[i].unlink(missing_ok=True)
+            total_bytes -= entries[i].st_size
+            count -= 1
+            removed += 1
+        self._total_bytes, self._count = total_bytes, count
+
+        return removed
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        for path in self.directory.glob("*/*.json"):
+            path.unlink(missing_ok=True)
+        self._total_bytes, self._count = 0, 0
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None if caching is disabled."""
+    global _response_cache
+    if not CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
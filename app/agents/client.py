@@ -0,0 +1,236 @@
+"""
+Shared Ollama client used by all agents.
+"""
+from typing import Any, AsyncIterator, Dict, Optional, Union
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+import httpx
+import ollama
+from ollama import ChatResponse, Message
+from rich.console import Console
+from .cache import ResponseCache, get_response_cache
+from .tokens import TokenCounter, check_context_budget
+from .request_scheduler import ModelRequestScheduler, Priority, get_request_scheduler
+from ..telemetry import record_model_call
+
+console = Console()
+
+# Configuration
+OLLAMA_HOST = os.environ.get("BESPOKE_OLLAMA_HOST") or os.environ.get("OLLAMA_HOST")  # None uses the ollama default
+OLLAMA_POOL_SIZE = int(os.environ.get("BESPOKE_OLLAMA_POOL_SIZE", "8"))  # Maximum open connections to the server
+OLLAMA_TIMEOUT = float(os.environ.get("BESPOKE_OLLAMA_TIMEOUT", "600"))  # Seconds to wait for a response
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("BESPOKE_OLLAMA_CONNECT_TIMEOUT", "10"))  # Seconds to wait for a connection
+OLLAMA_KEEPALIVE_EXPIRY = float(os.environ.get("BESPOKE_OLLAMA_KEEPALIVE_EXPIRY", "120"))  # Seconds idle connections stay open
+MODEL_KEEP_ALIVE = os.environ.get("BESPOKE_MODEL_KEEP_ALIVE", "30m")  # How long Ollama keeps a model (and its prompt cache) loaded
+
+
+def _parse_keep_alive_overrides(value: str) -> Dict[str, str]:
+    """Parse per-model keep-alive overrides given as "model=duration,model=duration"."""
+    overrides = {}
+    for item in value.split(","):
+        model, _, duration = item.strip().rpartition("=")
+        if model and duration:
+            overrides[model] = duration
+    return overrides
+
+
+MODEL_KEEP_ALIVE_OVERRIDES = _parse_keep_alive_overrides(os.environ.get("BESPOKE_MODEL_KEEP_ALIVE_OVERRIDES", ""))
+
+
+class ClientManager:
+    """Process-wide owner of the pooled Ollama client.
+
+    A single AsyncClient (and its keep-alive connection pool) is shared by every agent.
+    The client is bound to the event loop it was created on, so a new one is created
+    transparently if it is requested from a different loop. The manager creates the
+    httpx transport that holds the pool itself, so it can close it without relying on
+    the client's internals.
+    """
+    _client: Optional[ollama.AsyncClient] = None
+    _transport: Optional[httpx.AsyncHTTPTransport] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    host: Optional[str] = OLLAMA_HOST
+    pool_size: int = OLLAMA_POOL_SIZE
+    timeout: float = OLLAMA_TIMEOUT
+    keep_alive: Dict[str, Union[str, float]] = dict(MODEL_KEEP_ALIVE_OVERRIDES)
+
+    @classmethod
+    def configure(cls, host: str = None, pool_size: int = None, timeout: float = None) -> None:
+        """Override the connection settings. Takes effect the next time a client is created."""
+        cls.host = host or cls.host
+        cls.pool_size = pool_size or cls.pool_size
+        cls.timeout = timeout or cls.timeout
+
+    @classmethod
+    def set_keep_alive(cls, model: str, keep_alive: Union[str, float]) -> None:
+        """Set how long Ollama keeps a model loaded after each request (e.g. "30m", 0 to unload)."""
+        cls.keep_alive[model] = keep_alive
+
+    @classmethod
+    def get_keep_alive(cls, model: str) -> Union[str, float]:
+        """Get the keep-alive sent with requests for a model."""
+        return cls.keep_alive.get(model, MODEL_KEEP_ALIVE)
+
+    @classmethod
+    def get_client(cls) -> ollama.AsyncClient:
+        """Get the shared client, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if cls._client is None or cls._loop is not loop or loop.is_closed():
+            cls._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=cls.pool_size,
+                    max_keepalive_connections=cls.pool_size,
+                    keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+                ),
+            )
+            cls._client = ollama.AsyncClient(
+                host=cls.host,
+                timeout=httpx.Timeout(cls.timeout, connect=OLLAMA_CONNECT_TIMEOUT),
+                transport=cls._transport,
+            )
+            cls._loop = loop
+            console.print(f"[dim]Created shared Ollama client (pool size {cls.pool_size})[/dim]")
+        return cls._client
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared client and release its connections."""
+        transport, loop = cls._transport, cls._loop
+        cls._client, cls._transport, cls._loop = None, None, None
+        # A client from another (finished) loop can't be closed here; its connections died with the loop
+        if transport is not None and loop is asyncio.get_running_loop():
+            await transport.aclose()
+
+
+def get_client() -> ollama.AsyncClient:
+    """Get the shared Ollama client."""
+    return ClientManager.get_client()
+
+
+async def chat(**request: Any) -> Union[ChatResponse, AsyncIterator[ChatResponse]]:
+    """
+    Send a chat request through the shared client.
+
+    Takes the same keyword arguments as ollama.AsyncClient.chat. The request is checked
+    against its context budget first, and deterministic requests are answered from the
+    response cache when it is enabled. Requests without a keep_alive get the model's
+    configured one, so the model stays loaded with its prompt cache between calls
+    instead of following the server default. Requests that reach the server are
+    admitted by the model request scheduler, which groups work by model; pass
+    priority=Priority.* to be served ahead of less urgent work. Pass timeout=seconds to
+    bound the server call; time spent waiting for the scheduler does not count against
+    it. Every response's metrics are recorded for the run's telemetry.
+
+    Returns:
+        Union[ChatResponse, AsyncIterator[ChatResponse]]: The response, or a chunk iterator when
+        stream=True. A stream holds its scheduler slot until it is exhausted or closed, so consume
+        it inside closing_stream() when the loop may stop early.
+
+    Raises:
+        ContextBudgetExceeded: If the prompt would not fit in the request's num_ctx.
+        asyncio.TimeoutError: If the server does not respond within timeout seconds.
+    """
+    client = get_client()
+    cache = get_response_cache()
+    priority = request.pop('priority', Priority.NORMAL)
+    timeout = request.pop('timeout', None)
+    if request.get('keep_alive') is None:
+        request['keep_alive'] = ClientManager.get_keep_alive(request.get('model'))
+    prompt_tokens = check_context_budget(request)
+
+    model = request.get('model')
+    started = time.perf_counter()
+
+    key = None
+    if cache is not None and cache.is_cacheable(request):
+        key = cache.make_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            record_model_call(model, cached, time.perf_counter() - started, cached=True)
+            return _replay_stream(cached) if request.get('stream') else cached
+
+    scheduler = get_request_scheduler()
+    await scheduler.acquire(model, priority)
+    queued = time.perf_counter() - started
+    started = time.perf_counter()
+
+    if request.get('stream'):
+        try:
+            stream = await asyncio.wait_for(client.chat(**request), timeout)
+        except BaseException:
+            scheduler.release(model)
+            raise
+        stream = _measure_stream(model, started, queued, scheduler, stream)
+        return _record_stream(cache, key, stream) if key else stream
+
+    try:
+        response = await asyncio.wait_for(client.chat(**request), timeout)
+    finally:
+        scheduler.release(model)
+    TokenCounter.calibrate(model, prompt_tokens, response.prompt_eval_count)
+    record_model_call(model, response, time.perf_counter() - started, queue_seconds=queued)
+    if key:
+        cache.put(key, response)
+    return response
+
+
+async def _measure_stream(
+    model: str,
+    started: float,
+    queued: float,
+    scheduler: ModelRequestScheduler,
+    stream: AsyncIterator[ChatResponse],
+) -> AsyncIterator[ChatResponse]:
+    """Pass stream chunks through, record the metrics carried by the final one, and free the request's slot."""
+    try:
+        async with closing_stream(stream):
+            async for chunk in stream:
+                if chunk.done:
+                    record_model_call(model, chunk, time.perf_counter() - started, queue_seconds=queued)
+                yield chunk
+    finally:
+        scheduler.release(model)
+
+
+@asynccontextmanager
+async def closing_stream(stream: AsyncIterator[ChatResponse]) -> AsyncIterator[AsyncIterator[ChatResponse]]:
+    """
+    Close a chat stream when the block exits, even if the loop over it stopped early.
+
+    Closing the stream frees its scheduler slot and connection right away instead of
+    whenever the abandoned generator is garbage collected.
+
+    Args:
+        stream: Chunk iterator returned by chat(stream=True)
+    """
+    try:
+        yield stream
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def _replay_stream(response: ChatResponse) -> AsyncIterator[ChatResponse]:
+    """Replay a cached response as a single stream chunk."""
+    yield response
+
+
+async def _record_stream(
+    cache: ResponseCache,
+    key: str,
+    stream: AsyncIterator[ChatResponse],
+) -> AsyncIterator[ChatResponse]:
+    """Pass stream chunks through while assembling the full response for the cache."""
+    content = ""
+    tool_calls = []
+    async with closing_stream(stream):
+        async for chunk in stream:
+            content += chunk.message.content or ""
+            tool_calls.extend(chunk.message.tool_calls or [])
+            yield chunk
+            if chunk.done:
+                message = Message(role=chunk.message.role, content=content, tool_calls=tool_calls or None)
+                cache.put(key, chunk.model_copy(update={'message': message}))
@@ -0,0 +1,168 @@
+"""
+Conversation compaction for long development runs.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import os
+from pydantic import BaseModel, Field
+from rich.console import Console
+
+console = Console()
+
+# Markers the developer uses for the messages compaction needs to recognise
+TASK_PREFIX = "Complete this task: "
+WORKSPACE_PREFIX = "Workspace update:"
+HISTORY_PREFIX = "Conversation history: "
+
+
+class CompactionPolicy(BaseModel):
+    """Retention policy applied to the development conversation before each model call"""
+    keep_recent_steps: int = Field(int(os.environ.get("BESPOKE_KEEP_RECENT_STEPS", "0")), description="Finished steps kept verbatim instead of digested")
+    keep_tool_outputs: int = Field(int(os.environ.get("BESPOKE_KEEP_TOOL_OUTPUTS", "4")), description="Most recent tool results in the current step kept in full")
+    stale_tool_output_chars: int = Field(int(os.environ.get("BESPOKE_STALE_TOOL_OUTPUT_CHARS", "400")), description="Characters kept from older tool results")
+    max_history_chars: int = Field(int(os.environ.get("BESPOKE_MAX_HISTORY_CHARS", "8000")), description="Characters kept from the analyst conversation history")
+
+    def tighter(self) -> Optional["CompactionPolicy"]:
+        """
+        A stricter version of this policy, for a request that did not fit its context window.
+
+        Returns:
+            Optional[CompactionPolicy]: The stricter policy, or None if this one cannot be tightened further.
+        """
+        tighter = CompactionPolicy(
+            keep_recent_steps=0,
+            keep_tool_outputs=self.keep_tool_outputs // 2,
+            stale_tool_output_chars=max(100, self.stale_tool_output_chars // 2),
+            max_history_chars=max(1000, self.max_history_chars // 2),
+        )
+        return None if tighter == self else tighter
+
+
+def _as_dict(message: Any) -> Dict:
+    return message.model_dump(exclude_none=True) if hasattr(message, "model_dump") else message
+
+
+def _is_task_message(message: Any) -> bool:
+    message = _as_dict(message)
+    return message.get("role") == "user" and (message.get("content") or "").startswith(TASK_PREFIX)
+
+
+def _is_workspace_message(message: Any) -> bool:
+    message = _as_dict(message)
+    return message.get("role") == "system" and (message.get("content") or "").startswith(WORKSPACE_PREFIX)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n... [{len(text) - limit} characters omitted]"
+
+
+def digest_step(messages: List[Any]) -> str:
+    """
+    Summarise a finished backlog step in one line without calling a model.
+
+    Args:
+        messages: The step's messages, starting with its task message.
+
+    Returns:
+        str: Task ID, description, tools used and outcome.
+    """
+    task_id, description = "?", ""
+    tool_uses = []
+    outcome = "no QA result"
+    for message in messages:
+        message = _as_dict(message)
+        content = message.get("content") or ""
+        if _is_task_message(message):
+            try:
+                task = json.loads(content[len(TASK_PREFIX):])
+                task_id, description = task.get("task_id", "?"), task.get("task_description", "")
+            except json.JSONDecodeError:
+                description = content[len(TASK_PREFIX):]
+        for tool_call in message.get("tool_calls") or []:
+            function = _as_dict(tool_call).get("function", {})
+            arguments = _as_dict(function).get("arguments") or {}
+            target = arguments.get("path") or arguments.get("command") or ""
+            batch = arguments.get("files") or arguments.get("paths")
+            if not target and isinstance(batch, list):
+                target = ", ".join(str(item.get("path") if isinstance(item, dict) else item) for item in batch)
+            tool_uses.append(f"{function.get('name')}({target})" if target else f"{function.get('name')}")
+        if message.get("role") == "assistant" and content.startswith(("QA PASSED", "QA FAILED", "Unable to complete task")):
+            outcome = content.splitlines()[0][:200]
+
+    tools = ", ".join(dict.fromkeys(tool_uses)) or "none"
+    return f"- {task_id}: {_truncate(description, 200)} | tools: {tools} | {outcome}"
+
+
+def split_steps(messages: List[Any]) -> List[List[Any]]:
+    """Split conversation messages into the preamble followed by one list per backlog step."""
+    segments: List[List[Any]] = [[]]
+    for message in messages:
+        if _is_task_message(message):
+            segments.append([])
+        segments[-1].append(message)
+    return segments
+
+
+def compact_conversation(
+    messages: List[Any],
+    step_start: Optional[int] = None,
+    policy: Optional[CompactionPolicy] = None,
+    volatile: Optional[List[Any]] = None,
+) -> List[Any]:
+    """
+    Build a compacted copy of the conversation to send to the model.
+
+    The layout keeps the prompt prefix stable so Ollama can reuse its KV cache between
+    calls: the system prompt and history come first, finished steps are collapsed into
+    one digest message that only changes at step boundaries, and the current step is
+    append-only. Older tool results in the current step are truncated in blocks of
+    keep_tool_outputs, so the prefix is rewritten once per block rather than on every
+    new result. Volatile context such as the workspace view goes last. Stale workspace
+    updates are dropped. The input list is not modified.
+
+    Args:
+        messages: Full development conversation
+        step_start: Index where the current step's messages begin (default: all steps are finished)
+        policy: Retention policy (default: CompactionPolicy from the environment)
+        volatile: Messages that change between calls, appended after everything else
+
+    Returns:
+        List[Any]: Messages to send.
+    """
+    policy = policy or CompactionPolicy()
+    step_start = len(messages) if step_start is None else step_start
+    history, current = messages[:step_start], messages[step_start:]
+
+    preamble, *finished = split_steps([m for m in history if not _is_workspace_message(m)])
+
+    compacted = []
+    for message in preamble:
+        content = _as_dict(message).get("content") or ""
+        if content.startswith(HISTORY_PREFIX) and len(content) > policy.max_history_chars:
+            message = {**_as_dict(message), "content": _truncate(content, policy.max_history_chars)}
+        compacted.append(message)
+
+    keep_from = len(finished) - policy.keep_recent_steps if policy.keep_recent_steps else len(finished)
+    digested, kept = finished[:keep_from], finished[keep_from:]
+    if digested:
+        digests = "\n".join(digest_step(step) for step in digested)
+        compacted.append({'role': 'system', 'content': f"Completed earlier steps:\n{digests}"})
+    for step in kept:
+        compacted.extend(step)
+
+    # Only the latest tool results in the current step are kept in full
+    tool_positions = [i for i, m in enumerate(current) if _as_dict(m).get("role") == "tool"]
+    stale_count = len(tool_positions)
+    if policy.keep_tool_outputs:
+        stale_count -= policy.keep_tool_outputs
+        stale_count = max(0, stale_count - stale_count % policy.keep_tool_outputs)
+    stale = set(tool_positions[:stale_count])
+    for i, message in enumerate(current):
+        if i in stale:
+            message = {**_as_dict(message), "content": _truncate(_as_dict(message).get("content") or "", policy.stale_tool_output_chars)}
+        compacted.append(message)
+
+    compacted.extend(volatile or [])
+    return compacted
@@ -1,170 +1,264 @@
 """
 Execution utilities for AI agents.
 """
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Optional, Union
 import json
+import os
 import asyncio
-import ollama
 from ollama import ChatResponse
 from rich.console import Console
-from ..tools import ToolRegistry, list_directory
+from rich.markup import escape
+from ..tools import ToolRegistry, current_workspace
+from ..workspace import track_changes
+from ..telemetry import telemetry_tags, set_telemetry_tags
 from .utility import estimate_token_count, handle_tool_call
 from .prompts.developer import DEVELOPER_SYSTEM_PROMPT
 from .qa_agent import qa_agent
+from .scheduler import BacklogScheduler
+from .client import chat
+from .request_scheduler import Priority
+from .models import model_plan
+from .tokens import NUM_CTX, ContextBudgetExceeded
+from .compaction import CompactionPolicy, compact_conversation, TASK_PREFIX, WORKSPACE_PREFIX, HISTORY_PREFIX
+
+if TYPE_CHECKING:
+    from ..checkpoint import Checkpoint  # Imports the agents package itself
+
 console = Console()
 
+# Configuration
+MAX_STEP_TURNS = int(os.environ.get("BESPOKE_MAX_STEP_TURNS", "8"))  # Developer turns per attempt before the step goes to QA
+DEVELOPER_TIMEOUT = float(os.environ.get("BESPOKE_DEVELOPER_TIMEOUT", "240"))  # Seconds the server may take to answer one developer turn
+MAX_STEP_TOKENS = int(os.environ.get("BESPOKE_MAX_STEP_TOKENS", "100000"))  # Prompt and completion tokens per attempt before the step goes to QA
+WORKSPACE_TREE_PREFIX = "Workspace tree when development started:"
+
 
 
 async def developer(
-    backlog: List[List[Dict]],
+    backlog: Union[List[Dict], BacklogScheduler],
     conversation: dict,
     max_retries: int = 3,
+    max_concurrency: int = None,
+    compaction_policy: CompactionPolicy = None,
+    checkpoint: Optional["Checkpoint"] = None,
 ) -> List[str]:
 
     """
-    Execute a step with retry logic if no tools are used.
-    
+    Execute the backlog, running independent tasks concurrently.
+
     Args:
-        backlog_json: List of steps to complete
+        backlog: List of steps to complete, or a scheduler still receiving them
         conversation: Conversation history
         max_retries: Maximum number of retry attempts (default 3)
-        
+        max_concurrency: Maximum number of tasks running at once when backlog is a list (default BESPOKE_MAX_PARALLEL_TASKS)
+        compaction_policy: Retention policy for the messages sent to the model (default from environment)
+        checkpoint: Run checkpoint; each finished task is recorded in it, and tasks that
+            passed in an earlier attempt at the run are replayed from it instead of run
+
 
     Returns:
         List[str]: Tool results
 
     """
-    client = ollama.AsyncClient()    
-    
-    # Initialize the development conversation
+    scheduler = backlog if isinstance(backlog, BacklogScheduler) else BacklogScheduler(backlog, max_concurrency)
+    workspace_index = current_workspace().index
+
+    # Initialize the development conversation; the system prompt leads so every request shares its prefix
     development_conversation = []
-    development_conversation.append({'role': 'system', 'content': 'Conversation history: ' + json.dumps(conversation)})
     development_conversation.append({'role': 'system', 'content': DEVELOPER_SYSTEM_PROMPT})
+    development_conversation.append({'role': 'system', 'content': HISTORY_PREFIX + json.dumps(conversation)})
+
+    # The full tree is sent once, in the shared prefix; each step is shown what changed since
+    base_snapshot = workspace_index.snapshot()
+    development_conversation.append({'role': 'system', 'content': f"{WORKSPACE_TREE_PREFIX}\n{workspace_index.render_tree()}"})
+
+    async def run_step(i: int, step: Dict) -> None:
+        completed = checkpoint.completed_messages(step.get("task_id")) if checkpoint else None
+        if completed is not None:
+            console.print(f"[dim]Skipping backlog step {i} ({step.get('task_id')}): completed before the run was resumed[/dim]")
+            development_conversation.extend(completed)
+            return
+
+        total = len(scheduler.backlog) if scheduler.closed else f"{len(scheduler.backlog)}+"
+        console.print(f"[bold cyan]\nImplementing Backlog Step {i}/{total}:[/bold cyan] {step}")
+
+        # Compared against the tree in the prefix, which every step sees, so concurrent steps need no shared state
+        workspace_view = f"changes since the workspace tree above:\n{workspace_index.render_delta(base_snapshot)}"
+
+        # Each step works on its own copy so concurrent steps don't interleave their messages
+        step_conversation = list(development_conversation)
+        step_start = len(step_conversation)
+
+        try:
+            step_conversation = await develop_step(step, step_conversation, max_retries, compaction_policy, workspace_view)
+        except Exception as e:
+            console.print(f"[red]Error: {str(e)}[/red]")
+
+        # Publish the step's messages so tasks started later can see them
+        development_conversation.extend(step_conversation[step_start:])
+        if checkpoint is not None:
+            checkpoint.record_task(step, step_conversation[step_start:])
+
+    # Begin the backlog development loop
+    await scheduler.run(run_step)
+
+    return conversation, development_conversation
+
 
-    # Begin the backlogdevelopment loop
-    for i, step in enumerate(backlog, 1):
-        console.print(f"[bold cyan]\nImplementing Backlog Step {i}/{len(backlog)}:[/bold cyan] {step}")
+async def develop_step(
+    step: Dict,
+    development_conversation: List[dict],
+    max_retries: int = 3,
+    compaction_policy: CompactionPolicy = None,
+    workspace_view: str = "",
+) -> List[dict]:
+    """
+    Execute a single backlog step with retry logic until it passes QA.
 
+    Each attempt runs developer turns until the model stops calling tools (see _tool_loop),
+    then QA checks the step once.
 
-        development_conversation.append({'role': 'system', 'content': f"This is the working directory listing currently:\n {list_directory('./')}"})
-        development_conversation.append({'role': 'user','content': f"Complete this task: {json.dumps(step)}"})
+    Args:
+        step: Backlog task to complete
+        development_conversation: Conversation to extend with the step's messages
+        max_retries: Maximum number of retry attempts (default 3)
+        compaction_policy: Retention policy for the messages sent to the model (default from environment)
+        workspace_view: Workspace changes to show the model during the step
 
-        # Print an estimated token count from the conversation
-        estimated_tokens = estimate_token_count(development_conversation)
-        console.print(f"[bold]Estimated token count: {estimated_tokens} tokens[/bold]")
+    Returns:
+        List[dict]: The updated development conversation
+    """
+    step_start = len(development_conversation)
+    development_conversation.append({'role': 'user','content': f"{TASK_PREFIX}{json.dumps(step)}"})
 
-        # Initialize the retry counter  
+    # Stored with the step, so it stays put in the step's prefix; compaction drops it once the step is finished
+    development_conversation.append({'role': 'system', 'content': f"{WORKSPACE_PREFIX} {workspace_view}"})
+
+    # Print an estimated token count from the compacted conversation
+    estimated_tokens = estimate_token_count(compact_conversation(development_conversation, step_start, compaction_policy), ToolRegistry.get_all_tools(), model_plan.developer)
+    console.print(f"[bold]Estimated token count: {estimated_tokens} tokens[/bold]")
+
+    # Track the files this step changes so QA can see exactly what was done, and tag its telemetry
+    with telemetry_tags(agent="developer", task_id=step.get("task_id")), track_changes(current_workspace().root) as tracker:
+        # Initialize the retry counter
         attempt = 0
 
         # Begin the task development retry loop
-        try:
-            while attempt < max_retries:
-                try:
-                    # Use tools to complete the step
-                    dev1_response: ChatResponse = await asyncio.wait_for(
-                        client.chat(
-                            model="qwen2.5-coder:14b-instruct-q4_K_M",
-                            messages=development_conversation,
-                            tools=ToolRegistry.get_all_tools(),
-                            options={
-                                'temperature': 0 + (attempt * 0.1),  # Gradually increase temperature
-                                'top_p': 0.1,
-                                'num_ctx': 16384,
-                                'num_threads': 16,
-                            }
-                        ),
-                        timeout=240  # Optional: timeout to avoid hanging indefinitely
-                    )
-                except asyncio.TimeoutError:
-                    console.print("[red]Timeout reached waiting for model response. Retrying...[/red]")
-                    attempt += 1
-                    development_conversation.append({
-                        'role': 'system',
-                        'content': 'Timeout occurred. Please try again with a shorter context.'
-                    })
-                    continue
-
-                # Print the response and tool calls
-                console.print(f"[dim]Response: {dev1_response.message.content}[/dim]")
-                console.print(f"[dim]Tool Calls: {dev1_response.message.tool_calls}[/dim]")
-                
-                # Add the response to the conversation if there is one
-                if dev1_response.message.content:
-                    development_conversation.append(dev1_response.message)                    
-
-                # Check if there are tool calls
-                if dev1_response.message.tool_calls:
-                    # Handle the tool calls and update the conversation
-                    development_conversation = await handle_tool_call(dev1_response, development_conversation)
-
-
-
-                try:
-                    # Send the response to the model
-                    dev2_response: ChatResponse = await asyncio.wait_for(
-                        client.chat(
-                            model="qwen2.5-coder:14b-instruct-q4_K_M",
-                            messages=development_conversation,
-                            tools=ToolRegistry.get_all_tools(),
-                            options={
-                                'temperature': 0 + (attempt * 0.1),  # Gradually increase temperature
-                                'top_p': 0.1 + (attempt * 0.1),
-                                'top_k': 30 + (attempt * 5),
-                                'num_ctx': 16384,
-                                'num_threads': 16,
-                            }
-                        ),
-                        timeout=240
-                    )
-                except asyncio.TimeoutError:
-                    console.print("[red]Timeout reached waiting for model response. Retrying...[/red]")
-                    attempt += 1
-                    development_conversation.append({
-                        'role': 'system',
-                        'content': 'Timeout occurred. Please try again with a shorter context.'
-                    })
-                    continue
-
-                # Print the response and tool calls
-                console.print(f"[dim]Response: {dev2_response.message.content}[/dim]")
-                console.print(f"[dim]Tool Calls: {dev2_response.message.tool_calls}[/dim]")
-
-                # Add the response to the conversation if there is one
-                if dev2_response.message.content:
-                    development_conversation.append(dev2_response.message)  
-
-                # Check if there are tool calls
-                if dev2_response.message.tool_calls:
-                    # Handle the tool calls and update the conversation
-                    development_conversation = await handle_tool_call(dev2_response, development_conversation)
-
-
-                # Send the response to the QA agent
-                development_conversation, qa_response = await qa_agent(development_conversation, step["task_description"])
-                console.print(f"[dim]QA Response: {qa_response.message.content}[/dim]")
-
-
-                # Only break the retry loop if the QA response is "pass"
-                if qa_response["pass_qa"]:
-                    # Reset the attempt counter
-                    attempt = 0
-                    break
-
-                # No successful tool calls, prepare for retry
+        while attempt < max_retries:
+            set_telemetry_tags(attempt=attempt + 1)
+            try:
+                # Use tools until the model stops calling them or the attempt runs out of budget
+                development_conversation = await _tool_loop(development_conversation, step_start, attempt, compaction_policy)
+            except asyncio.TimeoutError:
+                console.print("[red]Timeout reached waiting for model response. Retrying...[/red]")
                 attempt += 1
-                if attempt < max_retries:
- 
-                    console.print(f"[yellow]Attempt {attempt}/{max_retries}: QA failed. Retrying...[/yellow]")
-                else:
-                    console.print("[red]Error: Maximum retries reached without passing QA[/red]")
-                    development_conversation.append({'role': 'assistant', 'content': f"Unable to complete task: {step['task_description']} failed to pass QA and exceeded the maximum number of retries. This step may require manual completion."})
-                    raise Exception("Maximum retries reached without passing QA")
+                development_conversation.append({
+                    'role': 'system',
+                    'content': 'Timeout occurred. Please try again with a shorter context.'
+                })
+                continue
 
-        except Exception as e:
-            console.print(f"[red]Error: {str(e)}[/red]")            
+            # Send the response to the QA agent
+            development_conversation, qa_response = await qa_agent(development_conversation, step, tracker.changes(), step_start, tracker.commands)
+            console.print(f"[dim]QA Response: {qa_response.response}[/dim]")
+
+
+            # Only break the retry loop if the QA response is "pass"
+            if qa_response.pass_qa:
+                break
+
+            # No successful tool calls, prepare for retry
+            attempt += 1
+            if attempt < max_retries:
+
+                console.print(f"[yellow]Attempt {attempt}/{max_retries}: QA failed. Retrying...[/yellow]")
+            else:
+                console.print("[red]Error: Maximum retries reached without passing QA[/red]")
+                development_conversation.append({'role': 'assistant', 'content': f"Unable to complete task: {step['task_description']} failed to pass QA and exceeded the maximum number of retries. This step may require manual completion."})
+                raise Exception("Maximum retries reached without passing QA")
+
+    return development_conversation
+
+
+async def _tool_loop(
+    development_conversation: List[dict],
+    step_start: int,
+    attempt: int,
+    compaction_policy: CompactionPolicy = None,
+) -> List[dict]:
+    """
+    Run developer turns for one attempt at a step, executing the tool calls of each turn.
+
+    The loop ends as soon as a turn makes no tool calls, which is the model signalling
+    that the step is done, or when the attempt has used MAX_STEP_TURNS turns or
+    MAX_STEP_TOKENS prompt and completion tokens.
+
+    Args:
+        development_conversation: Conversation to extend with the turns' messages
+        step_start: Index of the step's task message in the conversation
+        attempt: Zero-based attempt number; later attempts sample more freely
+        compaction_policy: Retention policy for the messages sent to the model (default from environment)
+
+    Returns:
+        List[dict]: The updated development conversation
+
+    Raises:
+        asyncio.TimeoutError: If the model does not respond in time.
+        ContextBudgetExceeded: If the step does not fit in the context window even when compacted as far as possible.
+    """
+    tokens = 0
+    policy = compaction_policy or CompactionPolicy()
+    for turn in range(MAX_STEP_TURNS):
+        while True:
+            try:
+                response: ChatResponse = await chat(
+                    model=model_plan.developer,
+                    messages=compact_conversation(development_conversation, step_start, policy),
+                    tools=ToolRegistry.get_all_tools(),
+                    priority=Priority.DEVELOPER,
+                    options=_turn_options(attempt, turn),
+                    timeout=DEVELOPER_TIMEOUT,  # Counts only once the model scheduler has admitted the request
+                )
+                break
+            except ContextBudgetExceeded as e:
+                # Compact harder and send the turn again; give up once the policy cannot be tightened
+                policy = policy.tighter()
+                if policy is None:
+                    raise
+                console.print(f"[yellow]{escape(str(e))}; compacting the conversation harder[/yellow]")
+        tokens += (response.prompt_eval_count or 0) + (response.eval_count or 0)
+
+        # Print the response and tool calls
+        console.print(f"[dim]Response: {response.message.content}[/dim]")
+        console.print(f"[dim]Tool Calls: {response.message.tool_calls}[/dim]")
+
+        # Keep the turn, including its tool calls so later turns can see what was already done
+        if response.message.content or response.message.tool_calls:
+            development_conversation.append(response.message)
+
+        # A turn without tool calls means the model considers the step done
+        if not response.message.tool_calls:
+            return development_conversation
+
+        # Handle the tool calls and update the conversation
+        development_conversation = await handle_tool_call(response, development_conversation)
 
-    
+        if tokens >= MAX_STEP_TOKENS:
+            console.print(f"[yellow]Step used {tokens} tokens in {turn + 1} turns; sending it to QA[/yellow]")
+            return development_conversation
 
+    console.print(f"[yellow]Step reached the limit of {MAX_STEP_TURNS} turns; sending it to QA[/yellow]")
+    return development_conversation
 
 
-    return conversation, development_conversation
\ No newline at end of file
+def _turn_options(attempt: int, turn: int) -> Dict:
+    """Sampling options for a developer turn; follow-up turns and later attempts sample more freely."""
+    options = {
+        'temperature': 0 + (attempt * 0.1),  # Gradually increase temperature
+        'top_p': 0.1,
+        'num_ctx': NUM_CTX,
+        'num_threads': 16,
+    }
+    if turn > 0:
+        options.update({'top_p': 0.1 + (attempt * 0.1), 'top_k': 30 + (attempt * 5)})
+    return options
@@ -0,0 +1,65 @@
+"""
+Incremental parsing of streamed JSON.
+"""
+from typing import List
+
+
+class JsonArrayStreamParser:
+    """Extracts the elements of the first JSON array in a stream as soon as each one closes.
+
+    Only object elements are returned. The parser tracks string and escape state, so
+    brackets inside strings are ignored. It works whether the array is the root value
+    or wrapped in an object (e.g. {"tasks": [...]}).
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._array_depth = None  # Depth inside the first array
+        self._element_start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Consume the next piece of the stream.
+
+        Args:
+            text: Newly received characters
+
+        Returns:
+            List[str]: JSON text of every array element object completed by this piece.
+        """
+        completed = []
+        for char in text:
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._element_start = len(self._buffer) - 1
+                self._depth += 1
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = self._depth
+            elif char in "]}":
+                self._depth -= 1
+                if char == "}" and self._element_start is not None and self._depth == self._array_depth:
+                    completed.append("".join(self._buffer[self._element_start:]))
+                    self._element_start = None
+                    # Completed elements are no longer needed
+                    self._buffer = []
+                elif char == "]" and self._array_depth is not None and self._depth < self._array_depth:
+                    self._array_depth = -1  # Array closed; ignore anything after it
+        if self._element_start is None:
+            self._buffer = []
+        return completed
@@ -0,0 +1,167 @@
+"""
+Model plan and background model warm-up.
+"""
+from typing import Dict, List, Optional, Set
+import asyncio
+import os
+from pydantic import BaseModel, Field
+from rich.console import Console
+from .client import ClientManager, get_client
+from .request_scheduler import Priority, get_request_scheduler
+from .tokens import NUM_CTX
+
+console = Console()
+
+# Configuration
+MODEL_WARMUP = os.environ.get("BESPOKE_MODEL_WARMUP", "1") == "1"  # Preload the next phase's model in the background
+WARMUP_RAM_HEADROOM = float(os.environ.get("BESPOKE_WARMUP_RAM_HEADROOM_GB", "2")) * 1024 ** 3  # RAM left free after a preload
+
+# Workflow phases in the order they run
+PHASES = ["analyst", "backlog", "developer", "qa", "summary"]
+
+
+class ModelPlan(BaseModel):
+    """Model used by each workflow phase"""
+    analyst: str = Field(os.environ.get("BESPOKE_MODEL_ANALYST", "phi4"), description="Writes the application build plan")
+    backlog: str = Field(os.environ.get("BESPOKE_MODEL_BACKLOG", "qwen2.5-coder:14b-instruct-q4_K_M"), description="Turns the plan into backlog tasks")
+    developer: str = Field(os.environ.get("BESPOKE_MODEL_DEVELOPER", "qwen2.5-coder:14b-instruct-q4_K_M"), description="Implements backlog tasks with tools")
+    qa: str = Field(os.environ.get("BESPOKE_MODEL_QA", "qwen2.5-coder:14b-instruct-q4_K_M"), description="Checks tasks against their acceptance criteria")
+    summary: str = Field(os.environ.get("BESPOKE_MODEL_SUMMARY", "qwen2.5"), description="Summarises the development run")
+
+    def model_for(self, phase: str) -> str:
+        """Get the model used by a phase."""
+        return getattr(self, phase)
+
+    def upcoming(self, phase: str) -> List[str]:
+        """Get the models of the phases after this one, in order and without repeats."""
+        later = PHASES[PHASES.index(phase) + 1:]
+        return list(dict.fromkeys(self.model_for(p) for p in later))
+
+
+model_plan = ModelPlan()
+
+
+def _full_name(model: str) -> str:
+    """Ollama reports untagged models with their implicit ':latest' tag."""
+    return model if ":" in model else f"{model}:latest"
+
+
+def available_memory() -> Optional[int]:
+    """
+    Get the memory available for loading another model.
+
+    Returns:
+        Optional[int]: Available bytes from /proc/meminfo, or None where it cannot be read.
+    """
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ModelWarmer:
+    """Loads the next phase's model while the current phase runs, and unloads finished ones.
+
+    Entering a phase starts a background preload of the first upcoming model that
+    differs from the current one, provided it is not loaded yet and fits in available
+    RAM. Models used only by earlier phases are unloaded unless unload is False
+    (e.g. while other runs share the server). Preloads use the same num_ctx as
+    real requests, so Ollama does not reload the model on first use. They go through
+    the request scheduler at the lowest priority and are skipped while every resident
+    slot is held by another model, so a preload never evicts the model in use.
+    """
+
+    def __init__(self, plan: ModelPlan = None, enabled: bool = MODEL_WARMUP, unload: bool = True):
+        self.plan = plan or model_plan
+        self.enabled = enabled
+        self.unload = unload
+        self.phase: Optional[str] = None
+        self._sizes: Optional[Dict[str, int]] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def enter_phase(self, phase: str) -> None:
+        """
+        Record that a workflow phase has started and schedule warm-up work for the next one.
+
+        Phases may only move forward; entering an earlier or the current phase does nothing.
+
+        Args:
+            phase: One of PHASES
+        """
+        if not self.enabled or phase not in PHASES:
+            return
+        if self.phase is not None and PHASES.index(phase) <= PHASES.index(self.phase):
+            return
+        self.phase = phase
+        self._spawn(self._warm_up(phase))
+
+    async def _warm_up(self, phase: str) -> None:
+        current = self.plan.model_for(phase)
+        upcoming = self.plan.upcoming(phase)
+        needed = {_full_name(model) for model in (current, *upcoming)}
+
+        client = get_client()
+        loaded = {_full_name(model.model) for model in (await client.ps()).models}
+
+        # Models no later phase uses only hold memory the next one could use
+        for model in loaded:
+            if self.unload and model not in needed:
+                console.print(f"[dim]Unloading {model}; no later phase uses it[/dim]")
+                await client.generate(model=model, keep_alive=0)
+
+        next_model = next((model for model in upcoming if model != current), None)
+        if next_model is None or _full_name(next_model) in loaded:
+            return
+
+        size = (await self._model_sizes()).get(_full_name(next_model))
+        available = available_memory()
+        if size and available is not None and size + WARMUP_RAM_HEADROOM > available:
+            console.print(f"[dim]Not preloading {next_model}: needs {size / 1024 ** 3:.1f} GB, {available / 1024 ** 3:.1f} GB available[/dim]")
+            return
+
+        scheduler = get_request_scheduler()
+        if not scheduler.has_room(next_model):
+            console.print(f"[dim]Not preloading {next_model}: the server is busy with another model[/dim]")
+            return
+
+        await scheduler.acquire(next_model, Priority.WARMUP)
+        try:
+            console.print(f"[dim]Preloading {next_model} for a later phase[/dim]")
+            await client.generate(
+                model=next_model,
+                keep_alive=ClientManager.get_keep_alive(next_model),
+                options={'num_ctx': NUM_CTX},
+            )
+        finally:
+            scheduler.release(next_model)
+
+    async def _model_sizes(self) -> Dict[str, int]:
+        if self._sizes is None:
+            self._sizes = {_full_name(model.model): model.size or 0 for model in (await get_client().list()).models}
+        return self._sizes
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(self._guard(coroutine))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @staticmethod
+    async def _guard(coroutine) -> None:
+        # Warm-up is an optimisation; a failure must never break the workflow
+        try:
+            await coroutine
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            console.print(f"[yellow]Model warm-up skipped: {str(e)}[/yellow]")
+
+    async def close(self) -> None:
+        """Cancel warm-up work still in flight."""
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._pending.clear()
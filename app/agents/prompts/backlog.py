@@ -33,7 +33,7 @@ Example:
             "task_id": "string (following format: {{TYPE}}-{{COMPONENT}}-{{NUMBER}})",
             "task_type": "string (one of the defined task types)",
             "task_description": {
-                "operation": "string (one of: create_file, write_file, list_directory, read_file, edit_file, run_pip, run_npm)",
+                "operation": "string (one of: create_file, write_file, list_directory, read_file, edit_file, patch_file, run_pip, run_npm)",
                 "path": "string (target file/directory path)",
                 "content": "string (for write/edit operations)",
                 "steps": [
@@ -55,7 +55,7 @@ Example:
 
 ## Task Description Requirements
 Each task description must:
-1. Use only permitted operations: create_file, write_file, list_directory, read_file, edit_file, run_pip, run_npm
+1. Use only permitted operations: create_file, write_file, list_directory, read_file, edit_file, patch_file, run_pip, run_npm
 2. Provide absolute paths for all file operations
 3. Include specific code snippets or content when relevant
 4. Break down complex operations into sequential steps
@@ -6,8 +6,8 @@ For each task, your goal is to ensure that:
 - For each file operation, the necessary preconditions were met (for example, using the read_file tool before any modifications, or list_directory to confirm file existence).
 - The intended modifications actually target the correct sections of the files, using the provided markers or other identifiers.
 
-Using the conversation history (which includes tool calls and their outputs), please evaluate whether the execution of the task was successful. If issues are found, provide specific suggestions for improvement. Additionally, consider:
-- Whether the file contents (as returned by read_file or shown in tool call outputs) confirm that the intended changes were applied.
+Using the evidence provided (the task's acceptance criteria, the files created or changed during this step as diffs or full content, and the results of the tool calls made during this step), please evaluate whether the execution of the task was successful. If issues are found, provide specific suggestions for improvement. Additionally, consider:
+- Whether the file changes and tool outputs confirm that each acceptance criterion was met.
 - Whether the sequence of operations is logical and complete.
 - Any discrepancies between the task description and the executed actions.
 
@@ -1,40 +1,106 @@
-import ollama
 from pydantic import BaseModel
 from .prompts.qa_prompt import QA_SYSTEM_PROMPT
+from .client import chat
+from .request_scheduler import Priority
+from .models import model_plan
+from .tokens import NUM_CTX
+from ..workspace import FileChange
+from ..telemetry import telemetry_tags
 from rich.console import Console
-from typing import Tuple
+from typing import Dict, List, Tuple
+import os
 
 console = Console()
 
 GREY = "\033[90m"
 RESET = "\033[0m"
 
+# Configuration
+QA_MAX_FILE_CHARS = int(os.environ.get("BESPOKE_QA_MAX_FILE_CHARS", "4000"))  # Diff/content shown per changed file
+QA_MAX_TOOL_RESULT_CHARS = int(os.environ.get("BESPOKE_QA_MAX_TOOL_RESULT_CHARS", "800"))  # Characters shown per tool result
+
 
 class QA_Response(BaseModel):
     response: str
     pass_qa: bool
 
-# QA agent
-async def qa_agent(development_conversation: list, task: str) -> Tuple[list, QA_Response]:
 
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}\n... [{len(text) - limit} characters omitted]"
+
+
+def build_evidence_packet(task: Dict, changes: List[FileChange], step_messages: list, commands: List[str] = None) -> str:
+    """
+    Build the focused evidence QA needs to judge one backlog step.
+
+    Args:
+        task: The backlog task being checked
+        changes: Files created, modified or deleted during the step
+        step_messages: Conversation messages produced during the step
+        commands: What each package manager command in the step changed (see ChangeTracker.record_command)
+
+    Returns:
+        str: Acceptance criteria, file changes, command changes and this step's tool results.
+    """
+    criteria = "\n".join(f"- {criterion}" for criterion in task.get("acceptance_criteria", [])) or "- (none given)"
+    packet = f"Task {task.get('task_id', '')}: {task.get('task_description', '')}\n\nAcceptance criteria:\n{criteria}\n"
+
+    packet += "\nFiles changed during this step:\n"
+    if not changes:
+        packet += "(no files were changed)\n"
+    for change in changes:
+        packet += f"=== {change.path} ({change.status}) ===\n{_clip(change.diff, QA_MAX_FILE_CHARS)}\n"
 
+    if commands:
+        packet += "\nChanges made by commands during this step:\n"
+        packet += "".join(f"- {_clip(command, QA_MAX_FILE_CHARS)}\n" for command in commands)
 
-    client = ollama.AsyncClient()
+    packet += "\nTool results for this step:\n"
+    tool_results = [
+        message for message in step_messages
+        if isinstance(message, dict) and (message.get('role') == 'tool' or 'tool call failed' in message.get('content', ''))
+    ]
+    if not tool_results:
+        packet += "(no tools were called)\n"
+    for message in tool_results:
+        packet += f"[{message.get('name', 'error')}] {_clip(message['content'], QA_MAX_TOOL_RESULT_CHARS)}\n"
 
-    qa_conversation = development_conversation.copy()
-    qa_conversation.append({'role': 'system', 'content': QA_SYSTEM_PROMPT})
-    qa_conversation.append({'role': 'user', 'content': f"Was this task completed?: {task}"})
-    development_conversation.append({'role': 'user', 'content': f"Was this task completed?: {task}"})
+    return packet
+
+
+# QA agent
+async def qa_agent(development_conversation: list, task: Dict, changes: List[FileChange], step_start: int, commands: List[str] = None) -> Tuple[list, QA_Response]:
+    """
+    Check a backlog step against its acceptance criteria using an evidence packet instead of the full history.
+
+    Args:
+        development_conversation: The step's conversation; the QA verdict is appended to it
+        task: The backlog task being checked
+        changes: Files created, modified or deleted during the step
+        step_start: Index where the step's messages begin in development_conversation
+        commands: What each package manager command in the step changed
+
+    Returns:
+        Tuple[list, QA_Response]: (Updated development conversation, validated QA response)
+    """
+    evidence = build_evidence_packet(task, changes, development_conversation[step_start:], commands)
+    qa_conversation = [
+        {'role': 'system', 'content': QA_SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"Was this task completed?\n\n{evidence}"},
+    ]
+    development_conversation.append({'role': 'user', 'content': f"Was this task completed?: {task['task_description']}"})
 
     console.print("[yellow]Sending task to QA agent...[/yellow]")
 
     # Send the task to the QA agent
-    qa_response = await client.chat(
-        model="qwen2.5-coder:14b-instruct-q4_K_M",
-        messages=qa_conversation,
-        format=QA_Response.model_json_schema(),
-        options={'temperature': 0.3, 'num_ctx': 16384}
-    )
+    with telemetry_tags(agent="qa"):
+        qa_response = await chat(
+            model=model_plan.qa,
+            messages=qa_conversation,
+            format=QA_Response.model_json_schema(),
+            priority=Priority.QA,
+            options={'temperature': 0.3, 'num_ctx': NUM_CTX}
+        )
     print(f"{GREY}QA Response:{qa_response}{RESET}")
     validated_qa_response = QA_Response.model_validate_json(qa_response.message.content)
     print(f"{GREY}QA Response:{qa_response.message.content}{RESET}")
@@ -46,5 +112,3 @@ async def qa_agent(development_conversation: list, task: str) -> Tuple[list, QA_
         development_conversation.append({'role': 'assistant', 'content': f"QA FAILED: {validated_qa_response.response}"})
 
     return development_conversation, validated_qa_response
-
-        
\ No newline at end of file
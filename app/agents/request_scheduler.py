@@ -0,0 +1,156 @@
+"""
+Scheduling of model requests to minimise model swaps on a shared Ollama server.
+"""
+from typing import Dict, List, Optional
+from enum import IntEnum
+import asyncio
+import heapq
+import itertools
+import os
+from rich.console import Console
+
+console = Console()
+
+# Configuration
+RESIDENT_MODELS = int(os.environ.get("BESPOKE_RESIDENT_MODELS", "1"))  # Models served at the same time
+MODEL_CONCURRENCY = int(os.environ.get("BESPOKE_MODEL_CONCURRENCY", "4"))  # In-flight requests per model
+MODEL_BATCH_SIZE = int(os.environ.get("BESPOKE_MODEL_BATCH_SIZE", "8"))  # Requests served for one model before yielding to waiting models
+
+
+class Priority(IntEnum):
+    """Request priorities; lower values are served first."""
+    QA = 0
+    SUMMARY = 1
+    DEVELOPER = 2
+    BACKLOG = 3
+    ANALYST = 4
+    NORMAL = 5  # Requests that name no priority wait behind every workflow phase
+    WARMUP = 6  # Background model preloads
+
+
+class ModelRequestScheduler:
+    """Admits chat requests so that work for the same model runs together.
+
+    Requests wait in a priority queue per model. Up to max_resident models are
+    active at once, each with at most concurrency requests in flight. An active model
+    keeps being served while it has queued work, so same-model requests are batched
+    instead of interleaving with other models. Once it has been granted batch_size
+    requests while other models were waiting, it stops admitting new ones and is
+    retired as soon as its in-flight requests finish, so no model starves. The next
+    model to activate is the one whose most urgent request has the best priority,
+    preferring the longer queue on ties.
+    """
+
+    def __init__(self, max_resident: int = None, concurrency: int = None, batch_size: int = None):
+        self.max_resident = max(1, max_resident or RESIDENT_MODELS)
+        self.concurrency = max(1, concurrency or MODEL_CONCURRENCY)
+        self.batch_size = max(1, batch_size or MODEL_BATCH_SIZE)
+        self.limits: Dict[str, int] = {}
+        self._queues: Dict[str, List[list]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._granted: Dict[str, int] = {}
+        self._active: List[str] = []
+        self._last_activated: Optional[str] = None
+        self._sequence = itertools.count()
+        self.swaps = 0  # Times a different model from the previous one was activated
+
+    def set_limit(self, model: str, concurrency: int) -> None:
+        """Override the in-flight request limit for one model."""
+        self.limits[model] = max(1, concurrency)
+        self._dispatch()
+
+    async def acquire(self, model: str, priority: int = Priority.NORMAL) -> None:
+        """
+        Wait until a request for the model may be sent.
+
+        Every successful acquire must be paired with release().
+
+        Args:
+            model: Model the request is for
+            priority: Lower values are served first
+        """
+        future = asyncio.get_running_loop().create_future()
+        entry = [int(priority), next(self._sequence), future]
+        heapq.heappush(self._queues.setdefault(model, []), entry)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller was cancelled; hand the slot back
+                self.release(model)
+            elif entry in self._queues[model]:
+                self._queues[model].remove(entry)
+                heapq.heapify(self._queues[model])
+                self._dispatch()
+            raise
+
+    def has_room(self, model: str) -> bool:
+        """Whether a request for the model would be admitted without another model retiring first."""
+        return model in self._active or len(self._active) < self.max_resident
+
+    def release(self, model: str) -> None:
+        """Mark a request for the model as finished."""
+        self._in_flight[model] = max(0, self._in_flight.get(model, 0) - 1)
+        self._dispatch()
+
+    def _waiting(self, model: str) -> bool:
+        return bool(self._queues.get(model))
+
+    def _others_waiting(self, model: str) -> bool:
+        return any(queue for other, queue in self._queues.items() if other != model and other not in self._active)
+
+    def _exhausted(self, model: str) -> bool:
+        return self._granted.get(model, 0) >= self.batch_size and self._others_waiting(model)
+
+    def _grant(self, model: str) -> None:
+        _, _, future = heapq.heappop(self._queues[model])
+        if future.done():
+            return  # Cancelled while queued; nothing to hand the slot to
+        self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        self._granted[model] = self._granted.get(model, 0) + 1
+        future.set_result(None)
+
+    def _dispatch(self) -> None:
+        # Retire active models that are idle, or have had their turn and drained
+        yielded = set()
+        for model in list(self._active):
+            if self._in_flight.get(model, 0) == 0 and (not self._waiting(model) or self._exhausted(model)):
+                if self._waiting(model):
+                    yielded.add(model)
+                self._active.remove(model)
+                self._granted[model] = 0
+
+        # Activate the most urgent waiting models while there is room
+        while len(self._active) < self.max_resident:
+            candidates = [model for model, queue in self._queues.items() if queue and model not in self._active]
+            # A model that just had its turn goes after the others it was holding up
+            candidates = [model for model in candidates if model not in yielded] or candidates
+            if not candidates:
+                break
+            model = min(candidates, key=lambda m: (self._queues[m][0][0], -len(self._queues[m]), self._queues[m][0][1]))
+            if self._last_activated not in (None, model):
+                self.swaps += 1
+                console.print(f"[dim]Switching requests to {model} ({len(self._queues[model])} queued)[/dim]")
+            self._last_activated = model
+            self._active.append(model)
+
+        for model in self._active:
+            limit = self.limits.get(model, self.concurrency)
+            while self._waiting(model) and self._in_flight.get(model, 0) < limit and not self._exhausted(model):
+                self._grant(model)
+
+
+_schedulers: Dict[asyncio.AbstractEventLoop, ModelRequestScheduler] = {}
+
+
+def get_request_scheduler() -> ModelRequestScheduler:
+    """Get the request scheduler for the running event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        # Schedulers of finished loops hold nothing worth keeping
+        for other in [other for other in _schedulers if other.is_closed()]:
+            del _schedulers[other]
+        scheduler = _schedulers[loop] = ModelRequestScheduler()
+    return scheduler
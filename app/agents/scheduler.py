@@ -0,0 +1,162 @@
+"""
+Dependency-aware scheduling for backlog tasks.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import os
+import re
+from rich.console import Console
+
+console = Console()
+
+# Configuration
+MAX_PARALLEL_TASKS = int(os.environ.get("BESPOKE_MAX_PARALLEL_TASKS", "1"))  # Backlog tasks allowed to run at once
+
+PATH_PATTERN = re.compile(r"(?:[\w.-]+/)*[\w.-]*[\w-]{2}\.[A-Za-z][A-Za-z0-9]{0,5}\b")  # File names such as src/app.py or package.json
+
+
+def mentioned_paths(step: Dict) -> Set[str]:
+    """File paths named in a task's description or acceptance criteria."""
+    text = " ".join([str(step.get("task_description") or ""), *map(str, step.get("acceptance_criteria") or [])])
+    return {match.lstrip("./") for match in PATH_PATTERN.findall(text)}
+
+
+class BacklogScheduler:
+    """Run backlog tasks as a DAG built from their task_dependencies.
+
+    Tasks whose dependencies have all finished run concurrently, bounded by
+    max_concurrency. Dependencies are the only declared independence, so a task that
+    names a file (see mentioned_paths) also named by a running task waits for it to
+    finish. If the backlog references unknown task IDs, repeats an ID or contains a
+    dependency cycle, the whole backlog runs serially in its original order.
+
+    A scheduler created without a backlog accepts tasks through add() while it runs,
+    so execution can start while the backlog is still being generated. Each task starts
+    once its dependencies have arrived and finished; tasks still blocked when close()
+    is called (unknown IDs or cycles) then run serially in backlog order.
+    """
+
+    def __init__(self, backlog: List[Dict] = None, max_concurrency: int = None):
+        self.backlog = list(backlog or [])
+        self.max_concurrency = max(1, max_concurrency or MAX_PARALLEL_TASKS)
+        self.closed = backlog is not None
+        self._changed: Optional[asyncio.Event] = None
+
+    def add(self, step: Dict) -> None:
+        """Add a task to a scheduler that is still receiving its backlog."""
+        if self.closed:
+            raise RuntimeError("Cannot add tasks to a closed backlog")
+        self.backlog.append(step)
+        self._notify()
+
+    def close(self) -> None:
+        """Signal that no more tasks will be added."""
+        self.closed = True
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    def build_graph(self) -> Optional[Dict[str, Set[str]]]:
+        """
+        Build the dependency graph for the backlog.
+
+        Returns:
+            Optional[Dict[str, Set[str]]]: Mapping of task ID to the IDs it depends on,
+            or None if the backlog cannot be scheduled as a DAG.
+        """
+        graph: Dict[str, Set[str]] = {}
+        for step in self.backlog:
+            task_id = step.get("task_id")
+            if not task_id or task_id in graph:
+                console.print(f"[yellow]Missing or duplicate task ID '{task_id}', falling back to serial order[/yellow]")
+                return None
+            graph[task_id] = set(step.get("task_dependencies") or [])
+
+        for task_id, dependencies in graph.items():
+            unknown = dependencies - graph.keys()
+            if unknown:
+                console.print(f"[yellow]Task {task_id} depends on unknown tasks {sorted(unknown)}, falling back to serial order[/yellow]")
+                return None
+
+        # Kahn's algorithm: anything left unvisited is part of a cycle
+        remaining = {task_id: len(dependencies) for task_id, dependencies in graph.items()}
+        ready = [task_id for task_id, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            current = ready.pop()
+            visited += 1
+            for task_id, dependencies in graph.items():
+                if current in dependencies:
+                    remaining[task_id] -= 1
+                    if remaining[task_id] == 0:
+                        ready.append(task_id)
+
+        if visited != len(graph):
+            console.print("[yellow]Dependency cycle detected in backlog, falling back to serial order[/yellow]")
+            return None
+
+        return graph
+
+    async def run(self, run_task: Callable[[int, Dict], Awaitable[None]]) -> None:
+        """
+        Run every backlog task, starting each one as soon as its dependencies finish.
+
+        Args:
+            run_task: Coroutine function called with the 1-based step number and the task dict.
+        """
+        if self.closed and (self.max_concurrency == 1 or self.build_graph() is None):
+            for i, step in enumerate(self.backlog, 1):
+                await run_task(i, step)
+            return
+
+        self._changed = asyncio.Event()
+        finished: Set[str] = set()
+        started: Set[int] = set()
+        running: Set[asyncio.Task] = set()
+        running_paths: Dict[asyncio.Task, Set[str]] = {}
+        errors: List[BaseException] = []
+
+        async def run_and_release(i: int, step: Dict) -> None:
+            try:
+                await run_task(i, step)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # Failed tasks still release their dependents, matching the serial behaviour
+                finished.add(step.get("task_id"))
+                running.discard(asyncio.current_task())
+                running_paths.pop(asyncio.current_task(), None)
+                self._changed.set()
+
+        while True:
+            self._changed.clear()
+
+            for index, step in enumerate(self.backlog):
+                if len(running) >= self.max_concurrency:
+                    break
+                if index in started or not set(step.get("task_dependencies") or []) <= finished:
+                    continue
+                # Tasks that may edit the same files never run at the same time
+                paths = mentioned_paths(step)
+                if any(paths & other for other in running_paths.values()):
+                    continue
+                started.add(index)
+                task = asyncio.create_task(run_and_release(index + 1, step))
+                running.add(task)
+                running_paths[task] = paths
+
+            if self.closed and not running:
+                blocked = [index for index in range(len(self.backlog)) if index not in started]
+                if blocked:
+                    console.print("[yellow]Remaining tasks depend on unknown tasks or a cycle, running them serially[/yellow]")
+                    for index in blocked:
+                        started.add(index)
+                        await run_and_release(index + 1, self.backlog[index])
+                break
+
+            await self._changed.wait()
+
+        if errors:
+            raise errors[0]
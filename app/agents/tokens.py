@@ -0,0 +1,159 @@
+"""
+Token accounting and context budgeting for model requests.
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import json
+import os
+from rich.console import Console
+
+try:
+    from tokenizers import Tokenizer  # Optional: enables exact counts
+except ImportError:
+    Tokenizer = None
+
+console = Console()
+
+# Configuration
+NUM_CTX = int(os.environ.get("BESPOKE_NUM_CTX", "16384"))  # Context window requested from Ollama
+OUTPUT_RESERVE = int(os.environ.get("BESPOKE_OUTPUT_RESERVE", "1024"))  # Tokens kept free for the response
+TOKENIZER_DIR = Path(os.environ.get("BESPOKE_TOKENIZER_DIR", ".bespoke_cache/tokenizers"))  # <model>.json tokenizer files
+DEFAULT_CHARS_PER_TOKEN = 3.5  # Conservative starting point for code-heavy prompts
+MESSAGE_OVERHEAD = 4  # Template tokens (role markers, separators) added per message
+TOOLS_OVERHEAD = 16  # Template tokens wrapping the tool definitions
+
+
+class ContextBudgetExceeded(Exception):
+    """Raised when a request would not fit in the model's context window."""
+
+
+def _message_text(message: Any) -> str:
+    """Flatten a message dict or ollama Message into the text the chat template will see."""
+    if hasattr(message, "model_dump"):
+        message = message.model_dump(exclude_none=True)
+    text = f"{message.get('role', '')}\n{message.get('content') or ''}"
+    for tool_call in message.get("tool_calls") or []:
+        if hasattr(tool_call, "model_dump"):
+            tool_call = tool_call.model_dump(exclude_none=True)
+        function = tool_call.get("function", {})
+        text += f"\n{function.get('name', '')} {json.dumps(function.get('arguments', {}))}"
+    if message.get("name"):
+        text += f"\n{message['name']}"
+    return text
+
+
+class TokenCounter:
+    """Counts prompt tokens with a local tokenizer if one exists for the model, else a calibrated estimate.
+
+    The estimate's characters-per-token ratio is learnt per model from the
+    prompt_eval_count Ollama reports for each request.
+    """
+    _tokenizers: Dict[str, Any] = {}
+    _chars_per_token: Dict[str, float] = {}
+
+    @classmethod
+    def get_tokenizer(cls, model: Optional[str]):
+        """Load the tokenizer for a model from TOKENIZER_DIR, trying the full name then the family."""
+        if Tokenizer is None or not model:
+            return None
+        if model not in cls._tokenizers:
+            tokenizer = None
+            for name in (model, model.split(":")[0]):
+                path = TOKENIZER_DIR / f"{name.replace('/', '_').replace(':', '_')}.json"
+                if path.exists():
+                    tokenizer = Tokenizer.from_file(str(path))
+                    break
+            cls._tokenizers[model] = tokenizer
+        return cls._tokenizers[model]
+
+    @classmethod
+    def is_exact(cls, model: Optional[str]) -> bool:
+        """Whether counts for this model come from a real tokenizer."""
+        return cls.get_tokenizer(model) is not None
+
+    @classmethod
+    def count_text(cls, text: str, model: Optional[str] = None) -> int:
+        """Count the tokens in a piece of text."""
+        tokenizer = cls.get_tokenizer(model)
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        ratio = cls._chars_per_token.get(model, DEFAULT_CHARS_PER_TOKEN)
+        return int(len(text) / ratio) + 1 if text else 0
+
+    @classmethod
+    def count_request(
+        cls,
+        model: Optional[str],
+        messages: List[Any],
+        tools: Optional[List[Dict]] = None,
+    ) -> int:
+        """
+        Count the prompt tokens of a chat request, including tool schemas and template overhead.
+
+        Args:
+            model: Model the request is for
+            messages: Message dicts or ollama Message objects
+            tools: Tool definitions sent with the request
+
+        Returns:
+            int: Prompt token count.
+        """
+        total = sum(cls.count_text(_message_text(message), model) + MESSAGE_OVERHEAD for message in messages or [])
+        if tools:
+            total += cls.count_text(json.dumps(tools), model) + TOOLS_OVERHEAD
+        return total
+
+    @classmethod
+    def calibrate(cls, model: str, estimated_tokens: int, prompt_eval_count: Optional[int]) -> None:
+        """
+        Adjust the model's characters-per-token ratio from a reported prompt token count.
+
+        Ollama only reports tokens it had to evaluate, so counts well below the estimate
+        (a reused prompt prefix) are ignored rather than treated as a shorter prompt.
+        """
+        if cls.is_exact(model) or not prompt_eval_count or estimated_tokens <= 0:
+            return
+        if prompt_eval_count < estimated_tokens * 0.5:
+            return
+        ratio = cls._chars_per_token.get(model, DEFAULT_CHARS_PER_TOKEN)
+        observed = ratio * estimated_tokens / prompt_eval_count
+        # Moving average keeps one unusual prompt from swinging the estimate
+        cls._chars_per_token[model] = min(6.0, max(2.0, 0.7 * ratio + 0.3 * observed))
+
+
+def check_context_budget(request: Dict[str, Any]) -> int:
+    """
+    Make sure a chat request fits in its context window before it is sent.
+
+    Requests without an explicit num_ctx get NUM_CTX, so the window Ollama
+    allocates is always the one that was checked.
+
+    Args:
+        request: Keyword arguments for the chat call; options are updated in place.
+
+    Returns:
+        int: Prompt token count.
+
+    Raises:
+        ContextBudgetExceeded: If the prompt plus the output reserve exceeds num_ctx.
+    """
+    options = dict(request.get("options") or {})
+    options.setdefault("num_ctx", NUM_CTX)
+    request["options"] = options
+
+    model = request.get("model")
+    prompt_tokens = TokenCounter.count_request(model, request.get("messages"), request.get("tools"))
+    num_predict = options.get("num_predict")
+    reserve = num_predict if num_predict and num_predict > 0 else OUTPUT_RESERVE
+    budget = options["num_ctx"] - reserve
+
+    if prompt_tokens > budget:
+        kind = "" if TokenCounter.is_exact(model) else "~"
+        raise ContextBudgetExceeded(
+            f"Request to {model} needs {kind}{prompt_tokens} prompt tokens but only {budget} of "
+            f"num_ctx={options['num_ctx']} are available after reserving {reserve} for the response"
+        )
+    if prompt_tokens > budget * 0.9:
+        console.print(f"[yellow]Request to {model} uses {prompt_tokens}/{budget} prompt tokens[/yellow]")
+
+    return prompt_tokens
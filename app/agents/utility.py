@@ -1,12 +1,19 @@
 """
 Utility functions for AI agents.
 """
-from typing import List
-import ollama
+from typing import Any, List
 from ollama import ChatResponse
 import json
+import asyncio
 from rich.console import Console
+from rich.markup import escape
 from ..tools import ToolRegistry
+from .client import chat
+from .request_scheduler import Priority
+from .models import model_plan
+from .tokens import NUM_CTX, TokenCounter, ContextBudgetExceeded
+from .compaction import CompactionPolicy, compact_conversation, digest_step, split_steps
+from ..telemetry import telemetry_tags
 
 console = Console()
 
@@ -22,62 +29,126 @@ async def get_summary(messages: List[dict]) -> str:
         'content': 'Review the conversation history and summarize what tasks have been completed and any that failed or need additional work. Be brief and specific.'
     })
 
-    client = ollama.AsyncClient()
+    # Finished steps are sent as digests; only the summary request is kept verbatim
+    policy = CompactionPolicy()
+    request = compact_conversation(messages, len(messages) - 1, policy)
+    digests_only = False
+    with telemetry_tags(agent="summary"):
+        while True:
+            try:
+                summary_response = await chat(
+                    model=model_plan.summary,
+                    messages=request,
+                    priority=Priority.SUMMARY,
+                    options={
+                        'temperature': 0.6,
+                        'top_p': 0.8,
+                        'num_ctx': NUM_CTX,
+                    }
+                )
+                break
+            except ContextBudgetExceeded as e:
+                console.print(f"[yellow]{escape(str(e))}; shortening the summary input[/yellow]")
+                policy = policy.tighter() if policy is not None else None
+                if policy is not None:
+                    request = compact_conversation(messages, len(messages) - 1, policy)
+                elif not digests_only:
+                    # Last resort: only the step digests and the summary request
+                    digests_only = True
+                    request = [{'role': 'system', 'content': f"Completed steps:\n{_step_digests(messages)}"}, messages[-1]]
+                else:
+                    # Every task has already run, so report the digests rather than fail the workflow
+                    return f"Steps (the conversation was too long to summarize):\n{_step_digests(messages)}"
 
-    summary_response = await client.chat(
-        model="qwen2.5",
-        messages=messages,
-        options={
-            'temperature': 0.6,
-            'top_p': 0.8,
-            'num_ctx': 16384,
-        }
-    )
+    return summary_response.message.content 
 
 
-    return summary_response.message.content 
+def _step_digests(messages: List[dict]) -> str:
+    return "\n".join(digest_step(step) for step in split_steps(messages)[1:])
 
 
 
-def estimate_token_count(messages: List[dict], char_per_token: int = 4) -> int:
+def estimate_token_count(messages: List[dict], tools: List[dict] = None, model: str = None) -> int:
     """
-    Estimate the total token count for the given conversation messages.
-    
+    Count the prompt tokens for the given conversation messages.
+
+    Uses the model's tokenizer when one is available locally, otherwise a calibrated estimate.
+    Message objects, tool calls and tool schemas are all included.
+
     Args:
-        messages (List[dict]): List of conversation messages.
-        char_per_token (int): Approximate number of characters per token (default is 4).
-    
+        messages (List[dict]): List of conversation messages or Message objects.
+        tools (List[dict]): Tool definitions sent with the request.
+        model (str): Model the messages will be sent to.
+
     Returns:
-        int: Estimated token count.
+        int: Token count.
     """
-    total_chars = sum(len(message.get('content', '')) for message in messages)
+    return TokenCounter.count_request(model, messages, tools)
 
 
-    return total_chars // char_per_token
+async def _execute_tool_call(tool) -> dict:
+    """Execute one tool call and return the message to add to the conversation."""
+    console.print(f"[cyan]Calling function: {tool.function.name}[/cyan]")
+    try:
+        args = (tool.function.arguments if isinstance(tool.function.arguments, dict)
+            else json.loads(tool.function.arguments))
+        result = await ToolRegistry.call(tool.function.name, **args)
 
+        console.print(f"[green]Function result: {result}[/green]")
 
-async def handle_tool_call(response: ChatResponse, development_conversation: List[dict]) -> List[dict]:
+        # Tool result for the conversation
+        return {'role': 'tool', 'content': str(result), 'name': tool.function.name}
+
+    except Exception as e:
+        error_msg = f'Error executing {tool.function.name}: {str(e)}'
+        console.print(f"[red]{error_msg}[/red]")
+
+        # Error message for the conversation
+        return {'role': 'system', 'content': f'The previous tool call failed: {error_msg}. Please try a different approach.'}
+
+
+def _group_independent_calls(tool_calls: list) -> List[list]:
     """
-    Handle a tool call by executing the tool and adding the result to the conversation.
+    Split tool calls into consecutive groups that are safe to run at the same time.
+
+    A new group starts whenever a call targets a path already used in the current group,
+    or when an exclusive tool (e.g. a package manager) is involved.
     """
-    for tool in response.message.tool_calls:
-        if function_to_call := ToolRegistry.get_tool(tool.function.name):
-            console.print(f"[cyan]Calling function: {tool.function.name}[/cyan]")
-            args = (tool.function.arguments if isinstance(tool.function.arguments, dict)
-                else json.loads(tool.function.arguments))
-            try:
-                result = function_to_call(**args)
+    groups, paths = [], set()
+    for tool in tool_calls:
+        targets = _target_paths(tool.function.arguments)
+        exclusive = ToolRegistry.is_exclusive(tool.function.name)
+        conflicts = exclusive or bool(targets & paths) or (groups and ToolRegistry.is_exclusive(groups[-1][-1].function.name))
+        if not groups or conflicts:
+            groups.append([])
+            paths = set()
+        groups[-1].append(tool)
+        paths |= targets
+    return groups
+
+
+def _target_paths(arguments: Any) -> set:
+    """Paths a tool call touches, including every file of a batched call."""
+    if not isinstance(arguments, dict):
+        return set()
+    paths = [arguments.get('path')]
+    if isinstance(arguments.get('paths'), list):
+        paths.extend(arguments['paths'])
+    if isinstance(arguments.get('files'), list):
+        paths.extend(item.get('path') for item in arguments['files'] if isinstance(item, dict))
+    return {path for path in paths if isinstance(path, str) and path}
 
-                console.print(f"[green]Function result: {result}[/green]")
-                
-                # Add tool result to conversation
-                development_conversation.append({'role': 'tool', 'content': str(result), 'name': tool.function.name})
 
-            except Exception as e:
-                error_msg = f'Error executing {tool.function.name}: {str(e)}'
-                console.print(f"[red]{error_msg}[/red]")
+async def handle_tool_call(response: ChatResponse, development_conversation: List[dict]) -> List[dict]:
+    """
+    Handle the tool calls in a response by executing them and adding the results to the conversation.
+
+    Independent calls run concurrently; results are added in the order the model made the calls.
+    """
+    known_calls = [tool for tool in response.message.tool_calls if ToolRegistry.get_tool(tool.function.name)]
 
-                # Add error message to conversation
-                development_conversation.append({'role': 'system', 'content': f'The previous tool call failed: {error_msg}. Please try a different approach.'})
+    for group in _group_independent_calls(known_calls):
+        results = await asyncio.gather(*(_execute_tool_call(tool) for tool in group))
+        development_conversation.extend(results)
 
     return development_conversation
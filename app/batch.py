@@ -0,0 +1,159 @@
+"""
+Batch processing of many prompts with a bounded worker pool.
+"""
+from typing import IO, List, Optional
+from pathlib import Path
+import asyncio
+import json
+import os
+import sys
+import time
+from pydantic import BaseModel
+from rich.console import Console
+from rich.markup import escape
+from .agents import ClientManager
+from .workflow import process_workflow, TELEMETRY_DIR_NAME
+from .checkpoint import Checkpoint
+from .workspace import Workspace
+
+console = Console()
+
+# Configuration
+BATCH_WORKERS = int(os.environ.get("BESPOKE_BATCH_WORKERS", "2"))  # Prompts processed at once in batch mode
+BATCH_DIR = Path(os.environ.get("BESPOKE_BATCH_DIR", "batches"))  # Each batch gets a timestamped directory here
+
+
+class RunResult(BaseModel):
+    """Outcome of one prompt in a batch"""
+    index: int
+    prompt: str
+    workspace: str
+    succeeded: bool
+    error: Optional[str] = None
+    seconds: float
+    summary: Optional[str] = None
+    model_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class BatchSummary(BaseModel):
+    """Aggregate throughput of a batch"""
+    batch_dir: str
+    workers: int
+    runs: int
+    succeeded: int
+    failed: int
+    wall_seconds: float
+    runs_per_hour: float
+    mean_run_seconds: float
+    model_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    tokens_per_second: float
+
+
+def read_prompts(source: str, stdin: IO[str] = None) -> List[str]:
+    """
+    Read batch prompts, one per line. Blank lines and lines starting with '#' are skipped.
+
+    Args:
+        source: Path of a prompt file, or '-' for standard input
+        stdin: Stream used for '-' (default: sys.stdin)
+
+    Returns:
+        List[str]: The prompts in order.
+    """
+    if source == "-":
+        lines = (stdin or sys.stdin).read().splitlines()
+    else:
+        lines = Path(source).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+def _read_usage(workspace: Workspace) -> dict:
+    """Token totals from a run's telemetry report."""
+    try:
+        report = json.loads((workspace.state_dir / TELEMETRY_DIR_NAME / "report.json").read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {
+        "model_calls": sum(entry["calls"] for entry in report["models"]),
+        "prompt_tokens": sum(entry["prompt_tokens"] for entry in report["models"]),
+        "completion_tokens": sum(entry["completion_tokens"] for entry in report["models"]),
+    }
+
+
+async def run_batch(prompts: List[str], workers: int = None, batch_dir: Path = None) -> BatchSummary:
+    """
+    Run every prompt through the workflow, each in its own workspace.
+
+    Up to workers prompts run at once and share the pooled Ollama client. Each run
+    builds in batch_dir/run-NNN, with its conversation and result in the run's state
+    directory and its checkpoint under batch_dir/runs. results.jsonl and summary.json
+    are written to batch_dir.
+
+    Args:
+        prompts: User prompts to process
+        workers: Prompts processed at once (default BESPOKE_BATCH_WORKERS)
+        batch_dir: Directory for the batch (default: a new timestamped directory under BESPOKE_BATCH_DIR)
+
+    Returns:
+        BatchSummary: Aggregate throughput of the batch.
+    """
+    workers = max(1, workers or BATCH_WORKERS)
+    batch_dir = batch_dir or BATCH_DIR / time.strftime("%Y%m%d-%H%M%S")
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(workers)
+    console.print(f"[bold blue]Running {len(prompts)} prompts with {workers} workers in {batch_dir}[/bold blue]")
+
+    async def run_one(index: int, prompt: str) -> RunResult:
+        workspace = Workspace(batch_dir / f"run-{index:03d}")
+        async with semaphore:
+            console.print(f"[bold cyan]Starting run {index}:[/bold cyan] {escape(prompt)}")
+            started = time.perf_counter()
+            try:
+                # Other runs share the client and the loaded models, so leave both in place
+                checkpoint = Checkpoint.create(prompt, workspace, runs_dir=batch_dir / "runs")
+                conversation, summary = await process_workflow(prompt, workspace, close_client=False, unload_models=workers == 1, checkpoint=checkpoint)
+                result = RunResult(index=index, prompt=prompt, workspace=str(workspace.root), succeeded=True,
+                                   seconds=time.perf_counter() - started, summary=summary, **_read_usage(workspace))
+                (workspace.state_dir / "conversation.json").write_text(json.dumps(conversation, indent=2, default=str), encoding="utf-8")
+            except Exception as e:
+                result = RunResult(index=index, prompt=prompt, workspace=str(workspace.root), succeeded=False,
+                                   error=str(e), seconds=time.perf_counter() - started, **_read_usage(workspace))
+        status = "[green]succeeded[/green]" if result.succeeded else f"[red]failed: {escape(result.error)}[/red]"
+        console.print(f"[bold cyan]Run {index}[/bold cyan] {status} in {result.seconds:.1f}s")
+        workspace.state_dir.mkdir(parents=True, exist_ok=True)
+        (workspace.state_dir / "result.json").write_text(result.model_dump_json(indent=2), encoding="utf-8")
+        return result
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(run_one(i, prompt) for i, prompt in enumerate(prompts, 1)))
+    finally:
+        await ClientManager.close()
+    wall_seconds = time.perf_counter() - started
+
+    with open(batch_dir / "results.jsonl", "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(result.model_dump_json() + "\n")
+
+    succeeded = sum(result.succeeded for result in results)
+    completion_tokens = sum(result.completion_tokens for result in results)
+    summary = BatchSummary(
+        batch_dir=str(batch_dir),
+        workers=workers,
+        runs=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        wall_seconds=round(wall_seconds, 2),
+        runs_per_hour=round(len(results) / wall_seconds * 3600, 2) if wall_seconds > 0 else 0.0,
+        mean_run_seconds=round(sum(result.seconds for result in results) / len(results), 2) if results else 0.0,
+        model_calls=sum(result.model_calls for result in results),
+        prompt_tokens=sum(result.prompt_tokens for result in results),
+        completion_tokens=completion_tokens,
+        tokens_per_second=round(completion_tokens / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    )
+    (batch_dir / "summary.json").write_text(summary.model_dump_json(indent=2), encoding="utf-8")
+    return summary
@@ -0,0 +1,113 @@
+"""
+Bounded, streaming capture of command output.
+"""
+from typing import List, Optional, Tuple
+from collections import deque
+from pathlib import Path
+import os
+import re
+from rich.console import Console
+from rich.markup import escape
+
+console = Console()
+
+# Configuration
+CAPTURE_HEAD_LINES = int(os.environ.get("BESPOKE_CAPTURE_HEAD_LINES", "20"))  # First lines kept for the model
+CAPTURE_TAIL_LINES = int(os.environ.get("BESPOKE_CAPTURE_TAIL_LINES", "40"))  # Last lines kept for the model
+CAPTURE_ERROR_LINES = int(os.environ.get("BESPOKE_CAPTURE_ERROR_LINES", "20"))  # Error lines kept from the middle
+CAPTURE_LINE_CHARS = 400  # Longer lines are clipped in the summary (the log keeps them whole)
+
+ERROR_PATTERN = re.compile(r"npm ERR!|\bERR!|\berror\b|\bfailed\b|\bfatal\b|Traceback|Exception|ERESOLVE|ENOENT|EACCES", re.IGNORECASE)
+
+
+class OutputCapture:
+    """Keeps the head and tail of a command's output, plus error lines, in bounded memory.
+
+    Every line is also written to a log file on disk and optionally echoed to the
+    console as live progress.
+    """
+
+    def __init__(self, log_path: Path, echo: bool = True,
+                 head_lines: int = CAPTURE_HEAD_LINES, tail_lines: int = CAPTURE_TAIL_LINES,
+                 error_lines: int = CAPTURE_ERROR_LINES):
+        self.log_path = log_path
+        self.echo = echo
+        self.head_lines = head_lines
+        self.head: List[Tuple[int, str]] = []
+        self.tail = deque(maxlen=tail_lines)
+        self.errors: List[Tuple[int, str]] = []
+        self.error_lines = error_lines
+        self.line_count = 0
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._log = open(log_path, "w", encoding="utf-8")
+
+    def feed(self, line: str) -> None:
+        """Record one line of output."""
+        line = line.rstrip("\r\n")
+        self.line_count += 1
+        self._log.write(line + "\n")
+        if self.echo:
+            console.print(f"[dim]  {escape(line)}[/dim]")
+
+        clipped = line if len(line) <= CAPTURE_LINE_CHARS else line[:CAPTURE_LINE_CHARS] + " ..."
+        numbered = (self.line_count, clipped)
+        if len(self.head) < self.head_lines:
+            self.head.append(numbered)
+            return
+        # A line about to fall out of the tail window is kept if it looks like an error
+        if len(self.tail) == self.tail.maxlen:
+            dropped = self.tail[0]
+            if len(self.errors) < self.error_lines and ERROR_PATTERN.search(dropped[1]):
+                self.errors.append(dropped)
+        self.tail.append(numbered)
+
+    def close(self) -> None:
+        """Flush and close the log file."""
+        if not self._log.closed:
+            self._log.close()
+
+    def summary(self) -> str:
+        """
+        Render the captured output for the model.
+
+        Returns:
+            str: Head, error lines from the omitted middle, and tail, with line numbers
+            so the full log can be paged from the right place.
+        """
+        lines = [f"{n}: {text}" for n, text in self.head]
+        omitted = self.line_count - len(self.head) - len(self.tail)
+        if omitted > 0:
+            if self.errors:
+                lines.append(f"... {omitted} lines omitted; error lines among them:")
+                lines.extend(f"{n}: {text}" for n, text in self.errors)
+            else:
+                lines.append(f"... {omitted} lines omitted ...")
+        lines.extend(f"{n}: {text}" for n, text in self.tail)
+        return "\n".join(lines)
+
+
+def read_log_lines(log_path: Path, start_line: int = 1, max_lines: int = 100) -> Optional[str]:
+    """
+    Read a page of a captured log.
+
+    Args:
+        log_path: Log file to read
+        start_line: First line to return (1-based)
+        max_lines: Maximum number of lines to return
+
+    Returns:
+        Optional[str]: Numbered lines, or None if the log does not exist.
+    """
+    if not log_path.exists():
+        return None
+    start_line = max(1, start_line)
+    page = []
+    total = 0
+    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+        for total, line in enumerate(f, 1):
+            if start_line <= total < start_line + max_lines:
+                page.append(f"{total}: {line.rstrip()}")
+    if not page:
+        return f"No lines from {start_line}; the log has {total} lines."
+    end_line = start_line + len(page) - 1
+    return f"Lines {start_line}-{end_line} of {total}:\n" + "\n".join(page)
@@ -0,0 +1,178 @@
+"""
+Checkpoints that let an interrupted workflow run resume where it stopped.
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+import uuid
+from pydantic import BaseModel
+from .agents.compaction import digest_step
+from .workspace import Workspace
+
+# Configuration
+RUNS_DIR = Path(os.environ.get("BESPOKE_RUNS_DIR", "runs"))  # Each run's checkpoint lives in RUNS_DIR/<run-id>/state.json
+CHECKPOINT_RUNS = "BESPOKE_RUNS_DIR" in os.environ  # Library callers save checkpoints only when a runs directory is configured
+
+QA_OUTCOMES = ("QA PASSED", "QA FAILED", "Unable to complete task")
+
+
+class TaskState(BaseModel):
+    """Outcome of one backlog task"""
+    task_id: str
+    status: str  # passed or failed; only passed tasks are skipped on resume
+    digest: str  # One-line summary of the step (see digest_step)
+    messages: List[Dict[str, Any]]  # The step's development messages, replayed on resume
+    finished: float
+
+
+class RunState(BaseModel):
+    """Everything a run has produced so far"""
+    run_id: str
+    task: str
+    workspace: str
+    phase: str = "analysis"  # analysis, backlog, execution, summary or done
+    analysis: Optional[str] = None
+    workflow_conversation: List[Dict[str, Any]] = []
+    backlog: Optional[List[Dict[str, Any]]] = None
+    tasks: Dict[str, TaskState] = {}
+    workspace_hash: Optional[str] = None  # Hash of the workspace contents when the state was saved
+    summary: Optional[str] = None
+    created: float
+    updated: float
+
+
+def workspace_hash(workspace: Workspace) -> str:
+    """Hash of every path and content hash in the workspace."""
+    snapshot = workspace.index.snapshot()
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _plain(message: Any) -> Dict[str, Any]:
+    """A message (dict or ollama Message) as JSON-compatible data, always with a content key."""
+    if hasattr(message, "model_dump"):
+        message = message.model_dump(exclude_none=True)
+    # Turns with only tool calls have no content, but every message is read as having one
+    return json.loads(json.dumps({"content": "", **message}, default=str))
+
+
+def _step_passed(messages: List[Dict[str, Any]]) -> bool:
+    outcomes = [
+        message.get("content") or "" for message in messages
+        if message.get("role") == "assistant" and (message.get("content") or "").startswith(QA_OUTCOMES)
+    ]
+    return bool(outcomes) and outcomes[-1].startswith("QA PASSED")
+
+
+class Checkpoint:
+    """Run state saved to RUNS_DIR/<run-id>/state.json after every phase and backlog task.
+
+    The analysis, the validated backlog and each finished task (status, digest and
+    messages) are recorded as they complete; a hash of the workspace is recorded at
+    phase boundaries. Resuming a run skips the analysis and backlog calls if they
+    finished and every task that passed QA. The state file is replaced atomically, so
+    a run killed mid-write still leaves the previous checkpoint intact. A checkpoint
+    without a directory (see unsaved) only tracks the state in memory.
+    """
+
+    def __init__(self, state: RunState, directory: Optional[Path]):
+        self.state = state
+        self.directory = directory
+
+    @property
+    def path(self) -> Path:
+        return self.directory / "state.json"
+
+    @classmethod
+    def create(cls, task: str, workspace: Workspace, runs_dir: Path = None) -> "Checkpoint":
+        """Start a checkpoint for a new run."""
+        state = cls._new_state(task, workspace)
+        checkpoint = cls(state, (runs_dir or RUNS_DIR) / state.run_id)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def unsaved(cls, task: str, workspace: Workspace) -> "Checkpoint":
+        """Track a new run's state without writing it anywhere."""
+        return cls(cls._new_state(task, workspace), None)
+
+    @staticmethod
+    def _new_state(task: str, workspace: Workspace) -> RunState:
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        now = time.time()
+        return RunState(run_id=run_id, task=task, workspace=str(workspace.root.resolve()), created=now, updated=now)
+
+    @classmethod
+    def load(cls, run: str, runs_dir: Path = None) -> "Checkpoint":
+        """
+        Load a run's checkpoint.
+
+        Args:
+            run: Run ID under runs_dir, or the path of a run directory
+            runs_dir: Directory of runs (default BESPOKE_RUNS_DIR)
+
+        Raises:
+            FileNotFoundError: If the run has no checkpoint.
+        """
+        directory = Path(run) if (Path(run) / "state.json").is_file() else (runs_dir or RUNS_DIR) / run
+        state = RunState.model_validate_json((directory / "state.json").read_text(encoding="utf-8"))
+        return cls(state, directory)
+
+    def save(self, workspace: Optional[Workspace] = None) -> None:
+        """Write the state, recording the workspace hash if a workspace is given."""
+        self.state.updated = time.time()
+        if self.directory is None:
+            return
+        if workspace is not None:
+            self.state.workspace_hash = workspace_hash(workspace)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(f".tmp-{uuid.uuid4().hex[:6]}")
+        temporary.write_text(self.state.model_dump_json(indent=2), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def record_analysis(self, analysis: str, workflow_conversation: List[Dict]) -> None:
+        self.state.analysis = analysis
+        self.state.workflow_conversation = [_plain(message) for message in workflow_conversation]
+        self.state.phase = "backlog"
+        self.save()
+
+    def record_backlog(self, backlog: List[Dict], workflow_conversation: List[Dict]) -> None:
+        self.state.backlog = backlog
+        self.state.workflow_conversation = [_plain(message) for message in workflow_conversation]
+        self.state.phase = "execution"
+        self.save()
+
+    def record_task(self, step: Dict, messages: List[Any]) -> None:
+        """Record a finished backlog task and its development messages."""
+        messages = [_plain(message) for message in messages]
+        task_id = step.get("task_id") or "?"
+        self.state.tasks[task_id] = TaskState(
+            task_id=task_id,
+            status="passed" if _step_passed(messages) else "failed",
+            digest=digest_step(messages),
+            messages=messages,
+            finished=time.time(),
+        )
+        self.save()
+
+    def enter_phase(self, phase: str, workspace: Optional[Workspace] = None) -> None:
+        self.state.phase = phase
+        self.save(workspace)
+
+    def record_summary(self, summary: str, workflow_conversation: List[Dict], workspace: Workspace) -> None:
+        self.state.summary = summary
+        self.state.workflow_conversation = [_plain(message) for message in workflow_conversation]
+        self.state.phase = "done"
+        self.save(workspace)
+
+    def completed_messages(self, task_id: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """The messages of a task that passed in an earlier attempt at this run, if any."""
+        task = self.state.tasks.get(task_id or "?")
+        return task.messages if task is not None and task.status == "passed" else None
+
+    def discard_tasks(self) -> None:
+        """Forget task results that belong to a backlog that was never saved."""
+        self.state.tasks = {}
+        self.save()
@@ -1,30 +1,51 @@
 """
 Main CLI interface for the Bespoke Dev AI agent.
 """
+from typing import Optional
 import asyncio
 import typer
 from rich.console import Console
-from .workflow import process_workflow
-from .tools import ToolRegistry
+from .workflow import process_workflow, resume_workflow
+from .checkpoint import Checkpoint
+from .batch import BATCH_WORKERS, read_prompts, run_batch
+from .tools import ToolRegistry, current_workspace
 from rich.markup import escape
 
 app = typer.Typer()
 console = Console()
 
 @app.command()
-def process(user_prompt: str):
-    """Process a development task using the AI agent."""
+def process(
+    user_prompt: Optional[str] = typer.Argument(None, help="Development task to process"),
+    batch: Optional[str] = typer.Option(None, "--batch", help="File of prompts, one per line, or '-' for stdin"),
+    workers: int = typer.Option(BATCH_WORKERS, "--workers", help="Prompts processed at once in batch mode"),
+    resume: Optional[str] = typer.Option(None, "--resume", help="Continue an interrupted run from its checkpoint (run ID or run directory)"),
+):
+    """Process a development task using the AI agent, or a batch of them with --batch."""
+    if batch is not None:
+        return process_batch(batch, workers)
+    if not user_prompt and not resume:
+        console.print("[red]Provide a prompt, --batch FILE or --resume RUN[/red]")
+        raise typer.Exit(2)
+    if resume and not _has_checkpoint(resume):
+        console.print(f"[red]No checkpoint found for run {escape(resume)}[/red]")
+        raise typer.Exit(2)
     try:
         console.print(f"\n[bold blue]Starting Bespoke Dev AI[/bold blue]")
-        console.print(f"[blue]User Prompt:[/blue] {user_prompt}")
-        # console.print(f"[orange]{ToolRegistry.get_all_tools()}[/orange]")
-        console.print("\n[blue]Initializing workflow...[/blue]")
-        
-        results, summary = asyncio.run(process_workflow(user_prompt))
+        if resume:
+            results, summary = asyncio.run(resume_workflow(resume))
+        else:
+            console.print(f"[blue]User Prompt:[/blue] {user_prompt}")
+            # console.print(f"[orange]{ToolRegistry.get_all_tools()}[/orange]")
+            console.print("\n[blue]Initializing workflow...[/blue]")
+
+            # The CLI always checkpoints so an interrupted run can be resumed
+            checkpoint = Checkpoint.create(user_prompt, current_workspace())
+            results, summary = asyncio.run(process_workflow(user_prompt, checkpoint=checkpoint))
         
         console.print("\n[dim green]Conversation:[/dim green]")
         for result in results:
-            console.print(f"\n[bold cyan]Role:[/bold cyan] {result['role']}\n[bold green]Content:[/bold green] [dim]{result['content']}[/dim]")            
+            console.print(f"\n[bold cyan]Role:[/bold cyan] {result['role']}\n[bold green]Content:[/bold green] [dim]{result.get('content')}[/dim]")            
 
 
         console.print("\n[bold green]Summary:[/bold green]")
@@ -40,6 +61,31 @@ def process(user_prompt: str):
         console.print(f"[dim red]{escape(traceback.format_exc())}[/dim red]")
         raise typer.Exit(1)
 
+def _has_checkpoint(run: str) -> bool:
+    try:
+        Checkpoint.load(run)
+    except FileNotFoundError:
+        return False
+    return True
+
+def process_batch(source: str, workers: int):
+    """Run every prompt in a batch file through the workflow, each in its own workspace."""
+    try:
+        prompts = read_prompts(source)
+        if not prompts:
+            console.print("[yellow]No prompts to process[/yellow]")
+            return None
+        summary = asyncio.run(run_batch(prompts, workers))
+        console.print("\n[bold green]Batch summary:[/bold green]")
+        console.print(summary.model_dump_json(indent=2))
+        if summary.failed:
+            raise typer.Exit(1)
+        return summary
+    except (OSError, ValueError) as e:
+        console.print(f"\n[bold red]Error occurred:[/bold red]")
+        console.print(f"[red]{escape(str(e))}[/red]")
+        raise typer.Exit(1)
+
 def main():
     app()
 
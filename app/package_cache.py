@@ -0,0 +1,387 @@
+"""
+Shared package stores that let runs reuse installed dependencies.
+"""
+from typing import Callable, Dict, List, Optional
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Configuration
+NPM_STORE_ENABLED = os.environ.get("BESPOKE_NPM_STORE", "1").lower() not in ("0", "false", "no")  # Reuse node_modules across runs
+NPM_STORE_DIR = Path(os.environ.get("BESPOKE_NPM_STORE_DIR", ".bespoke_cache/npm"))  # Installed trees and the npm download cache
+NPM_STORE_MAX_ENTRIES = int(os.environ.get("BESPOKE_NPM_STORE_MAX_ENTRIES", "20"))  # Installs kept before the least recently used is evicted
+NPM_OFFLINE = os.environ.get("BESPOKE_NPM_OFFLINE", "").lower() in ("1", "true", "yes")  # Never contact the registry
+PIP_POOL_ENABLED = os.environ.get("BESPOKE_PIP_POOL", "1").lower() not in ("0", "false", "no")  # Reuse venvs across runs
+PIP_POOL_DIR = Path(os.environ.get("BESPOKE_PIP_POOL_DIR", ".bespoke_cache/pip"))  # Pooled venvs and the wheel cache
+PIP_POOL_MAX_ENTRIES = int(os.environ.get("BESPOKE_PIP_POOL_MAX_ENTRIES", "10"))  # Venvs kept before the least recently used is evicted
+PIP_OFFLINE = os.environ.get("BESPOKE_PIP_OFFLINE", "").lower() in ("1", "true", "yes")  # Install only from the wheel cache
+
+INSTALL_COMMANDS = {"install", "i", "ci", "add"}
+MANIFEST_FILES = ("package.json", "package-lock.json")
+VENV_DIR_NAME = ".venv"  # Each workspace's own environment; the workspace index skips it
+VENV_RECORD = "bespoke-requirements.json"  # Requirements installed into a venv through run_pip
+
+
+@lru_cache(maxsize=None)
+def _node_version() -> str:
+    """Node version, part of every key since native modules are built against it."""
+    try:
+        return subprocess.run(["node", "--version"], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+FICLONE = 0x40049409  # Linux ioctl that makes a copy-on-write clone of a file
+_no_reflink = set()  # Devices where cloning failed, so plain copies are used straight away
+
+
+def _reflink_or_copy(source: str, target: str) -> None:
+    """Copy a file, sharing its blocks copy-on-write where the filesystem supports it (btrfs, XFS)."""
+    device = os.stat(os.path.dirname(target) or ".").st_dev
+    if fcntl is not None and device not in _no_reflink:
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, target)
+            return
+        except OSError:
+            _no_reflink.add(device)
+    shutil.copy2(source, target)
+
+
+def _clone(source: Path, target: Path) -> None:
+    """Copy a file or tree, as copy-on-write clones where the filesystem allows.
+
+    Nothing is hardlinked: npm rewrites node_modules/.package-lock.json and package
+    manifests in place, pip rewrites RECORD files, and install scripts write into
+    package directories, so a shared inode would carry one workspace's changes into
+    the store and every later checkout.
+    """
+    if source.is_file():
+        _reflink_or_copy(str(source), str(target))
+        return
+    shutil.copytree(source, target, symlinks=True, copy_function=_reflink_or_copy)
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+def _publish(root: Path, entry: Path, build: Callable[[Path], None]) -> None:
+    """Build a store entry in a staging directory and rename it into place.
+
+    Concurrent runs never see a partial entry; if another run publishes the same
+    entry first, this one is discarded.
+    """
+    staging = root / f"tmp-{uuid.uuid4().hex}"
+    try:
+        staging.mkdir(parents=True)
+        build(staging)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(staging, entry)
+    except OSError:
+        pass  # Another run stored the same key first, or the store is unwritable
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def _evict(pattern: str, root: Path, max_entries: int) -> None:
+    """Remove the least recently used entries beyond max_entries (by their metadata mtime)."""
+    entries = sorted(root.glob(pattern), key=lambda meta: meta.stat().st_mtime)
+    for meta in entries[:max(0, len(entries) - max_entries)]:
+        shutil.rmtree(meta.parent, ignore_errors=True)
+
+
+class NpmStore:
+    """Content-addressed store of npm install results.
+
+    An entry is keyed by the command, the project's package.json and package-lock.json
+    before it ran, the Node version and the platform. It holds what the command
+    produced: for installs the manifests and node_modules, for npx scaffolds the
+    project directories it created. Restoring an entry copies node_modules from the
+    store (as copy-on-write clones where the filesystem supports them), so a repeated
+    install of the same stack takes seconds and no network.
+
+    Entries are published atomically, so concurrent runs never see a partial entry.
+    The entry's metadata mtime is the LRU clock used for eviction.
+    """
+
+    def __init__(self, root: Path = None, max_entries: int = None):
+        self.root = (root or NPM_STORE_DIR).resolve()
+        self.max_entries = max_entries or NPM_STORE_MAX_ENTRIES
+
+    @property
+    def download_cache(self) -> Path:
+        """npm's own tarball cache, shared by every run."""
+        return self.root / "_cacache"
+
+    def environment(self, offline: bool = None) -> Dict[str, str]:
+        """
+        Environment variables that point npm at the shared download cache.
+
+        Args:
+            offline: Forbid network access (default BESPOKE_NPM_OFFLINE)
+
+        Returns:
+            Dict[str, str]: Variables to add to the npm process environment.
+        """
+        offline = NPM_OFFLINE if offline is None else offline
+        env = {
+            "npm_config_cache": str(self.download_cache),
+            "npm_config_audit": "false",
+            "npm_config_fund": "false",
+            "npm_config_update_notifier": "false",
+        }
+        env["npm_config_offline" if offline else "npm_config_prefer_offline"] = "true"
+        return env
+
+    def key(self, project: Path, args: List[str]) -> Optional[str]:
+        """
+        Cache key for running an npm/npx command in a project, or None if it isn't cacheable.
+
+        Only installs (npm install/i/ci/add) and npx scaffolds are cached; global
+        installs and commands that point npm at another directory are not.
+        """
+        if len(args) < 2 or any(arg in ("-g", "--global") or arg.startswith("--prefix") for arg in args):
+            return None
+        if not (args[0] == "npx" or (args[0] == "npm" and args[1] in INSTALL_COMMANDS)):
+            return None
+        digest = hashlib.sha256()
+        for part in (_node_version(), platform.system(), platform.machine(), json.dumps(args)):
+            digest.update(part.encode("utf-8") + b"\0")
+        for name in MANIFEST_FILES:
+            manifest = project / name
+            digest.update(manifest.read_bytes() if manifest.is_file() else b"-")
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def restore(self, key: str, project: Path, replace: bool = True) -> Optional[List[str]]:
+        """
+        Materialise a stored result in a project.
+
+        Args:
+            key: Key of the command
+            project: Directory to restore into
+            replace: Replace existing paths; otherwise an entry whose paths already
+                exist counts as a miss (e.g. a scaffold into an existing directory)
+
+        Returns:
+            Optional[List[str]]: The restored paths (relative to the project), or None on a miss.
+        """
+        entry = self._entry(key)
+        try:
+            meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        items = meta["items"]
+        if not replace and any((project / item).exists() for item in items):
+            return None
+        for item in items:
+            _remove(project / item)
+            _clone(entry / "files" / item, project / item)
+        os.utime(entry / "meta.json")  # Mark as recently used
+        return items
+
+    def save(self, key: str, project: Path, items: List[str], command: str) -> None:
+        """
+        Store what a successful command produced in a project.
+
+        Args:
+            key: Key computed before the command ran
+            project: Directory the command ran in
+            items: Relative paths of the files and directories it produced
+            command: The command, recorded for reference
+        """
+        entry = self._entry(key)
+        items = [item for item in items if (project / item).exists()]
+        if entry.exists() or not items:
+            return
+
+        def build(staging: Path) -> None:
+            (staging / "files").mkdir()
+            for item in items:
+                _clone(project / item, staging / "files" / item)
+            (staging / "meta.json").write_text(json.dumps({"command": command, "items": items, "created": time.time()}), encoding="utf-8")
+
+        _publish(self.root, entry, build)
+        _evict("??/*/meta.json", self.root, self.max_entries)
+
+
+def produced_items(args: List[str], before: List[str], project: Path) -> List[str]:
+    """
+    What an npm/npx command produced in a project, for storing.
+
+    Installs produce the manifests and node_modules; npx scaffolds produce the new
+    top-level directories that contain a package.json.
+
+    Args:
+        args: The command that ran
+        before: Top-level entries of the project before it ran
+        project: Directory the command ran in
+    """
+    if args[0] == "npm":
+        return [*MANIFEST_FILES, "node_modules"]
+    return sorted(
+        entry.name for entry in project.iterdir()
+        if entry.name not in before and entry.is_dir() and (entry / "package.json").is_file()
+    )
+
+
+def venv_python(venv: Path) -> Path:
+    """The interpreter of a venv."""
+    return venv / ("Scripts/python.exe" if os.name == "nt" else "bin/python")
+
+
+class VenvPool:
+    """Pool of pre-built virtualenvs keyed by the requirements installed into them.
+
+    Every workspace gets its own venv (VENV_DIR_NAME), so run_pip never touches the
+    environment the agent runs in. After a successful install the venv is saved to the
+    pool under a hash of its full requirement set, the interpreter and the platform. A
+    later workspace that asks for the same set checks the pooled venv out instead of
+    installing: the venv is copied (see _clone) and its scripts are rewritten to point at
+    the new location. Installs the key can't describe (-r, -e) leave the venv out of the
+    pool for good.
+
+    Downloaded distributions are kept as wheels in a shared wheelhouse, so installs run
+    with --no-index whenever the wheelhouse already holds everything they need.
+    """
+
+    def __init__(self, root: Path = None, max_entries: int = None):
+        self.root = (root or PIP_POOL_DIR).resolve()
+        self.max_entries = max_entries or PIP_POOL_MAX_ENTRIES
+
+    @property
+    def wheelhouse(self) -> Path:
+        """Wheels of every distribution installed so far, shared by all runs."""
+        return self.root / "wheels"
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables for pip processes."""
+        return {
+            "PIP_CACHE_DIR": str(self.root / "http-cache"),
+            "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+        }
+
+    @staticmethod
+    def key(requirements: List[str]) -> str:
+        """Pool key for a venv holding exactly these requirements."""
+        digest = hashlib.sha256()
+        for part in (sys.version, sys.executable, platform.system(), platform.machine()):
+            digest.update(part.encode("utf-8") + b"\0")
+        digest.update(json.dumps(sorted({requirement.lower() for requirement in requirements})).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / "venvs" / key
+
+    @staticmethod
+    def _read_record(venv: Path) -> Dict:
+        try:
+            record = json.loads((venv / VENV_RECORD).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        # Records written before the poolable flag are plain lists
+        return {"requirements": record} if isinstance(record, list) else record
+
+    @classmethod
+    def installed(cls, venv: Path) -> Optional[List[str]]:
+        """Requirements installed into a venv through run_pip, or None if there is no usable venv."""
+        if not venv_python(venv).exists():
+            return None
+        return cls._read_record(venv).get("requirements", [])
+
+    @classmethod
+    def is_poolable(cls, venv: Path) -> bool:
+        """Whether the record lists everything installed in a venv, so it may be pooled or replaced by a pooled one."""
+        return cls._read_record(venv).get("poolable", True)
+
+    @staticmethod
+    def record(venv: Path, requirements: List[str], poolable: bool = True) -> None:
+        """
+        Remember the requirements installed into a venv.
+
+        Args:
+            venv: Venv the requirements were installed into
+            requirements: Requirement specifiers installed so far
+            poolable: False once something the specifiers don't describe (e.g. -r or -e) was installed
+        """
+        record = {"requirements": sorted(set(requirements)), "poolable": poolable}
+        (venv / VENV_RECORD).write_text(json.dumps(record), encoding="utf-8")
+
+    def has_wheel_for(self, requirements: List[str]) -> bool:
+        """Whether the wheelhouse holds a wheel for any of the distributions the specifiers name."""
+        names = {_normalize_name(re.split(r"[\s<>=!~;@\[]", requirement, 1)[0]) for requirement in requirements}
+        wheels = self.wheelhouse.glob("*.whl") if self.wheelhouse.is_dir() else []
+        return any(_normalize_name(wheel.name.split("-", 1)[0]) in names for wheel in wheels)
+
+    def checkout(self, key: str, venv: Path) -> bool:
+        """
+        Replace a venv with a copy of the pooled venv for a key.
+
+        Returns:
+            bool: Whether the pool had a venv for the key.
+        """
+        entry = self._entry(key)
+        if not (entry / "venv").is_dir():
+            return False
+        _remove(venv)
+        _clone(entry / "venv", venv)
+        _relocate(venv, str(entry / "venv"))
+        os.utime(entry / "meta.json")  # Mark as recently used
+        return True
+
+    def save(self, key: str, venv: Path) -> None:
+        """Add a copy of a venv to the pool, unless the key is already pooled."""
+        entry = self._entry(key)
+        if entry.exists():
+            return
+
+        def build(staging: Path) -> None:
+            _clone(venv, staging / "venv")
+            _relocate(staging / "venv", os.path.abspath(venv), str(entry / "venv"))
+            (staging / "meta.json").write_text(json.dumps({"created": time.time()}), encoding="utf-8")
+
+        _publish(self.root, entry, build)
+        _evict("venvs/*/meta.json", self.root, self.max_entries)
+
+
+def _normalize_name(name: str) -> str:
+    """Distribution name as compared by pip (PEP 503), which also matches wheel file names."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _relocate(venv: Path, old: str, new: str = None) -> None:
+    """Rewrite the absolute venv path baked into its scripts and pyvenv.cfg."""
+    new = new or os.path.abspath(venv)
+    scripts = venv / ("Scripts" if os.name == "nt" else "bin")
+    for path in [venv / "pyvenv.cfg", *(scripts.iterdir() if scripts.is_dir() else [])]:
+        if path.is_symlink() or not path.is_file():
+            continue
+        try:
+            content = path.read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            continue  # Compiled launchers
+        if old in content:
+            path.write_text(content.replace(old, new), encoding="utf-8")
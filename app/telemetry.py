@@ -0,0 +1,239 @@
+"""
+Per-run telemetry for model calls and tool executions.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+import json
+import threading
+from pydantic import BaseModel
+
+NANOSECONDS = 1e9
+
+
+class ModelCall(BaseModel):
+    """Metrics Ollama reported for one chat request"""
+    agent: str = ""
+    model: str = ""
+    task_id: Optional[str] = None
+    attempt: Optional[int] = None
+    cached: bool = False  # Answered from the response cache; no model time was spent
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    prompt_eval_seconds: float = 0.0
+    eval_seconds: float = 0.0
+    load_seconds: float = 0.0
+    total_seconds: float = 0.0  # Server-side time for the whole request
+    wall_seconds: float = 0.0  # Client-side time until the response (or last stream chunk) arrived
+    queue_seconds: float = 0.0  # Time the request waited in the model request scheduler
+
+
+class ToolTiming(BaseModel):
+    """One tool execution"""
+    tool: str
+    agent: str = ""
+    task_id: Optional[str] = None
+    attempt: Optional[int] = None
+    seconds: float
+    error: bool = False
+
+
+class Telemetry:
+    """Collects model call metrics and tool timings for one workflow run.
+
+    Records are tagged with the agent, backlog task ID and attempt number active in
+    the context that made them (see telemetry_tags). Tools running on worker threads
+    record into the same collector, so all methods are thread-safe.
+    """
+
+    def __init__(self):
+        self.model_calls: List[ModelCall] = []
+        self.tool_timings: List[ToolTiming] = []
+        self._lock = threading.Lock()
+
+    def add_model_call(self, call: ModelCall) -> None:
+        with self._lock:
+            self.model_calls.append(call)
+
+    def add_tool_timing(self, timing: ToolTiming) -> None:
+        with self._lock:
+            self.tool_timings.append(timing)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Aggregate the run's records.
+
+        Returns:
+            Dict[str, Any]: Totals per agent and model, per tool and per backlog task,
+            plus every raw record.
+        """
+        with self._lock:
+            model_calls, tool_timings = list(self.model_calls), list(self.tool_timings)
+
+        models: Dict[str, Dict[str, Any]] = {}
+        for call in model_calls:
+            entry = models.setdefault(f"{call.agent}/{call.model}", {
+                "agent": call.agent, "model": call.model, "calls": 0, "cached_calls": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "prompt_eval_seconds": 0.0,
+                "eval_seconds": 0.0, "load_seconds": 0.0, "total_seconds": 0.0, "wall_seconds": 0.0, "queue_seconds": 0.0,
+            })
+            entry["calls"] += 1
+            entry["cached_calls"] += call.cached
+            if call.cached:
+                continue
+            for field in ("prompt_tokens", "completion_tokens", "prompt_eval_seconds", "eval_seconds", "load_seconds", "total_seconds", "wall_seconds", "queue_seconds"):
+                entry[field] += getattr(call, field)
+        for entry in models.values():
+            entry["prompt_tokens_per_second"] = _rate(entry["prompt_tokens"], entry["prompt_eval_seconds"])
+            entry["generation_tokens_per_second"] = _rate(entry["completion_tokens"], entry["eval_seconds"])
+
+        tools: Dict[str, Dict[str, Any]] = {}
+        for timing in tool_timings:
+            entry = tools.setdefault(timing.tool, {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0})
+            entry["calls"] += 1
+            entry["errors"] += timing.error
+            entry["seconds"] += timing.seconds
+            entry["max_seconds"] = max(entry["max_seconds"], timing.seconds)
+
+        tasks: Dict[str, Dict[str, Any]] = {}
+        for record in [*model_calls, *tool_timings]:
+            if record.task_id is None:
+                continue
+            entry = tasks.setdefault(record.task_id, {"attempts": 0, "model_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "model_seconds": 0.0, "tool_calls": 0, "tool_seconds": 0.0})
+            entry["attempts"] = max(entry["attempts"], record.attempt or 0)
+            if isinstance(record, ModelCall):
+                entry["model_calls"] += 1
+                entry["prompt_tokens"] += record.prompt_tokens
+                entry["completion_tokens"] += record.completion_tokens
+                entry["model_seconds"] += record.wall_seconds
+            else:
+                entry["tool_calls"] += 1
+                entry["tool_seconds"] += record.seconds
+
+        return {
+            "models": list(models.values()),
+            "tools": tools,
+            "tasks": tasks,
+            "model_calls": [call.model_dump() for call in model_calls],
+            "tool_timings": [timing.model_dump() for timing in tool_timings],
+        }
+
+    def to_json(self) -> str:
+        """Render the run report as JSON."""
+        return json.dumps(self.report(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render the run totals in the Prometheus text exposition format."""
+        report = self.report()
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(str(label))}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        model_labels = [({"agent": entry["agent"], "model": entry["model"]}, entry) for entry in report["models"]]
+        for field, help_text in (
+            ("calls", "Model calls"),
+            ("cached_calls", "Model calls answered from the response cache"),
+            ("prompt_tokens", "Prompt tokens evaluated"),
+            ("completion_tokens", "Tokens generated"),
+            ("prompt_eval_seconds", "Time spent evaluating prompts"),
+            ("eval_seconds", "Time spent generating tokens"),
+            ("load_seconds", "Time spent loading models"),
+            ("wall_seconds", "Client-side time waiting for responses"),
+            ("queue_seconds", "Time requests waited for the model request scheduler"),
+        ):
+            metric(f"bespoke_model_{field}_total", help_text, [(labels, entry[field]) for labels, entry in model_labels])
+
+        tool_labels = [({"tool": tool}, entry) for tool, entry in report["tools"].items()]
+        metric("bespoke_tool_calls_total", "Tool executions", [(labels, entry["calls"]) for labels, entry in tool_labels])
+        metric("bespoke_tool_errors_total", "Tool executions that failed", [(labels, entry["errors"]) for labels, entry in tool_labels])
+        metric("bespoke_tool_seconds_total", "Time spent executing tools", [(labels, entry["seconds"]) for labels, entry in tool_labels])
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: Path) -> None:
+        """Write report.json and metrics.prom to a directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "report.json").write_text(self.to_json(), encoding="utf-8")
+        (directory / "metrics.prom").write_text(self.to_prometheus(), encoding="utf-8")
+
+
+def _rate(tokens: int, seconds: float) -> Optional[float]:
+    return round(tokens / seconds, 2) if seconds > 0 else None
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# The run's collector and the tags for records made in the current context
+_current_telemetry = ContextVar("current_telemetry", default=None)
+_current_tags = ContextVar("current_telemetry_tags", default={})
+
+
+@contextmanager
+def collect_telemetry() -> Iterator[Telemetry]:
+    """Collect telemetry for everything run in the current context (e.g. one workflow run)."""
+    telemetry = Telemetry()
+    token = _current_telemetry.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _current_telemetry.reset(token)
+
+
+@contextmanager
+def telemetry_tags(**tags: Any) -> Iterator[None]:
+    """Tag records made in the current context with agent, task_id and/or attempt."""
+    token = _current_tags.set({**_current_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _current_tags.reset(token)
+
+
+def set_telemetry_tags(**tags: Any) -> None:
+    """Update the tags of the enclosing telemetry_tags block (e.g. the attempt number)."""
+    _current_tags.set({**_current_tags.get(), **tags})
+
+
+def record_model_call(model: str, response: Any, wall_seconds: float, cached: bool = False, queue_seconds: float = 0.0) -> None:
+    """
+    Record a chat response's metrics with the active collector, if any.
+
+    Args:
+        model: Model the request was sent to
+        response: ChatResponse, or the final chunk of a stream
+        wall_seconds: Client-side time until the response was complete
+        cached: Whether the response came from the response cache
+        queue_seconds: Time the request waited before being sent
+    """
+    telemetry = _current_telemetry.get()
+    if telemetry is None:
+        return
+    if cached:
+        telemetry.add_model_call(ModelCall(model=model, cached=True, wall_seconds=wall_seconds, **_current_tags.get()))
+        return
+    telemetry.add_model_call(ModelCall(
+        model=model,
+        prompt_tokens=getattr(response, "prompt_eval_count", None) or 0,
+        completion_tokens=getattr(response, "eval_count", None) or 0,
+        prompt_eval_seconds=(getattr(response, "prompt_eval_duration", None) or 0) / NANOSECONDS,
+        eval_seconds=(getattr(response, "eval_duration", None) or 0) / NANOSECONDS,
+        load_seconds=(getattr(response, "load_duration", None) or 0) / NANOSECONDS,
+        total_seconds=(getattr(response, "total_duration", None) or 0) / NANOSECONDS,
+        wall_seconds=wall_seconds,
+        queue_seconds=queue_seconds,
+        **_current_tags.get(),
+    ))
+
+
+def record_tool_call(tool: str, seconds: float, error: bool = False) -> None:
+    """Record a tool execution with the active collector, if any."""
+    telemetry = _current_telemetry.get()
+    if telemetry is not None:
+        telemetry.add_tool_timing(ToolTiming(tool=tool, seconds=seconds, error=error, **_current_tags.get()))
@@ -1,28 +1,61 @@
 """
 Tool registry and file operation tools.
 """
-from typing import Dict, List, Callable, Any
-from functools import wraps
+from typing import Dict, List, Callable, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import wraps, partial
 from pathlib import Path
 from rich.console import Console
+import asyncio
+import contextvars
+import difflib
+import json
+import re
 import subprocess
+import sys
 import os
+from .workspace import Workspace, active_workspace, record_change, record_command_changes, STATE_DIR_NAME
+from .capture import OutputCapture, read_log_lines
+from .package_cache import (
+    NPM_STORE_ENABLED, PIP_OFFLINE, PIP_POOL_ENABLED, VENV_DIR_NAME,
+    NpmStore, VenvPool, produced_items, venv_python
+)
+from .telemetry import record_tool_call
+from pydantic import BaseModel
+import time
 
 console = Console()
 
 # Configuration
-OUTPUT_DIR = Path("output")  # Directory for generated files
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR = Path(os.environ.get("BESPOKE_OUTPUT_DIR", "output"))  # Directory for generated files
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+TOOL_WORKERS = int(os.environ.get("BESPOKE_TOOL_WORKERS", "4"))  # Threads available to synchronous tools
+MAX_BATCH_FILES = int(os.environ.get("BESPOKE_MAX_BATCH_FILES", "50"))  # Files accepted by one batched file tool call
+READ_FILE_MAX_BYTES = int(os.environ.get("BESPOKE_READ_FILE_MAX_KB", "24")) * 1024  # Larger reads are cut off with a notice
+PATCH_CONTEXT_LINES = int(os.environ.get("BESPOKE_PATCH_CONTEXT_LINES", "3"))  # Unchanged lines shown around each edit
+
+# Bounded pool so blocking file I/O never runs on the event loop
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="bespoke-tool")
+
+# Used by the tools unless a run selects its own workspace with use_workspace
+default_workspace = Workspace(OUTPUT_DIR)
+
+
+def current_workspace() -> Workspace:
+    """The workspace of the run in the current context, or the default output directory."""
+    return active_workspace() or default_workspace
+
 
 def normalize_path(path: str) -> Path:
     """
-    Normalize a path to be relative to OUTPUT_DIR and resolve any '..' or '.' while allowing safe nested directories.
+    Normalize a path to be relative to the current workspace and resolve any '..' or '.' while allowing safe nested directories.
     
     Args:
         path (str): Path to normalize, can include subdirectories (e.g., 'src/utils/helper.py')
         
     Returns:
-        Path: Normalized path relative to OUTPUT_DIR
+        Path: Normalized path inside the current workspace (OUTPUT_DIR by default)
         
     Example:
         >>> normalize_path('src/utils/helper.py')
@@ -32,9 +65,11 @@ def normalize_path(path: str) -> Path:
         >>> normalize_path('/absolute/path/file.py')  # Attempts absolute path
         Path('output/file.py')
     """
+    root = current_workspace().root
+
     # Handle empty path and './' as root directory
     if path in ('', '.', './'):
-        return OUTPUT_DIR
+        return root
     
     clean_path = Path(path)
     
@@ -45,17 +80,17 @@ def normalize_path(path: str) -> Path:
     parts = [p for p in parts if p != '.']
     
     if not parts:
-        return OUTPUT_DIR
+        return root
         
-    # Reconstruct path relative to OUTPUT_DIR
-    safe_path = OUTPUT_DIR.joinpath(*parts)
+    # Reconstruct path relative to the workspace root
+    safe_path = root.joinpath(*parts)
     
-    # Ensure the final path is still within OUTPUT_DIR
+    # Ensure the final path is still within the workspace
     try:
-        safe_path.relative_to(OUTPUT_DIR)
+        safe_path.relative_to(root)
     except ValueError:
-        # If path somehow escapes OUTPUT_DIR, fall back to just the filename
-        safe_path = OUTPUT_DIR / parts[-1]
+        # If path somehow escapes the workspace, fall back to just the filename
+        safe_path = root / parts[-1]
         
     return safe_path
 
@@ -64,17 +99,31 @@ class ToolRegistry:
     _tools: Dict[str, Dict[str, Any]] = {}
     
     @classmethod
-    def register(cls, name: str = None, description: str = None, input_schema: Dict = None):
-        """Decorator to register a tool function with its schema."""
+    def register(cls, name: str = None, description: str = None, input_schema: Dict = None,
+                 exclusive: bool = False, required: List[str] = None):
+        """Decorator to register a tool function with its schema.
+
+        Every parameter in input_schema is required unless a list of required names is given.
+
+        Both plain functions and coroutine functions can be registered. Exclusive tools
+        (e.g. package managers that touch the whole workspace) never run alongside other tools.
+        """
         def decorator(func: Callable):
             nonlocal name, description, input_schema
             name = name or func.__name__
             description = description or func.__doc__
-            
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                console.print(f"[dim]Executing {name}[/dim]")
-                return func(*args, **kwargs)
+            is_async = asyncio.iscoroutinefunction(func)
+
+            if is_async:
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    console.print(f"[dim]Executing {name}[/dim]")
+                    return await func(*args, **kwargs)
+            else:
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    console.print(f"[dim]Executing {name}[/dim]")
+                    return func(*args, **kwargs)
             
             tool_def = {
                 "name": name,
@@ -82,9 +131,11 @@ class ToolRegistry:
                 "parameters": {
                     "type": "object",
                     "properties": input_schema or {},
-                    "required": list(input_schema.keys()) if input_schema else []
+                    "required": required if required is not None else (list(input_schema.keys()) if input_schema else [])
                 },
-                "function": wrapper
+                "function": wrapper,
+                "is_async": is_async,
+                "exclusive": exclusive
             }
             
             cls._tools[name] = tool_def
@@ -93,12 +144,19 @@ class ToolRegistry:
     
     @classmethod
     def get_all_tools(cls) -> List[Dict[str, Any]]:
-        """Get all registered tools as a list of tool definitions."""
+        """Get all registered tools as a list of function tool definitions.
+
+        The list is built in registration order, so it is identical on every call and
+        keeps the tool block at the start of the prompt stable for prefix reuse.
+        """
         return [
             {
-                "name": tool["name"],
-                "description": tool["description"],
-                "parameters": tool["parameters"]
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "parameters": tool["parameters"]
+                }
             }
             for tool in cls._tools.values()
         ]
@@ -109,25 +167,82 @@ class ToolRegistry:
         tool = cls._tools.get(name)
         return tool["function"] if tool else None
 
+    @classmethod
+    def is_exclusive(cls, name: str) -> bool:
+        """Whether a tool must run on its own rather than alongside other tool calls."""
+        tool = cls._tools.get(name)
+        return bool(tool and tool["exclusive"])
+
+    @classmethod
+    async def call(cls, name: str, **kwargs) -> Any:
+        """Run a tool without blocking the event loop.
+
+        Coroutine tools are awaited directly; synchronous tools run on the bounded tool
+        executor with the caller's context (so per-step change tracking still applies).
+        Every execution is timed for the run's telemetry; tools that raise or return an
+        "Error" message count as failed.
+        """
+        tool = cls._tools.get(name)
+        if tool is None:
+            raise KeyError(f"Unknown tool: {name}")
+        started = time.perf_counter()
+        error = True
+        try:
+            if tool["is_async"]:
+                result = await tool["function"](**kwargs)
+            else:
+                context = contextvars.copy_context()
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(_tool_executor, partial(context.run, tool["function"], **kwargs))
+            error = isinstance(result, str) and result.startswith("Error")
+            return result
+        finally:
+            record_tool_call(name, time.perf_counter() - started, error)
+
 # Tool definitions
 @ToolRegistry.register(
     name="read_file",
-    description="Read contents of a file. Supports nested directories (e.g., 'src/utils/helper.py')",
+    description=(
+        "Read contents of a file. Supports nested directories (e.g., 'src/utils/helper.py'). "
+        "Large files are cut off with a notice; page through them with start_line and end_line, "
+        "or with offset and length in bytes."
+    ),
     input_schema={
         "path": {
             "type": "string",
             "description": "Path to the file to read, can include subdirectories"
+        },
+        "start_line": {
+            "type": "integer",
+            "description": "First line to read (1-based)"
+        },
+        "end_line": {
+            "type": "integer",
+            "description": "Last line to read (inclusive)"
+        },
+        "offset": {
+            "type": "integer",
+            "description": "Byte offset to start reading at, instead of a line range"
+        },
+        "length": {
+            "type": "integer",
+            "description": "Number of bytes to read from offset"
         }
-    }
+    },
+    required=["path"]
 )
-def read_file(path: str) -> str:
-    """Read contents of a file.
+def read_file(path: str, start_line: int = None, end_line: int = None, offset: int = None, length: int = None) -> str:
+    """Read contents of a file, or a range of its lines or bytes.
     
     Args:
         path (str): Path to the file to read, can include subdirectories (e.g., 'src/utils/helper.py')
+        start_line (int): First line to read (1-based)
+        end_line (int): Last line to read (inclusive)
+        offset (int): Byte offset to start reading at, instead of a line range
+        length (int): Number of bytes to read from offset
         
     Returns:
-        str: Contents of the file
+        str: Contents of the file (or of the requested range), with a notice when more remains
     """
     try:
         file_path = normalize_path(path)
@@ -137,14 +252,56 @@ def read_file(path: str) -> str:
         file_path.parent.mkdir(parents=True, exist_ok=True)
         
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-                return content
+            return _read_text(file_path, path, start_line, end_line, offset, length)
         except FileNotFoundError:
             return f"File '{path}' does not exist."
     except ValueError as e:
         return f"Error: {str(e)}"
 
+
+def _read_text(file_path: Path, path: str, start_line: int = None, end_line: int = None,
+               offset: int = None, length: int = None) -> str:
+    """Read a file or a range of it, capped at READ_FILE_MAX_BYTES.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    cache = current_workspace().file_cache
+    size = file_path.stat().st_size
+    if file_path.is_dir():
+        return f"Error: '{path}' is a directory. Use list_directory to see its contents."
+    if cache.is_binary(file_path):
+        return f"File '{path}' appears to be binary ({size} bytes); its content is not shown."
+
+    if offset is not None or length is not None:
+        offset = min(max(0, offset or 0), size)
+        length = min(max(0, length or READ_FILE_MAX_BYTES), READ_FILE_MAX_BYTES, size - offset)
+        notice = f"[Bytes {offset}-{offset + length} of {size}."
+        if offset + length < size:
+            notice += f" Use offset={offset + length} to read more."
+        return f"{cache.read_bytes(file_path, offset, length)}\n{notice}]"
+
+    if start_line is None and end_line is None and size <= READ_FILE_MAX_BYTES:
+        try:
+            # Served from memory when the file hasn't changed since it was last read or written
+            return cache.read(file_path)
+        except UnicodeDecodeError:
+            pass  # Read it as a line range below, which replaces undecodable bytes
+
+    total = len(cache.line_offsets(file_path)) - 1
+    start = max(1, start_line or 1)
+    end = min(total, end_line or total)
+    if start > end:
+        return f"Error: Line range {start}-{end_line or total} is outside the file, which has {total} lines."
+    text, last = cache.read_lines(file_path, start, end, max_bytes=READ_FILE_MAX_BYTES)
+    if start == 1 and last == total:
+        return text
+    notice = f"[Showing lines {start}-{last} of {total}."
+    if last < total:
+        notice += f" Use start_line={last + 1} to read more."
+    separator = "" if text.endswith("\n") else "\n"
+    return f"{text}{separator}{notice}]"
+
 @ToolRegistry.register(
     name="write_file",
     description="Write content to a file. Supports nested directories (e.g., 'src/utils/helper.py')",
@@ -182,8 +339,7 @@ def write_file(path: str, content: str) -> str:
         file_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Write the content to the file
-        with open(file_path, 'w') as f:
-            f.write(content)
+        current_workspace().file_cache.write(file_path, content)
         
         return f"Successfully wrote to {path}"
     except ValueError as e:
@@ -222,13 +378,14 @@ def create_directory(path: str) -> str:
         
         # Check if any parent in the path is an existing file
         for parent in dir_path.parents:
-            if parent == OUTPUT_DIR:
+            if parent == current_workspace().root:
                 continue  # Skip the base output directory
             if parent.exists() and parent.is_file():
                 return f"Error: Cannot create directory under '{parent}' because it is an existing file."
         
         # Create the directory
         dir_path.mkdir(parents=True, exist_ok=False)
+        current_workspace().index.add_directory(dir_path)
         
         return f"Successfully created directory '{path}'."
     except ValueError as e:
@@ -276,7 +433,7 @@ def edit_file(path: str, begin_marker: str, end_marker: str, new_content: str) -
     that the file contains the expected markers (or delimiters). The markers you supply must match
     what exists in the file; otherwise, the edit will fail.
     
-    After editing, the tool reads the updated file content and returns it along with a success message.
+    After editing, the tool returns a diff of the edited region along with a success message.
     
     Args:
         path (str): Path to the file to edit.
@@ -285,7 +442,7 @@ def edit_file(path: str, begin_marker: str, end_marker: str, new_content: str) -
         new_content (str): The content to insert between the markers.
         
     Returns:
-        str: A success message along with the updated file content, or an error message.
+        str: A success message along with a diff of the change, or an error message.
     """
     try:
         file_path = normalize_path(path)
@@ -295,8 +452,7 @@ def edit_file(path: str, begin_marker: str, end_marker: str, new_content: str) -
             return f"Error: File '{path}' does not exist."
         
         # Read the file content
-        with open(file_path, 'r') as f:
-            content = f.read()
+        content = current_workspace().file_cache.read(file_path)
         
         # Find the beginning marker
         start_idx = content.find(begin_marker)
@@ -315,15 +471,186 @@ def edit_file(path: str, begin_marker: str, end_marker: str, new_content: str) -
             content[end_idx:]
         )
         
-        # Write the updated content back to the file
-        with open(file_path, 'w') as f:
-            f.write(new_file_content)
-        
-        # Implied read_file: read back the updated file content
-        with open(file_path, 'r') as f:
-            updated_content = f.read()
+        # Write the updated content back to the file; the new content is already in memory
+        current_workspace().file_cache.write(file_path, new_file_content)
+
+        return f"Successfully edited {path} between markers:\n{compact_diff(path, content, new_file_content)}"
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except Exception as ex:
+        return f"Error: An unexpected error occurred: {str(ex)}"
+
+
+def compact_diff(path: str, old: str, new: str) -> str:
+    """Unified diff of a change with PATCH_CONTEXT_LINES lines of context around each edit."""
+    lines = difflib.unified_diff(
+        old.splitlines(), new.splitlines(), fromfile=f"a/{path}", tofile=f"b/{path}",
+        n=PATCH_CONTEXT_LINES, lineterm=""
+    )
+    return "\n".join(lines) or "(no changes)"
+
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _parse_unified_diff(diff: str) -> List[Tuple[int, List[str], List[str]]]:
+    """Split a unified diff into (old start line, old lines, new lines) hunks."""
+    hunks: List[Tuple[int, List[str], List[str]]] = []
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            hunks.append((int(header.group(1)), [], []))
+            continue
+        if not hunks or line.startswith(("--- ", "+++ ", "\\")):
+            continue  # File headers and "No newline at end of file" markers
+        _, old, new = hunks[-1]
+        if line.startswith("-"):
+            old.append(line[1:])
+        elif line.startswith("+"):
+            new.append(line[1:])
+        else:
+            # Context line; editors often strip the leading space from blank ones
+            old.append(line[1:] if line.startswith(" ") else line)
+            new.append(old[-1])
+    return hunks
+
+
+def _search_replace_edits(content: str, hunks: List[Any], errors: List[str]) -> List[Tuple[int, int, str, int]]:
+    """Locate each search/replace hunk; every search text must match exactly once."""
+    edits = []
+    for number, hunk in enumerate(hunks, 1):
+        if not isinstance(hunk, dict) or not isinstance(hunk.get("search"), str) or not isinstance(hunk.get("replace"), str):
+            errors.append(f"hunk {number}: needs string 'search' and 'replace' fields")
+            continue
+        search = hunk["search"]
+        count = content.count(search) if search else 0
+        if count == 0:
+            errors.append(f"hunk {number}: search text not found" if search else f"hunk {number}: search text is empty")
+        elif count > 1:
+            errors.append(f"hunk {number}: search text matches {count} places; include more surrounding lines")
+        else:
+            start = content.find(search)
+            edits.append((start, start + len(search), hunk["replace"], number))
+    return edits
+
+
+def _unified_diff_edits(content: str, diff: str, errors: List[str]) -> List[Tuple[int, int, str, int]]:
+    """Locate each hunk of a unified diff, preferring the match closest to its stated line number."""
+    lines = content.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    stripped = [line.rstrip("\r\n") for line in lines]
+
+    hunks = _parse_unified_diff(diff)
+    if not hunks:
+        errors.append("the diff contains no hunks (expected '@@ -start,count +start,count @@' headers)")
+    edits = []
+    for number, (old_start, old, new) in enumerate(hunks, 1):
+        if not old:
+            # Pure insertion after line old_start
+            positions = [min(old_start, len(lines))]
+        else:
+            positions = [i for i in range(len(lines) - len(old) + 1) if stripped[i:i + len(old)] == old]
+            if not positions:
+                # Tolerate trailing whitespace differences
+                wanted = [line.rstrip() for line in old]
+                positions = [i for i in range(len(lines) - len(old) + 1)
+                             if [line.rstrip() for line in stripped[i:i + len(old)]] == wanted]
+        if not positions:
+            errors.append(f"hunk {number}: removed and context lines do not match the file near line {old_start}")
+            continue
+        index = min(positions, key=lambda position: abs(position - (old_start - 1)))
+        end = index + len(old)
+        replacement = "".join(line + "\n" for line in new)
+        if replacement and end == len(lines) and lines and not lines[-1].endswith("\n"):
+            replacement = replacement[:-1]  # Keep a missing final newline missing
+        edits.append((offsets[index], offsets[end], replacement, number))
+    return edits
+
+
+@ToolRegistry.register(
+    name="patch_file",
+    description=(
+        "Apply several edits to a file in one call, either as search/replace hunks or as a unified diff. "
+        "All hunks are checked before anything is written; if any hunk does not apply, the file is left "
+        "unchanged. Returns a diff of the changed regions instead of the whole file."
+    ),
+    input_schema={
+        "path": {
+            "type": "string",
+            "description": "Path to the file to patch, can include nested directories."
+        },
+        "hunks": {
+            "type": "array",
+            "description": "Search/replace edits. Each search text must appear exactly once in the file.",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "search": {"type": "string", "description": "Exact existing text to replace"},
+                    "replace": {"type": "string", "description": "Text to put in its place"}
+                },
+                "required": ["search", "replace"]
+            }
+        },
+        "diff": {
+            "type": "string",
+            "description": "Unified diff to apply instead of hunks, with '@@ -start,count +start,count @@' headers."
+        }
+    },
+    required=["path"]
+)
+def patch_file(path: str, hunks: List[Dict[str, str]] = None, diff: str = None) -> str:
+    """Apply several edits to a file at once.
+
+    Every hunk is located in the original file content before anything is written.
+    If any hunk is missing, ambiguous or overlaps another, no change is made and every
+    problem is reported.
+
+    Args:
+        path (str): Path to the file to patch.
+        hunks (List[Dict[str, str]]): Search/replace edits, each with "search" and "replace".
+        diff (str): Unified diff to apply instead of hunks.
+
+    Returns:
+        str: A summary and a compact diff of the change, or the reasons the patch was rejected.
+    """
+    try:
+        file_path = normalize_path(path)
+        if not file_path.is_file():
+            return f"Error: File '{path}' does not exist."
+        if (hunks is None) == (diff is None):
+            return "Error: Provide either hunks or diff."
+        if isinstance(hunks, str):
+            hunks = json.loads(hunks)
+
+        content = current_workspace().file_cache.read(file_path)
+        errors: List[str] = []
+        if hunks is not None:
+            edits = _search_replace_edits(content, hunks if isinstance(hunks, list) else [hunks], errors)
+        else:
+            edits = _unified_diff_edits(content, diff, errors)
 
-        return f"Successfully edited {path} between markers. Updated file content:\n{updated_content}"
+        edits.sort()
+        for previous, edit in zip(edits, edits[1:]):
+            if edit[0] < previous[1]:
+                errors.append(f"hunks {previous[3]} and {edit[3]} overlap")
+        if errors:
+            return f"Error: No changes were made to {path}:\n" + "\n".join(f"- {error}" for error in errors)
+
+        parts, position = [], 0
+        for start, end, replacement, _ in edits:
+            parts.extend([content[position:start], replacement])
+            position = end
+        parts.append(content[position:])
+        new_content = "".join(parts)
+
+        applied = f"{len(edits)} hunk" + ("s" if len(edits) != 1 else "")
+        console.print(f"[dim]Patching file: {path} ({applied})[/dim]")
+        current_workspace().file_cache.write(file_path, new_content)
+        return f"Applied {applied} to {path}:\n{compact_diff(path, content, new_content)}"
+    except json.JSONDecodeError as e:
+        return f"Error: Invalid hunks argument: {str(e)}"
     except ValueError as e:
         return f"Error: {str(e)}"
     except Exception as ex:
@@ -343,7 +670,7 @@ def list_directory(path: str) -> str:
     """List the contents of a directory.
 
     Args:
-        path (str): Path to the directory whose contents to list (relative to OUTPUT_DIR).
+        path (str): Path to the directory whose contents to list (relative to the workspace root).
 
     Returns:
         str: A string listing files and subdirectories, or an error message.
@@ -357,7 +684,8 @@ def list_directory(path: str) -> str:
         if not dir_path.is_dir():
             return f"Error: Path '{path}' is not a directory."
         
-        contents = list(dir_path.iterdir())
+        # Agent state (logs etc.) is not part of the project
+        contents = [item for item in dir_path.iterdir() if item.name != STATE_DIR_NAME]
         
         if not contents:
             return f"Directory '{path}' is empty."
@@ -374,6 +702,99 @@ def list_directory(path: str) -> str:
     except Exception as ex:
         return f"Error: An unexpected error occurred: {str(ex)}"
 
+@ToolRegistry.register(
+    name="workspace_tree",
+    description=(
+        "Show the full recursive tree of the workspace (or of one directory) with file sizes. "
+        "Dependency directories such as node_modules are listed but not expanded."
+    ),
+    input_schema={
+        "path": {
+            "type": "string",
+            "description": "Directory to show, relative to the workspace root. Omit for the whole workspace."
+        }
+    },
+    required=[]
+)
+def workspace_tree(path: str = "") -> str:
+    """Show the recursive workspace tree.
+
+    Args:
+        path (str): Directory to show (relative to the workspace root); the whole workspace by default.
+
+    Returns:
+        str: Indented tree with file sizes
+    """
+    workspace = current_workspace()
+    relative = normalize_path(path).relative_to(workspace.root).as_posix()
+    return workspace.index.render_tree("" if relative == "." else relative)
+
+@ToolRegistry.register(
+    name="search_code",
+    description=(
+        "Search every text file in the workspace for a string or regular expression and get back "
+        "matching lines as 'path:line: text'. Much cheaper than reading files one by one to find "
+        "where a symbol is defined or used. Dependency directories such as node_modules are not searched."
+    ),
+    input_schema={
+        "query": {
+            "type": "string",
+            "description": "Text to find, or a Python regular expression if regex is true (matched line by line)"
+        },
+        "regex": {
+            "type": "boolean",
+            "description": "Treat the query as a regular expression"
+        },
+        "case_sensitive": {
+            "type": "boolean",
+            "description": "Match case exactly (default: false)"
+        },
+        "path": {
+            "type": "string",
+            "description": "Only search under this directory or file, relative to the workspace root"
+        }
+    },
+    required=["query"]
+)
+def search_code(query: str, regex: bool = False, case_sensitive: bool = False, path: str = "") -> str:
+    """Search the workspace's text files through the code search index.
+
+    Args:
+        query (str): Text to find, or a regular expression if regex is set
+        regex (bool): Treat the query as a regular expression
+        case_sensitive (bool): Match case exactly
+        path (str): Only search under this directory or file
+
+    Returns:
+        str: One 'path:line: text' line per match, with a notice when results were cut off
+    """
+    if not query:
+        return "Error: The query is empty."
+    workspace = current_workspace()
+    try:
+        relative = normalize_path(path).relative_to(workspace.root).as_posix()
+        matches, total = workspace.search_index.search(
+            query, regex=regex, case_sensitive=case_sensitive, path="" if relative == "." else relative
+        )
+    except re.error as e:
+        return f"Error: Invalid regular expression: {str(e)}"
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    console.print(f"[dim]Searching for {query!r}: {total} matches[/dim]")
+    if not matches:
+        return f"No matches for {query!r}."
+    lines = [f"{relative}:{number}: {_snippet(line)}" for relative, number, line in matches]
+    if total > len(matches):
+        files = len({relative for relative, _, _ in matches})
+        lines.append(f"... {total - len(matches)} more matches not shown (showing {len(matches)} in {files} files); narrow the query or the path.")
+    return "\n".join(lines)
+
+
+def _snippet(line: str, width: int = 200) -> str:
+    line = line.strip()
+    return line if len(line) <= width else line[:width] + "..."
+
 @ToolRegistry.register(
     name="create_file",
     description="Create a new file with the specified content. Provide the file path and content for each file you want to create.",
@@ -412,13 +833,288 @@ def create_file(path: str, content: str) -> str:
         file_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Create and write content to the new file
-        with open(file_path, 'w') as f:
-            f.write(content)
+        current_workspace().file_cache.write(file_path, content)
         
         return f"Successfully created file '{path}'."
     except Exception as e:
         return f"Error: An unexpected error occurred: {str(e)}"
 
+
+BATCH_FILES_SCHEMA = {
+    "type": "array",
+    "description": "Files to write, each with a path (including a filename) and its full content",
+    "items": {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "Path to the file, can include subdirectories"},
+            "content": {"type": "string", "description": "Full content of the file"}
+        },
+        "required": ["path", "content"]
+    }
+}
+
+BATCH_ATOMIC_SCHEMA = {
+    "type": "boolean",
+    "description": "If true, write all files or none: nothing is written when any file fails"
+}
+
+
+def _parse_batch(value: Any) -> List[Any]:
+    """Accept a batch argument given as a list or as a JSON-encoded list."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError("expected a list")
+    if len(value) > MAX_BATCH_FILES:
+        raise ValueError(f"at most {MAX_BATCH_FILES} files can be handled in one call")
+    return value
+
+
+def _write_files(files: Any, atomic: bool, create_only: bool) -> str:
+    """Validate and write a batch of files, reporting the outcome of each one.
+
+    Every file is validated before anything is written. In atomic mode a single
+    invalid file means nothing is written, and a write failure restores the files
+    already written in this call.
+    """
+    try:
+        files = _parse_batch(files)
+    except ValueError as e:
+        return f"Error: Invalid files argument: {str(e)}"
+
+    workspace = current_workspace()
+    planned: List[Tuple[str, Optional[Path], Optional[str], Optional[str]]] = []  # (label, path, content, error)
+    seen = set()
+    for item in files:
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not isinstance(item.get("content"), str):
+            planned.append((str(item)[:80], None, None, "each file needs a string path and content"))
+            continue
+        label = item["path"]
+        try:
+            file_path = normalize_path(label)
+        except ValueError as e:
+            planned.append((label, None, None, str(e)))
+            continue
+        if file_path.suffix == '':
+            error = "the path does not include a filename"
+        elif file_path in seen:
+            error = "the path appears more than once in this call"
+        elif create_only and file_path.exists():
+            error = "the file already exists; use write_files or edit_file to update it"
+        elif file_path.is_dir():
+            error = "a directory with this name already exists"
+        else:
+            error = None
+        seen.add(file_path)
+        planned.append((label, file_path, item["content"], error))
+
+    invalid = [entry for entry in planned if entry[3]]
+    if atomic and invalid:
+        lines = [f"Error: No files were written because {len(invalid)} of {len(planned)} failed validation:"]
+        lines.extend(f"- {label}: {error}" for label, _, _, error in invalid)
+        return "\n".join(lines)
+
+    results: List[str] = []
+    originals: Dict[Path, Optional[str]] = {}
+    written: List[Path] = []
+    for label, file_path, content, error in planned:
+        if error:
+            results.append(f"- {label}: error: {error}")
+            continue
+        try:
+            originals[file_path] = workspace.file_cache.read(file_path) if file_path.exists() else None
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            workspace.file_cache.write(file_path, content)
+            written.append(file_path)
+            results.append(f"- {label}: {'updated' if originals[file_path] is not None else 'created'}")
+        except Exception as e:
+            if not atomic:
+                results.append(f"- {label}: error: {str(e)}")
+                continue
+            # Put back everything this call already wrote
+            for done in reversed(written):
+                if originals[done] is None:
+                    done.unlink()
+                    workspace.file_cache.invalidate(done)
+                else:
+                    workspace.file_cache.write(done, originals[done])
+            workspace.index.mark_dirty()
+            return f"Error: No files were written because writing '{label}' failed: {str(e)}"
+
+    console.print(f"[dim]Wrote {len(written)} of {len(planned)} files[/dim]")
+    header = f"Wrote {len(written)} of {len(planned)} files:"
+    if not written:
+        header = f"Error: {header}"
+    return "\n".join([header] + results)
+
+
+@ToolRegistry.register(
+    name="create_files",
+    description="Create several new files in one call, e.g. when scaffolding a project. Files that already exist are not overwritten.",
+    input_schema={
+        "files": BATCH_FILES_SCHEMA,
+        "atomic": BATCH_ATOMIC_SCHEMA
+    },
+    required=["files"]
+)
+def create_files(files: List[Dict[str, str]], atomic: bool = False) -> str:
+    """Create several new files at once.
+
+    Args:
+        files (List[Dict[str, str]]): Files to create, each with "path" and "content"
+        atomic (bool): Create all of the files or none of them
+
+    Returns:
+        str: Summary line followed by the result for each file
+    """
+    return _write_files(files, atomic, create_only=True)
+
+
+@ToolRegistry.register(
+    name="write_files",
+    description="Write several files in one call, creating or overwriting each one with the given content.",
+    input_schema={
+        "files": BATCH_FILES_SCHEMA,
+        "atomic": BATCH_ATOMIC_SCHEMA
+    },
+    required=["files"]
+)
+def write_files(files: List[Dict[str, str]], atomic: bool = False) -> str:
+    """Write several files at once, overwriting existing ones.
+
+    Args:
+        files (List[Dict[str, str]]): Files to write, each with "path" and "content"
+        atomic (bool): Write all of the files or none of them
+
+    Returns:
+        str: Summary line followed by the result for each file
+    """
+    return _write_files(files, atomic, create_only=False)
+
+
+@ToolRegistry.register(
+    name="read_files",
+    description="Read several files in one call. Returns each file's content under a header with its path.",
+    input_schema={
+        "paths": {
+            "type": "array",
+            "description": "Paths of the files to read, can include subdirectories",
+            "items": {"type": "string"}
+        }
+    },
+    required=["paths"]
+)
+def read_files(paths: List[str]) -> str:
+    """Read several files at once.
+
+    Args:
+        paths (List[str]): Paths of the files to read
+
+    Returns:
+        str: Each file's content (capped like read_file) under a "=== path ===" header, or the
+        reason it could not be read
+    """
+    try:
+        paths = _parse_batch(paths)
+    except ValueError as e:
+        return f"Error: Invalid paths argument: {str(e)}"
+
+    sections = []
+    for path in paths:
+        try:
+            file_path = normalize_path(str(path))
+            sections.append(f"=== {path} ===\n{_read_text(file_path, str(path))}")
+        except FileNotFoundError:
+            sections.append(f"=== {path} (does not exist) ===")
+        except (ValueError, IsADirectoryError, UnicodeDecodeError, PermissionError) as e:
+            sections.append(f"=== {path} (could not be read: {str(e)}) ===")
+    console.print(f"[dim]Read {len(paths)} files[/dim]")
+    return "\n\n".join(sections)
+
+class CommandResult(BaseModel):
+    """Outcome of a command run by a package-manager tool"""
+    returncode: int
+    output: str  # Bounded summary of the combined stdout/stderr
+    log_id: str  # Name of the full log, readable with read_log
+
+
+@asynccontextmanager
+async def _track_command(command: str, manifests: Tuple[str, ...] = ()):
+    """Record the files a package manager command changes for the step's QA evidence.
+
+    The workspace index is snapshotted before and after the command, and the listed
+    manifests are recorded as they were beforehand so QA sees their diffs.
+    """
+    workspace = current_workspace()
+    loop = asyncio.get_running_loop()
+    for name in manifests:
+        record_change(workspace.root / name)
+    before = await loop.run_in_executor(_tool_executor, workspace.index.snapshot)
+    try:
+        yield
+    finally:
+        workspace.index.mark_dirty()
+        after = await loop.run_in_executor(_tool_executor, workspace.index.snapshot)
+        record_command_changes(command, before, after)
+
+
+async def run_subprocess(args: List[str], timeout: float = 120, env: Dict[str, str] = None, log_name: str = None) -> CommandResult:
+    """Run a command in the current workspace, streaming its output instead of buffering it.
+
+    Output is echoed to the console as it arrives, written in full to a log in the
+    workspace's log directory, and kept in memory only as a bounded head/tail/error-line summary.
+
+    Args:
+        args (List[str]): Executable and its arguments
+        timeout (float): Seconds before the process is killed
+        env (Dict[str, str]): Variables to add to the inherited environment
+        log_name (str): Prefix of the log name (default: the executable's name)
+
+    Returns:
+        CommandResult: Return code, output summary and log ID
+
+    Raises:
+        subprocess.TimeoutExpired: If the command does not finish in time
+    """
+    log_id = f"{log_name or Path(args[0]).stem}-{time.strftime('%Y%m%d-%H%M%S')}-{time.monotonic_ns() % 100000}.log"
+    workspace = current_workspace()
+    capture = OutputCapture(workspace.log_dir / log_id)
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=workspace.root,
+        env={**os.environ, **env} if env else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=1024 * 1024  # Allow long single-line outputs (e.g. minified JSON)
+    )
+
+    async def pump() -> None:
+        async for line in process.stdout:
+            capture.feed(line.decode(errors="replace"))
+        await process.wait()
+
+    async def kill() -> None:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    try:
+        await asyncio.wait_for(pump(), timeout=timeout)
+    except asyncio.TimeoutError:
+        await kill()
+        capture.feed(f"[killed after {timeout} seconds]")
+        raise subprocess.TimeoutExpired(args, timeout, output=capture.summary())
+    except BaseException:
+        # Overlong lines, cancellation and the like must not leave the child running
+        await kill()
+        raise
+    finally:
+        capture.close()
+        # Package managers change files the index doesn't see being written
+        workspace.index.mark_dirty()
+
+    return CommandResult(returncode=process.returncode, output=capture.summary(), log_id=log_id)
+
 @ToolRegistry.register(
     name="run_npm",
     description="Execute any npm/npx command in a controlled environment",
@@ -427,10 +1123,16 @@ def create_file(path: str, content: str) -> str:
             "type": "string",
             "description": "Full npm/npx command to execute (e.g. 'install', 'run build', 'npx create-react-app')"
         }
-    }
+    },
+    exclusive=True
 )
-def run_npm(command: str) -> str:
-    """Execute npm/npx commands safely in the output directory."""
+async def run_npm(command: str) -> str:
+    """Execute npm/npx commands safely in the output directory.
+
+    Installs and npx scaffolds go through the shared package store: when the same
+    command already ran against the same package.json and package-lock.json, its
+    result is restored (node_modules copied from the store) instead of running npm.
+    """
     blocked_commands = {
         "start", "dev", "serve", "publish", 
         "run prod", "deploy", "exec", "restart"
@@ -440,32 +1142,50 @@ def run_npm(command: str) -> str:
     if any(cmd in command.lower() for cmd in blocked_commands):
         return f"Blocked potentially dangerous command: {command.split()[0]}"
 
-    try:
-        parts = command.split()
-        if not parts or parts[0] not in ["npm", "npx"]:
-            return "Invalid command - must start with npm/npx"
-
-        # Windows executable handling
-        exe_suffix = ".cmd" if os.name == "nt" else ""
-        executable = f"{parts[0]}{exe_suffix}"
-        
-        result = subprocess.run(
-            [executable, *parts[1:]],
-            cwd=OUTPUT_DIR,
-            capture_output=True,
-            text=True,
-            shell=True,
-            timeout=120  # Increased timeout for complex operations
-        )
+    async with _track_command(command, manifests=("package.json",)):
+        try:
+            parts = command.split()
+            if not parts or parts[0] not in ["npm", "npx"]:
+                return "Invalid command - must start with npm/npx"
+
+            workspace = current_workspace()
+            loop = asyncio.get_running_loop()
+            store = NpmStore() if NPM_STORE_ENABLED else None
+            key = store.key(workspace.root, parts) if store else None
+            if key:
+                started = time.perf_counter()
+                restored = await loop.run_in_executor(_tool_executor, partial(store.restore, key, workspace.root, replace=parts[0] == "npm"))
+                if restored is not None:
+                    workspace.index.mark_dirty()
+                    console.print(f"[dim]Restored {command} from the package store[/dim]")
+                    return (
+                        f"{parts[0]} was not run: the same command already ran against the same package.json "
+                        f"and package-lock.json, so {', '.join(restored)} were restored from the package store "
+                        f"in {time.perf_counter() - started:.1f}s."
+                    )
+            before = [entry.name for entry in workspace.root.iterdir()]
+
+            # Windows executable handling
+            exe_suffix = ".cmd" if os.name == "nt" else ""
+            executable = f"{parts[0]}{exe_suffix}"
         
-        output = f"{parts[0]} output:\n{result.stdout}"
-        if result.stderr:
-            output += f"\n{parts[0]} errors:\n{result.stderr}"
-            
-        return output
+            result = await run_subprocess(
+                [executable, *parts[1:]],
+                timeout=120,  # Increased timeout for complex operations
+                env=store.environment() if store else None
+            )
+            if key and result.returncode == 0:
+                await loop.run_in_executor(_tool_executor, partial(store.save, key, workspace.root, produced_items(parts, before, workspace.root), command))
         
-    except Exception as e:
-        return f"{parts[0]} error: {str(e)}"
+            return (
+                f"{parts[0]} exited with code {result.returncode}. Output:\n{result.output}\n"
+                f"Full log: {result.log_id} (use read_log to page through it)"
+            )
+
+        except subprocess.TimeoutExpired as e:
+            return f"{parts[0]} error: {str(e)}\n{e.output}"
+        except Exception as e:
+            return f"{parts[0]} error: {str(e)}"
 
 @ToolRegistry.register(
     name="run_pip",
@@ -480,23 +1200,132 @@ def run_npm(command: str) -> str:
             "type": "string",
             "description": "Package specifier(s) to install"
         }
-    }
+    },
+    exclusive=True
 )
-def run_pip(command: str, packages: str = "") -> str:
-    """Safely execute pip commands in isolated output directory"""
+async def run_pip(command: str, packages: str = "") -> str:
+    """Safely execute pip commands in the workspace's own virtualenv.
+
+    The venv is checked out from the pool when one with the same requirements was
+    built before, and installs run offline from the shared wheelhouse whenever it
+    already holds every needed distribution.
+    """
     allowed = {"install", "freeze"}
     if command not in allowed:
         return f"Blocked dangerous pip command: {command}"
     
-    try:
-        args = [command, packages] if command == "install" else [command]
-        result = subprocess.run(
-            ["pip", *args],
-            cwd=OUTPUT_DIR,
-            timeout=120,
-            capture_output=True,
-            text=True
-        )
-        return f"pip {command}:\n{result.stdout}\n{result.stderr}"
-    except Exception as e:
-        return f"pip error: {str(e)}" 
\ No newline at end of file
+    async with _track_command(f"pip {command} {packages}".strip()):
+        try:
+            workspace = current_workspace()
+            loop = asyncio.get_running_loop()
+            pool = VenvPool()
+            venv = workspace.root / VENV_DIR_NAME
+            requested = packages.split() if command == "install" else []
+            # Options such as -r or -e depend on files the key can't see, so they bypass the pool
+            bypass = any(requirement.startswith("-") for requirement in requested)
+            poolable = PIP_POOL_ENABLED and not bypass and pool.is_poolable(venv)
+
+            current = pool.installed(venv)
+            if command == "install" and current is not None and requested and set(requested) <= set(current):
+                return f"pip was not run: {' '.join(requested)} already installed in {VENV_DIR_NAME}."
+            # Only requirement specifiers are recorded; a bypassing install leaves the venv unpoolable instead
+            target = sorted(set(current or []) | (set() if bypass else set(requested)))
+
+            if poolable and (current is None or requested):
+                if await loop.run_in_executor(_tool_executor, partial(pool.checkout, pool.key(target), venv)):
+                    workspace.index.mark_dirty()
+                    if command == "install":
+                        return f"pip was not run: checked out a pooled {VENV_DIR_NAME} that already has {' '.join(target)}."
+                    current = target
+            if current is None:
+                await _create_venv(pool, venv, poolable)
+                current = []
+
+            if command == "freeze":
+                result = await _run_venv_pip(pool, venv, ["freeze"])
+            else:
+                result = await _install_from_wheelhouse(pool, venv, requested)
+                if result.returncode == 0:
+                    pool.record(venv, target, poolable=pool.is_poolable(venv) and not bypass)
+                    if poolable:
+                        await loop.run_in_executor(_tool_executor, partial(pool.save, pool.key(target), venv))
+            return (
+                f"pip {command} exited with code {result.returncode}. Output:\n{result.output}\n"
+                f"Full log: {result.log_id} (use read_log to page through it)"
+            )
+        except subprocess.TimeoutExpired as e:
+            return f"pip error: {str(e)}\n{e.output}"
+        except Exception as e:
+            return f"pip error: {str(e)}" 
+
+
+async def _run_venv_pip(pool: VenvPool, venv: Path, args: List[str]) -> CommandResult:
+    return await run_subprocess([str(venv_python(venv)), "-m", "pip", *args], timeout=120, env=pool.environment(), log_name="pip")
+
+
+async def _create_venv(pool: VenvPool, venv: Path, poolable: bool) -> None:
+    """Give the workspace an empty venv, from the pool if one was built before."""
+    loop = asyncio.get_running_loop()
+    if poolable and await loop.run_in_executor(_tool_executor, partial(pool.checkout, pool.key([]), venv)):
+        return
+    result = await run_subprocess([sys.executable, "-m", "venv", str(venv)], timeout=120, log_name="venv")
+    if result.returncode != 0:
+        raise RuntimeError(f"could not create {VENV_DIR_NAME}:\n{result.output}")
+    pool.record(venv, [])
+    if poolable:
+        await loop.run_in_executor(_tool_executor, partial(pool.save, pool.key([]), venv))
+
+
+async def _install_from_wheelhouse(pool: VenvPool, venv: Path, requirements: List[str]) -> CommandResult:
+    """Install offline from the wheelhouse, downloading missing wheels into it first if needed.
+
+    The offline attempt is skipped when the wheelhouse has no wheel for any requested
+    distribution, since it could only fail. Requirements given through options (-r, -e)
+    can't be checked, so they are always tried offline first.
+    """
+    pool.wheelhouse.mkdir(parents=True, exist_ok=True)
+    offline = ["install", "--no-index", "--find-links", str(pool.wheelhouse), *requirements]
+    named_only = not any(requirement.startswith("-") for requirement in requirements)
+    if PIP_OFFLINE or not named_only or pool.has_wheel_for(requirements):
+        result = await _run_venv_pip(pool, venv, offline)
+        if result.returncode == 0 or PIP_OFFLINE:
+            return result
+    fetched = await _run_venv_pip(pool, venv, ["wheel", "--find-links", str(pool.wheelhouse), "--wheel-dir", str(pool.wheelhouse), *requirements])
+    if fetched.returncode != 0:
+        return fetched
+    return await _run_venv_pip(pool, venv, offline)
+
+@ToolRegistry.register(
+    name="read_log",
+    description="Page through the full output log of an earlier run_npm or run_pip call. Use the log name those tools report.",
+    input_schema={
+        "log_id": {
+            "type": "string",
+            "description": "Log name reported by run_npm or run_pip (e.g. 'npm-20250101-120000-1234.log')"
+        },
+        "start_line": {
+            "type": "integer",
+            "description": "First line to read (1-based)"
+        },
+        "max_lines": {
+            "type": "integer",
+            "description": "Maximum number of lines to return (up to 200)"
+        }
+    },
+    required=["log_id"]
+)
+def read_log(log_id: str, start_line: int = 1, max_lines: int = 100) -> str:
+    """Read a page of a command log.
+
+    Args:
+        log_id (str): Log name reported by run_npm or run_pip
+        start_line (int): First line to read (1-based)
+        max_lines (int): Maximum number of lines to return
+
+    Returns:
+        str: Numbered log lines, or an error message
+    """
+    page = read_log_lines(current_workspace().log_dir / Path(log_id).name, int(start_line), min(int(max_lines), 200))
+    if page is None:
+        return f"Error: Log '{log_id}' does not exist."
+    return page
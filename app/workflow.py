@@ -2,14 +2,23 @@
 Core workflow management.
 """
 
-from typing import List
+from typing import List, Optional
+from contextlib import nullcontext
+from pathlib import Path
+import asyncio
 from rich.console import Console
-from .tools import OUTPUT_DIR
-from .agents import developer, analyze_task, get_summary
+from rich.table import Table
+from .tools import OUTPUT_DIR, current_workspace
+from .workspace import Workspace, use_workspace
+from .checkpoint import CHECKPOINT_RUNS, Checkpoint, workspace_hash
+from .telemetry import Telemetry, collect_telemetry
+from .agents import developer, analyze_task, get_summary, ClientManager, ModelWarmer
+from .agents.scheduler import BacklogScheduler
 from rich.markup import escape
 
 # Configuration
 MAX_STEPS = 25  # Maximum number of steps to execute
+TELEMETRY_DIR_NAME = "telemetry"  # Run report (report.json) and Prometheus metrics (metrics.prom) in the workspace state dir
 
 console = Console()
 
@@ -17,44 +26,187 @@ console = Console()
 # Create output directory if it doesn't exist
 OUTPUT_DIR.mkdir(exist_ok=True)
 
-async def process_workflow(task: str) -> List[str]:
-    """Process a task through the complete workflow."""
+async def process_workflow(
+    task: str,
+    workspace: Optional[Workspace] = None,
+    close_client: bool = True,
+    unload_models: bool = True,
+    checkpoint: Optional[Checkpoint] = None,
+) -> List[str]:
+    """Process a task through the complete workflow, collecting telemetry for the run.
+
+    The telemetry report is printed and written to the workspace even if the run fails.
+    With a saved checkpoint, progress is written after every phase and backlog task,
+    so the run can be resumed with resume_workflow.
+
+    Args:
+        task: The user's request
+        workspace: Directory the run builds in (default: OUTPUT_DIR)
+        close_client: Close the shared Ollama client afterwards; concurrent runs sharing it leave it open
+        unload_models: Let model warm-up unload models this run no longer needs; concurrent runs may still need them
+        checkpoint: Checkpoint to continue (default: a new one in BESPOKE_RUNS_DIR if that is set, otherwise none is saved)
+    """
+    with (use_workspace(workspace) if workspace else nullcontext()), collect_telemetry() as run_telemetry:
+        if checkpoint is None:
+            checkpoint = Checkpoint.create(task, current_workspace()) if CHECKPOINT_RUNS else Checkpoint.unsaved(task, current_workspace())
+        if checkpoint.directory is not None:
+            console.print(f"[dim]Run {checkpoint.state.run_id} checkpointed to {checkpoint.path}[/dim]")
+        try:
+            return await _run_workflow(task, close_client, unload_models, checkpoint)
+        except BaseException:
+            if checkpoint.directory is not None:
+                console.print(f"[yellow]Resume this run with: --resume {checkpoint.state.run_id}[/yellow]")
+            raise
+        finally:
+            report_telemetry(run_telemetry)
+
+
+async def resume_workflow(run: str, close_client: bool = True, unload_models: bool = True) -> List[str]:
+    """Continue an interrupted run from its checkpoint, in the workspace it was building.
+
+    The analysis and backlog are reused if they finished, and backlog tasks that
+    passed QA are replayed from the checkpoint instead of run again.
+
+    Args:
+        run: Run ID in BESPOKE_RUNS_DIR, or the path of a run directory
+
+    Raises:
+        FileNotFoundError: If the run has no checkpoint.
+    """
+    checkpoint = Checkpoint.load(run)
+    workspace = Workspace(Path(checkpoint.state.workspace))
+    console.print(f"[bold blue]Resuming run {checkpoint.state.run_id}[/bold blue] from the {checkpoint.state.phase} phase")
+    if checkpoint.state.workspace_hash and workspace_hash(workspace) != checkpoint.state.workspace_hash:
+        console.print("[yellow]The workspace changed since the checkpoint was saved; completed tasks are still skipped[/yellow]")
+    return await process_workflow(checkpoint.state.task, workspace, close_client, unload_models, checkpoint)
+
+
+def report_telemetry(run_telemetry: Telemetry) -> None:
+    """Print the run's model and tool totals and write the full report."""
+    report = run_telemetry.report()
+
+    table = Table(title="Model calls")
+    for column in ("Agent", "Model", "Calls", "Prompt tok", "Gen tok", "Prompt s", "Gen s", "Load s", "Prompt tok/s", "Gen tok/s"):
+        table.add_column(column)
+    for entry in report["models"]:
+        table.add_row(
+            entry["agent"], entry["model"], str(entry["calls"]),
+            str(entry["prompt_tokens"]), str(entry["completion_tokens"]),
+            f"{entry['prompt_eval_seconds']:.1f}", f"{entry['eval_seconds']:.1f}", f"{entry['load_seconds']:.1f}",
+            str(entry["prompt_tokens_per_second"] or "-"), str(entry["generation_tokens_per_second"] or "-"),
+        )
+    console.print(table)
+
+    tool_seconds = sum(entry["seconds"] for entry in report["tools"].values())
+    tool_calls = sum(entry["calls"] for entry in report["tools"].values())
+    console.print(f"[bold]Tools:[/bold] {tool_calls} calls, {tool_seconds:.1f}s")
+
+    telemetry_dir = current_workspace().state_dir / TELEMETRY_DIR_NAME
+    try:
+        run_telemetry.write(telemetry_dir)
+        console.print(f"[dim]Telemetry written to {telemetry_dir}[/dim]")
+    except OSError as e:
+        console.print(f"[yellow]Could not write telemetry: {str(e)}[/yellow]")
+
+
+async def _run_workflow(task: str, close_client: bool = True, unload_models: bool = True, checkpoint: Checkpoint = None) -> List[str]:
+    """Run the analysis, execution and summary phases.
+
+    Planning and execution are pipelined: backlog tasks are handed to the developer
+    as they stream out of the backlog call, so the first tasks run while the rest of
+    the backlog is still being generated. The model for the next phase is preloaded in
+    the background while the current one runs. Phases the checkpoint already holds
+    are skipped.
+    """
+    checkpoint = checkpoint or Checkpoint.unsaved(task, current_workspace())
+    state = checkpoint.state
+    if state.phase == "done" and state.summary is not None:
+        console.print("[green]This run already finished; returning its summary[/green]")
+        return state.workflow_conversation, state.summary
+
+    development = None
+    warmer = ModelWarmer(unload=unload_models)
     try:
-        # Analysis Phase
-        console.print("\n[bold blue]Analysis Phase[/bold blue]")
-
         # Initialize conversation
         workflow_conversation = []
-
-        # Send task to analyst agent
-        workflow_conversation, validated_backlog = await analyze_task( task, workflow_conversation)
-
-        backlog_list = validated_backlog.root  # List[Task]
-        serialized_backlog = [task.model_dump() for task in backlog_list]
-        
-        console.print("\n[bold green]Generated Plan:[/bold green]")
-        for i, step in enumerate(backlog_list, 1):
-            console.print(f"{i}. {step}\n")        
-
-
-        # Execution Phase
-        console.print("\n[bold blue]Execution Phase[/bold blue]")     
-
-        # Send steps to developer agent
-        workflow_conversation, development_conversation = await developer(serialized_backlog, workflow_conversation, 3)
+        scheduler = BacklogScheduler()
+
+        def start_task(streamed_task) -> None:
+            nonlocal development
+            scheduler.add(streamed_task.model_dump())
+            # The analysis is complete once tasks arrive, so the developer can start now
+            if development is None:
+                console.print("\n[bold blue]Execution Phase[/bold blue]")
+                warmer.enter_phase("developer")
+                development = asyncio.create_task(developer(scheduler, workflow_conversation, 3, checkpoint=checkpoint))
+
+        if state.backlog is not None:
+            # The analysis and backlog finished in an earlier attempt at this run
+            console.print(f"\n[bold blue]Restored the analysis and a backlog of {len(state.backlog)} tasks[/bold blue]")
+            workflow_conversation.extend(state.workflow_conversation)
+            for step in state.backlog:
+                scheduler.add(step)
+            scheduler.close()
+            console.print("\n[bold blue]Execution Phase[/bold blue]")
+            warmer.enter_phase("developer")
+            development = asyncio.create_task(developer(scheduler, workflow_conversation, 3, checkpoint=checkpoint))
+        else:
+            # Task results without a saved backlog belong to a backlog that will be regenerated
+            if state.tasks:
+                checkpoint.discard_tasks()
+
+            # Analysis Phase
+            console.print("\n[bold blue]Analysis Phase[/bold blue]")
+            warmer.enter_phase("backlog" if state.analysis is not None else "analyst")
+
+            # Send task to analyst agent
+            try:
+                workflow_conversation, validated_backlog = await analyze_task(
+                    task, workflow_conversation, on_task=start_task,
+                    analysis=state.analysis, on_analysis=checkpoint.record_analysis
+                )
+
+                backlog_list = validated_backlog.root  # List[Task]
+                checkpoint.record_backlog([step.model_dump() for step in backlog_list], workflow_conversation)
+
+                console.print("\n[bold green]Generated Plan:[/bold green]")
+                for i, step in enumerate(backlog_list, 1):
+                    console.print(f"{i}. {step}\n")
+
+                # Schedule any task the incremental parser could not hand over
+                streamed_ids = {step.get("task_id") for step in scheduler.backlog}
+                for step in backlog_list:
+                    if step.task_id not in streamed_ids:
+                        start_task(step)
+            finally:
+                scheduler.close()
+
+        # Execution Phase: wait for the developer working through the streamed backlog
+        workflow_conversation, development_conversation = await development
 
         console.print(f"[bold green]Development conversation:[/bold green]")
 
         for result in development_conversation:
-            console.print(f"[bold cyan]Role:[/bold cyan] {result['role']}\n[bold green]Content:[/bold green] [dim]{result['content']}[/dim]")
+            console.print(f"[bold cyan]Role:[/bold cyan] {result['role']}\n[bold green]Content:[/bold green] [dim]{result.get('content')}[/dim]")
 
         # Get the summary of the development conversation
+        checkpoint.enter_phase("summary", current_workspace())
+        warmer.enter_phase("summary")
         development_summary = await get_summary(development_conversation)
         workflow_conversation.append({'role': 'assistant', 'content': development_summary})
+        checkpoint.record_summary(development_summary, workflow_conversation, current_workspace())
         
         return workflow_conversation, development_summary
         
     except Exception as e:
         console.print(f"[bold red]Error in workflow:[/bold red] {escape(str(e))}")
+        if development is not None and not development.done():
+            development.cancel()
+
+        raise
 
-        raise 
\ No newline at end of file
+    finally:
+        await warmer.close()
+        # Release the pooled connections to the Ollama server
+        if close_client:
+            await ClientManager.close() 
\ No newline at end of file
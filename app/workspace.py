@@ -0,0 +1,710 @@
+"""
+Workspaces, file cache and change tracking for the file tools.
+"""
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from array import array
+import bisect
+import difflib
+import fnmatch
+import hashlib
+import mmap
+import os
+import re
+import threading
+from pydantic import BaseModel
+
+# Configuration
+FILE_CACHE_MAX_BYTES = int(os.environ.get("BESPOKE_FILE_CACHE_MAX_MB", "64")) * 1024 * 1024  # Cached content before LRU eviction
+INDEX_HASH_MAX_BYTES = 4 * 1024 * 1024  # Larger files are identified by size and mtime instead of a content hash
+MMAP_MIN_BYTES = 1024 * 1024  # Larger files are memory-mapped when indexing their lines
+BINARY_SNIFF_BYTES = 8192  # A NUL byte in this many leading bytes marks a file as binary
+SEARCH_MAX_FILE_BYTES = 1024 * 1024  # Larger files (bundles, generated data) are not searched
+SEARCH_MAX_RESULTS = int(os.environ.get("BESPOKE_SEARCH_MAX_RESULTS", "50"))  # Matching lines returned per search
+INDEX_MAX_TREE_LINES = int(os.environ.get("BESPOKE_INDEX_MAX_TREE_LINES", "300"))  # Cap on rendered tree/delta lines
+STATE_DIR_NAME = ".bespoke"  # Hidden directory in the workspace for logs and other agent state
+COMMAND_CHANGES_SHOWN = 20  # Paths listed per status when summarising what a command changed
+# Directories listed but never descended into
+INDEX_IGNORED_DIRS = {"node_modules", ".git", "__pycache__", ".venv", "venv", ".pytest_cache", ".mypy_cache", ".next"}
+
+
+class FileChange(BaseModel):
+    """A file created, modified or deleted during a tracked step"""
+    path: str
+    status: str  # created, modified or deleted
+    diff: str  # Unified diff, or the full content for created files
+    sha256: Optional[str] = None  # Hash of the new content (None for deleted files)
+
+
+class ChangeTracker:
+    """Records the original content of every file the tools touch while it is active.
+
+    Commands that change files wholesale (npm, pip) are recorded separately, as a
+    summary of the paths they created, modified or deleted.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.originals: Dict[Path, Optional[str]] = {}
+        self.commands: List[str] = []
+
+    def record(self, path: Path) -> None:
+        """Remember a file's content before its first modification."""
+        if path in self.originals:
+            return
+        try:
+            self.originals[path] = path.read_text()
+        except (FileNotFoundError, IsADirectoryError, UnicodeDecodeError):
+            self.originals[path] = None
+
+    def record_command(self, command: str, before: Dict[str, str], after: Dict[str, str]) -> None:
+        """
+        Summarise what a command changed from workspace index snapshots taken around it.
+
+        Args:
+            command: The command, as shown to QA
+            before: WorkspaceIndex.snapshot() taken before the command ran
+            after: WorkspaceIndex.snapshot() taken after it finished
+        """
+        groups = {
+            "created": [path for path in after if path not in before],
+            "modified": [path for path in after if path in before and after[path] != before[path]],
+            "deleted": [path for path in before if path not in after],
+        }
+        parts = []
+        for status, paths in groups.items():
+            if paths:
+                shown = ", ".join(sorted(paths)[:COMMAND_CHANGES_SHOWN])
+                more = f" and {len(paths) - COMMAND_CHANGES_SHOWN} more" if len(paths) > COMMAND_CHANGES_SHOWN else ""
+                parts.append(f"{status} {shown}{more}")
+        self.commands.append(f"{command}: {'; '.join(parts) if parts else 'no files changed'}")
+
+    def changes(self) -> List[FileChange]:
+        """
+        Compare every recorded file with its current content.
+
+        Returns:
+            List[FileChange]: Files whose content differs from when they were first recorded.
+        """
+        changes = []
+        for path, before in self.originals.items():
+            try:
+                after = path.read_text()
+            except (FileNotFoundError, IsADirectoryError, UnicodeDecodeError):
+                after = None
+            if before == after:
+                continue
+
+            try:
+                name = str(path.relative_to(self.root))
+            except ValueError:
+                name = str(path)
+            if before is None:
+                changes.append(FileChange(path=name, status="created", diff=after, sha256=content_hash(after)))
+            elif after is None:
+                changes.append(FileChange(path=name, status="deleted", diff=""))
+            else:
+                diff = difflib.unified_diff(
+                    before.splitlines(keepends=True), after.splitlines(keepends=True),
+                    fromfile=f"a/{name}", tofile=f"b/{name}"
+                )
+                changes.append(FileChange(path=name, status="modified", diff="".join(diff), sha256=content_hash(after)))
+        return changes
+
+
+# Each asyncio task (one per backlog step) sees its own tracker
+_current_tracker = ContextVar("current_tracker", default=None)
+
+
+@contextmanager
+def track_changes(root: Path) -> Iterator[ChangeTracker]:
+    """Track file changes made by tools in the current context (e.g. one backlog step)."""
+    tracker = ChangeTracker(root)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def record_change(path: Path) -> None:
+    """Tell the active tracker, if any, that a tool is about to modify a file."""
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record(path)
+
+
+def record_command_changes(command: str, before: Dict[str, str], after: Dict[str, str]) -> None:
+    """Tell the active tracker, if any, what a command changed (see ChangeTracker.record_command)."""
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record_command(command, before, after)
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of a file's text content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class WorkspaceIndex:
+    """Recursive index of the workspace with sizes and content hashes.
+
+    File tools update it incrementally as they write. Tools that change files
+    wholesale (npm, pip) mark it dirty, and the next refresh re-stats the tree,
+    re-hashing only files whose size or mtime changed. Snapshots of the index can
+    be diffed to report what changed between two points in time.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._files: Dict[str, Tuple[int, int, str]] = {}  # relative path -> (size, mtime_ns, hash)
+        self._dirs: Dict[str, bool] = {}  # relative path -> whether its contents are indexed
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def _relative(self, path: Path) -> Optional[str]:
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _hash_file(path: Path, stat: os.stat_result) -> str:
+        if stat.st_size > INDEX_HASH_MAX_BYTES:
+            return f"size:{stat.st_size}:mtime:{stat.st_mtime_ns}"
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _add_parents(self, relative: str) -> None:
+        parent = Path(relative).parent
+        while parent != Path("."):
+            self._dirs.setdefault(parent.as_posix(), parent.name not in INDEX_IGNORED_DIRS)
+            parent = parent.parent
+
+    def mark_dirty(self) -> None:
+        """Force a rescan on the next refresh (e.g. after a package manager ran)."""
+        self._dirty = True
+
+    def update_file(self, path: Path, digest: Optional[str] = None) -> None:
+        """Record a file the tools just wrote, without rescanning the tree."""
+        relative = self._relative(path)
+        if relative is None:
+            return
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._files.pop(relative, None)
+            return
+        digest = digest or self._hash_file(path, stat)
+        with self._lock:
+            self._files[relative] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._add_parents(relative)
+
+    def add_directory(self, path: Path) -> None:
+        """Record a directory the tools just created."""
+        relative = self._relative(path)
+        if relative and relative != ".":
+            with self._lock:
+                self._dirs[relative] = path.name not in INDEX_IGNORED_DIRS
+                self._add_parents(relative)
+
+    def refresh(self) -> None:
+        """Rescan the tree if it may have changed outside the file tools."""
+        if not self._dirty:
+            return
+        files: Dict[str, Tuple[int, int, str]] = {}
+        dirs: Dict[str, bool] = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name == STATE_DIR_NAME:
+                    continue
+                path = Path(entry.path)
+                relative = self._relative(path)
+                if entry.is_dir(follow_symlinks=False):
+                    indexed = entry.name not in INDEX_IGNORED_DIRS
+                    dirs[relative] = indexed
+                    if indexed:
+                        stack.append(path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    known = self._files.get(relative)
+                    if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                        files[relative] = known
+                    else:
+                        files[relative] = (stat.st_size, stat.st_mtime_ns, self._hash_file(path, stat))
+        with self._lock:
+            self._files, self._dirs = files, dirs
+            self._dirty = False
+
+    def snapshot(self) -> Dict[str, str]:
+        """
+        Capture the current state of the workspace.
+
+        Returns:
+            Dict[str, str]: Relative path to content hash (directories map to '').
+        """
+        self.refresh()
+        with self._lock:
+            state = {path: digest for path, (_, _, digest) in self._files.items()}
+            state.update({f"{path}/": "" for path in self._dirs})
+        return state
+
+    def render_tree(self, path: str = "") -> str:
+        """
+        Render the indexed tree (or a subtree) with file sizes.
+
+        Args:
+            path: Relative directory to render; the whole workspace by default.
+
+        Returns:
+            str: One line per entry, indented by depth.
+        """
+        self.refresh()
+        prefix = path.strip("/")
+        with self._lock:
+            entries = [(p, f"{size} B") for p, (size, _, _) in self._files.items()]
+            entries += [(p, "dir" if indexed else "dir, not indexed") for p, indexed in self._dirs.items()]
+        if prefix:
+            entries = [(p[len(prefix) + 1:], info) for p, info in entries if p.startswith(prefix + "/")]
+        if not entries:
+            return f"Directory '{path or './'}' is empty or does not exist."
+
+        lines = []
+        for relative, info in sorted(entries):
+            depth = relative.count("/")
+            name = relative.rsplit("/", 1)[-1]
+            suffix = "/" if info.startswith("dir") else ""
+            lines.append(f"{'  ' * depth}{name}{suffix} ({info})")
+        return _limit_lines(lines)
+
+    def render_delta(self, since: Dict[str, str]) -> str:
+        """
+        Describe what changed since an earlier snapshot.
+
+        Args:
+            since: Snapshot returned by an earlier call to snapshot().
+
+        Returns:
+            str: Added (+), modified (~) and removed (-) paths.
+        """
+        current = self.snapshot()
+        lines = []
+        for path in sorted(current.keys() | since.keys()):
+            if path not in since:
+                lines.append(f"+ {path}")
+            elif path not in current:
+                lines.append(f"- {path}")
+            elif current[path] != since[path]:
+                lines.append(f"~ {path}")
+        return _limit_lines(lines) if lines else "No changes."
+
+
+def _limit_lines(lines: List[str]) -> str:
+    if len(lines) > INDEX_MAX_TREE_LINES:
+        lines = lines[:INDEX_MAX_TREE_LINES] + [f"... {len(lines) - INDEX_MAX_TREE_LINES} more entries"]
+    return "\n".join(lines)
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _required_literals(pattern: str) -> List[str]:
+    """
+    Literal runs that every match of a regex must contain, for narrowing by trigram.
+
+    Only text outside groups and character classes counts, and a pattern with a
+    top-level alternation yields nothing; returning too little is always safe.
+    """
+    literals, run, depth, i = [], "", 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if depth == 0 and not escaped.isalnum():
+                run += escaped
+                continue
+            literals.append(run)
+            run = ""
+            continue
+        i += 1
+        if char in "*?{":
+            run = run[:-1]  # The preceding character is optional or repeated
+            if char == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+        elif char == "+":
+            pass  # The preceding character still occurs at least once
+        elif char == "[":
+            literals.append(run)
+            run = ""
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif char == "|" and depth == 0:
+            return []
+        elif depth == 0 and char not in ".^$":
+            run += char
+            continue
+        literals.append(run)
+        run = ""
+    literals.append(run)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+class CodeSearchIndex:
+    """Trigram index of the workspace's text files for fast substring and regex search.
+
+    The index follows the WorkspaceIndex: before each search, files whose content hash
+    changed are re-indexed and removed files are dropped, so only edited files are read
+    again. Directories the WorkspaceIndex does not descend into (node_modules, .git,
+    ...), files matched by the root .gitignore, binary files and files over
+    SEARCH_MAX_FILE_BYTES are not indexed.
+    """
+
+    def __init__(self, root: Path, index: WorkspaceIndex):
+        self.root = root
+        self.index = index
+        self._hashes: Dict[str, str] = {}  # relative path -> content hash when indexed
+        self._file_trigrams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}  # trigram -> relative paths containing it
+        self._ignore_patterns: List[str] = []
+        self._lock = threading.Lock()
+
+    def _ignored(self, relative: str) -> bool:
+        parts = relative.split("/")
+        for pattern in self._ignore_patterns:
+            anchored = pattern.startswith("/") or "/" in pattern.rstrip("/")
+            pattern = pattern.strip("/")
+            if anchored:
+                if fnmatch.fnmatch(relative, pattern) or relative.startswith(pattern + "/"):
+                    return True
+            elif any(fnmatch.fnmatch(part, pattern) for part in parts):
+                return True
+        return False
+
+    def _read(self, relative: str) -> Optional[str]:
+        path = self.root / relative
+        try:
+            if path.stat().st_size > SEARCH_MAX_FILE_BYTES:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def _remove(self, relative: str) -> None:
+        for trigram in self._file_trigrams.pop(relative, ()):
+            paths = self._postings.get(trigram)
+            if paths is not None:
+                paths.discard(relative)
+                if not paths:
+                    del self._postings[trigram]
+        self._hashes.pop(relative, None)
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the workspace.
+
+        Returns:
+            int: Number of files (re-)indexed.
+        """
+        snapshot = {path: digest for path, digest in self.index.snapshot().items() if not path.endswith("/")}
+        with self._lock:
+            if snapshot.get(".gitignore") != self._hashes.get(".gitignore"):
+                gitignore = self._read(".gitignore") or ""
+                self._ignore_patterns = [
+                    line.strip() for line in gitignore.splitlines()
+                    if line.strip() and not line.strip().startswith(("#", "!"))
+                ]
+                # Ignore rules changed; every file's eligibility may have too
+                self._hashes = {path: digest for path, digest in self._hashes.items() if path == ".gitignore"}
+
+            for relative in [path for path in self._file_trigrams if path not in snapshot]:
+                self._remove(relative)
+            updated = 0
+            for relative, digest in snapshot.items():
+                if self._hashes.get(relative) == digest:
+                    continue
+                self._remove(relative)
+                self._hashes[relative] = digest
+                content = None if self._ignored(relative) else self._read(relative)
+                if content is None:
+                    continue
+                trigrams = _trigrams(content)
+                self._file_trigrams[relative] = trigrams
+                for trigram in trigrams:
+                    self._postings.setdefault(trigram, set()).add(relative)
+                updated += 1
+            return updated
+
+    def candidates(self, literals: List[str]) -> List[str]:
+        """Indexed files that contain every trigram of the given literals."""
+        with self._lock:
+            trigrams = set().union(*(_trigrams(literal) for literal in literals)) if literals else set()
+            if not trigrams:
+                return sorted(self._file_trigrams)
+            # Intersect the rarest posting lists first
+            postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams), key=len)
+            paths = set(postings[0])
+            for posting in postings[1:]:
+                paths &= posting
+                if not paths:
+                    break
+            return sorted(paths)
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               path: str = "", max_results: int = None) -> Tuple[List[Tuple[str, int, str]], int]:
+        """
+        Find lines matching a query.
+
+        Args:
+            query: Text to find, or a regular expression if regex is set
+            regex: Treat the query as a Python regular expression (matched line by line)
+            case_sensitive: Match case exactly
+            path: Only search under this relative directory (or this file)
+            max_results: Matching lines to return (default BESPOKE_SEARCH_MAX_RESULTS)
+
+        Returns:
+            Tuple[List[Tuple[str, int, str]], int]: Up to max_results (path, line number, line)
+            matches, and the total number of matching lines.
+
+        Raises:
+            re.error: If the regular expression is invalid.
+        """
+        max_results = max_results or SEARCH_MAX_RESULTS
+        flags = 0 if case_sensitive else re.IGNORECASE
+        matcher = re.compile(query if regex else re.escape(query), flags)
+        self.refresh()
+
+        prefix = path.strip("/")
+        matches: List[Tuple[str, int, str]] = []
+        total = 0
+        for relative in self.candidates(_required_literals(query) if regex else [query]):
+            if prefix and relative != prefix and not relative.startswith(prefix + "/"):
+                continue
+            content = self._read(relative)
+            if content is None:
+                continue
+            for number, line in enumerate(content.splitlines(), 1):
+                if matcher.search(line):
+                    total += 1
+                    if len(matches) < max_results:
+                        matches.append((relative, number, line))
+        return matches, total
+
+
+class FileCache:
+    """In-process cache of workspace file contents.
+
+    Entries are validated against the file's mtime, size and inode on every read, so
+    changes made outside the tools (npm, pip, editors) are picked up. Writes go through
+    the cache, which keeps the new content without reading it back.
+    """
+
+    def __init__(self, index: Optional[WorkspaceIndex] = None, max_bytes: int = FILE_CACHE_MAX_BYTES):
+        self.index = index
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Path, Tuple[Tuple[int, int, int], str]]" = OrderedDict()
+        self._size = 0
+        # Byte offset of every line start, for ranged reads without loading the file
+        self._line_offsets: Dict[Path, Tuple[Tuple[int, int, int], array]] = {}
+        # Sync tools run on a thread pool
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> Tuple[int, int, int]:
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _store(self, path: Path, signature: Tuple[int, int, int], content: str) -> None:
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._size -= len(old[1])
+        if len(content) > self.max_bytes:
+            return
+        self._entries[path] = (signature, content)
+        self._size += len(content)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def read(self, path: Path) -> str:
+        """
+        Read a file, serving it from memory if it hasn't changed on disk.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        signature = self._signature(path.stat())
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                return entry[1]
+
+        with open(path, "r") as f:
+            content = f.read()
+        with self._lock:
+            self._store(path, signature, content)
+        return content
+
+    def write(self, path: Path, content: str) -> str:
+        """
+        Write a file and cache its new content.
+
+        Returns:
+            str: SHA-256 of the written content.
+        """
+        record_change(path)
+        with open(path, "w") as f:
+            f.write(content)
+        digest = content_hash(content)
+        with self._lock:
+            self._line_offsets.pop(path, None)
+            self._store(path, self._signature(path.stat()), content)
+        if self.index is not None:
+            self.index.update_file(path, digest)
+        return digest
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Drop one cached file, or everything."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._line_offsets.clear()
+                self._size = 0
+            else:
+                self._line_offsets.pop(path, None)
+                if path in self._entries:
+                    self._size -= len(self._entries.pop(path)[1])
+
+    @staticmethod
+    def is_binary(path: Path) -> bool:
+        """Whether a file looks binary (contains a NUL byte near the start)."""
+        with open(path, "rb") as f:
+            return b"\0" in f.read(BINARY_SNIFF_BYTES)
+
+    def line_offsets(self, path: Path) -> array:
+        """
+        Get the byte offset of every line start, cached until the file changes.
+
+        Files of MMAP_MIN_BYTES or more are scanned through a memory map instead of
+        being read into memory.
+
+        Returns:
+            array: Offsets of each line start followed by the file size, so line n
+            (1-based) spans offsets[n - 1] to offsets[n].
+        """
+        stat = path.stat()
+        signature = self._signature(stat)
+        with self._lock:
+            entry = self._line_offsets.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        offsets = array("q", [0])
+        with open(path, "rb") as f:
+            if stat.st_size >= MMAP_MIN_BYTES:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    offsets.extend(match.end() for match in re.finditer(b"\n", data))
+            else:
+                offsets.extend(match.end() for match in re.finditer(b"\n", f.read()))
+        if offsets[-1] != stat.st_size:
+            offsets.append(stat.st_size)  # Last line has no trailing newline
+        with self._lock:
+            self._line_offsets[path] = (signature, offsets)
+        return offsets
+
+    def read_lines(self, path: Path, start: int, end: int, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Read a range of lines without loading the rest of the file.
+
+        Args:
+            path: File to read
+            start: First line to read (1-based)
+            end: Last line to read (inclusive)
+            max_bytes: Stop before the line that would exceed this many bytes; a single
+                longer line is cut off at max_bytes
+
+        Returns:
+            Tuple[str, int]: The text, and the number of the last line included.
+        """
+        offsets = self.line_offsets(path)
+        start = max(1, start)
+        end = min(end, len(offsets) - 1)
+        if start > end:
+            return "", start - 1
+        begin = offsets[start - 1]
+        if max_bytes is not None and offsets[end] - begin > max_bytes:
+            # Last line that still fits, but always at least the first one
+            end = max(start, bisect.bisect_right(offsets, begin + max_bytes) - 1)
+        length = offsets[end] - begin
+        if max_bytes is not None:
+            length = min(length, max_bytes)
+        return self.read_bytes(path, begin, length), end
+
+    @staticmethod
+    def read_bytes(path: Path, offset: int, length: int) -> str:
+        """Read a byte range of a file as text; invalid UTF-8 (e.g. a cut character) is replaced."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length).decode("utf-8", errors="replace")
+
+
+class Workspace:
+    """Output directory of one workflow run, with its own index and file cache."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.index = WorkspaceIndex(root)
+        self.file_cache = FileCache(self.index)
+        self.search_index = CodeSearchIndex(root, self.index)
+
+    @property
+    def state_dir(self) -> Path:
+        """Hidden directory for logs, telemetry and other agent state."""
+        return self.root / STATE_DIR_NAME
+
+    @property
+    def log_dir(self) -> Path:
+        """Full command logs the model can page through."""
+        return self.state_dir / "logs"
+
+
+# Each workflow run (and every task it starts) sees its own workspace
+_current_workspace = ContextVar("current_workspace", default=None)
+
+
+@contextmanager
+def use_workspace(workspace: Workspace) -> Iterator[Workspace]:
+    """Direct the tools at a workspace for everything run in the current context."""
+    workspace.root.mkdir(parents=True, exist_ok=True)
+    token = _current_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _current_workspace.reset(token)
+
+
+def active_workspace() -> Optional[Workspace]:
+    """The workspace selected with use_workspace in the current context, if any."""
+    return _current_workspace.get()
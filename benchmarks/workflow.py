@@ -0,0 +1,152 @@
+"""
+End-to-end workflow benchmark against the fake Ollama server.
+
+Usage:
+    python -m benchmarks.workflow --tasks 8 --latency 0.05 --output results.json
+"""
+from typing import Any, Dict, List
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+import asyncio
+import json
+import os
+import tempfile
+import time
+import typer
+from app.agents import ClientManager
+from app.agents.cache import CACHE_ENABLED
+from app.tools import ToolRegistry
+from app.workflow import process_workflow
+from app.checkpoint import Checkpoint
+from app.workspace import Workspace
+from .fake_ollama import CallRecord, FakeOllama
+
+app = typer.Typer()
+
+PROMPT = "Build a small Python package with one module per feature."
+
+
+@contextmanager
+def _timed_tools(timings: List[Dict[str, Any]]):
+    """Record the duration of every tool call made through the registry."""
+    original = ToolRegistry.__dict__["call"]
+
+    async def call(cls, name: str, **kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            return await original.__func__(cls, name, **kwargs)
+        finally:
+            timings.append({"tool": name, "duration": time.perf_counter() - started})
+
+    ToolRegistry.call = classmethod(call)
+    try:
+        yield
+    finally:
+        ToolRegistry.call = original
+
+
+@contextmanager
+def _quiet(enabled: bool):
+    """Discard console output while enabled."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
+
+
+def summarize(calls: List[CallRecord], tool_timings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate recorded model and tool calls per workflow phase.
+
+    Args:
+        calls: Requests received by the fake server
+        tool_timings: Tool calls with their durations (all made by the developer phase)
+
+    Returns:
+        Dict[str, Any]: Per-phase call counts, prompt sizes, model time and tool overhead.
+    """
+    phases: Dict[str, Dict[str, Any]] = {}
+    for call in calls:
+        if call.endpoint != "chat":
+            continue
+        phase = phases.setdefault(call.phase, {"calls": 0, "prompt_bytes": [], "model_time": 0.0})
+        phase["calls"] += 1
+        phase["prompt_bytes"].append(call.prompt_bytes)
+        phase["model_time"] += call.duration
+
+    for name, phase in phases.items():
+        sizes = phase.pop("prompt_bytes")
+        phase["prompt_bytes_total"] = sum(sizes)
+        phase["prompt_bytes_mean"] = round(sum(sizes) / len(sizes), 1)
+        phase["prompt_bytes_max"] = max(sizes)
+        phase["prompt_bytes_per_call"] = sizes
+        phase["model_time"] = round(phase["model_time"], 4)
+        phase["tool_calls"] = len(tool_timings) if name == "developer" else 0
+        phase["tool_time"] = round(sum(t["duration"] for t in tool_timings), 4) if name == "developer" else 0.0
+
+    return phases
+
+
+async def run_benchmark(task_count: int = 4, latency: float = 0.0, stream_chunks: int = 8, quiet: bool = True) -> Dict[str, Any]:
+    """
+    Drive process_workflow end to end against a fake Ollama server.
+
+    Args:
+        task_count: Tasks in the scripted backlog
+        latency: Seconds the fake server waits before each chat response
+        stream_chunks: Pieces each streamed response is split into
+        quiet: Suppress the workflow's console output
+
+    Returns:
+        Dict[str, Any]: Machine-readable benchmark results.
+    """
+    tool_timings: List[Dict[str, Any]] = []
+    previous_host = ClientManager.host
+    with FakeOllama(task_count, latency, stream_chunks) as server, tempfile.TemporaryDirectory() as directory:
+        ClientManager.configure(host=server.url)
+        workspace = Workspace(Path(directory) / "output")
+        try:
+            with _timed_tools(tool_timings), _quiet(quiet):
+                started = time.perf_counter()
+                await process_workflow(PROMPT, workspace, checkpoint=Checkpoint.create(PROMPT, workspace, runs_dir=Path(directory) / "runs"))
+                wall_time = time.perf_counter() - started
+            files_written = sum(1 for path in workspace.root.rglob("*.py"))
+        finally:
+            ClientManager.host = previous_host
+
+    chat_calls = [call for call in server.calls if call.endpoint == "chat"]
+    return {
+        "tasks": task_count,
+        "latency": latency,
+        "response_cache": CACHE_ENABLED,
+        "wall_time": round(wall_time, 4),
+        "model_calls": len(chat_calls),
+        "control_calls": len(server.calls) - len(chat_calls),
+        "prompt_bytes_total": sum(call.prompt_bytes for call in chat_calls),
+        "tool_calls": len(tool_timings),
+        "tool_time": round(sum(t["duration"] for t in tool_timings), 4),
+        "files_written": files_written,
+        "phases": summarize(server.calls, tool_timings),
+    }
+
+
+@app.command()
+def main(
+    tasks: int = typer.Option(4, help="Tasks in the scripted backlog"),
+    latency: float = typer.Option(0.0, help="Seconds the fake server waits before each response"),
+    stream_chunks: int = typer.Option(8, help="Pieces each streamed response is split into"),
+    output: Path = typer.Option(None, help="Write the JSON results here instead of stdout"),
+    verbose: bool = typer.Option(False, help="Show the workflow's console output"),
+):
+    """Benchmark the workflow orchestration without real models."""
+    results = asyncio.run(run_benchmark(tasks, latency, stream_chunks, quiet=not verbose))
+    report = json.dumps(results, indent=2)
+    if output:
+        output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    app()
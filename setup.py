@@ -15,7 +15,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/bespoke-dev",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
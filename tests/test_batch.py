@@ -0,0 +1,29 @@
+import asyncio
+import io
+import json
+from app.agents import ClientManager
+from app.batch import read_prompts, run_batch
+from benchmarks.fake_ollama import FakeOllama
+
+
+def test_read_prompts_skips_blank_and_comment_lines():
+    assert read_prompts("-", io.StringIO("first app\n\n# skipped\n  second app \n")) == ["first app", "second app"]
+
+
+def test_batch_runs_each_prompt_in_its_own_workspace(tmp_path):
+    previous_host = ClientManager.host
+    with FakeOllama(task_count=2) as server:
+        ClientManager.configure(host=server.url)
+        try:
+            summary = asyncio.run(run_batch(["app one", "app two", "app three"], workers=2, batch_dir=tmp_path))
+        finally:
+            ClientManager.host = previous_host
+
+    assert summary.runs == 3 and summary.succeeded == 3 and summary.workers == 2
+    assert summary.model_calls == 3 * 9  # analyst, backlog, summary, and 2 developer calls + QA per task
+    for index in (1, 2, 3):
+        run_dir = tmp_path / f"run-{index:03d}"
+        assert sorted(p.name for p in (run_dir / "src").iterdir()) == ["module_1.py", "module_2.py"]
+        assert json.loads((run_dir / ".bespoke" / "result.json").read_text())["succeeded"]
+    assert len((tmp_path / "results.jsonl").read_text().splitlines()) == 3
+    assert json.loads((tmp_path / "summary.json").read_text())["runs"] == 3
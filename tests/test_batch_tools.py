@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+from app.agents.utility import _group_independent_calls
+from app.tools import create_files, read_files, write_files
+from app.workspace import Workspace, use_workspace
+
+
+def test_create_files_reports_each_file(tmp_path):
+    with use_workspace(Workspace(tmp_path)):
+        (tmp_path / "existing.py").write_text("old")
+        result = create_files([
+            {"path": "pkg/a.py", "content": "A = 1\n"},
+            {"path": "existing.py", "content": "new"},
+            {"path": "pkg/b.py", "content": "B = 2\n"},
+        ])
+
+    assert result.startswith("Wrote 2 of 3 files")
+    assert "existing.py: error" in result
+    assert (tmp_path / "pkg" / "a.py").read_text() == "A = 1\n"
+    assert (tmp_path / "existing.py").read_text() == "old"
+
+
+def test_atomic_batch_writes_nothing_when_one_file_is_invalid(tmp_path):
+    with use_workspace(Workspace(tmp_path)):
+        (tmp_path / "keep.py").write_text("old")
+        result = write_files([
+            {"path": "keep.py", "content": "new"},
+            {"path": "pkg", "content": "x"},
+        ], atomic=True)
+        read = read_files(["keep.py", "missing.py"])
+
+    assert result.startswith("Error: No files were written")
+    assert (tmp_path / "keep.py").read_text() == "old"
+    assert not (tmp_path / "pkg").exists()
+    assert "=== keep.py ===\nold" in read
+    assert "=== missing.py (does not exist) ===" in read
+
+
+def test_batched_calls_conflict_on_any_shared_path():
+    def call(name, **arguments):
+        return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+    calls = [
+        call("write_files", files=[{"path": "a.py", "content": ""}, {"path": "b.py", "content": ""}]),
+        call("read_file", path="c.py"),
+        call("read_files", paths=["b.py"]),
+    ]
+    assert [len(group) for group in _group_independent_calls(calls)] == [2, 1]
@@ -0,0 +1,78 @@
+import asyncio
+import sys
+
+import app.tools as tools
+from app.capture import CAPTURE_LINE_CHARS, OutputCapture
+from app.tools import read_log, run_subprocess
+from app.workspace import Workspace, use_workspace
+
+
+def capture_lines(log_path, lines):
+    capture = OutputCapture(log_path, echo=False, head_lines=2, tail_lines=3, error_lines=2)
+    for line in lines:
+        capture.feed(line + "\n")
+    capture.close()
+    return capture
+
+
+def test_overflow_keeps_head_tail_and_error_lines_from_the_middle(tmp_path):
+    lines = [f"line {n}" for n in range(1, 21)]
+    lines[4] = "npm ERR! code ERESOLVE"
+    lines[6] = "error: peer dependency conflict"
+    lines[8] = "build failed"  # Past the error line limit
+    lines[9] = "x" * (CAPTURE_LINE_CHARS + 50)
+    capture = capture_lines(tmp_path / "install.log", lines)
+
+    summary = capture.summary().splitlines()
+    assert summary[:2] == ["1: line 1", "2: line 2"]
+    assert summary[2] == "... 15 lines omitted; error lines among them:"
+    assert summary[3:5] == ["5: npm ERR! code ERESOLVE", "7: error: peer dependency conflict"]
+    assert summary[5:] == ["18: line 18", "19: line 19", "20: line 20"]
+    assert "build failed" not in capture.summary()
+
+    # The log keeps every line whole, including the ones clipped or dropped from the summary
+    logged = (tmp_path / "install.log").read_text().splitlines()
+    assert logged == lines
+
+
+def test_short_output_is_returned_whole(tmp_path):
+    capture = capture_lines(tmp_path / "short.log", ["a", "b", "c"])
+    assert capture.summary() == "1: a\n2: b\n3: c"
+
+
+def test_read_log_pages_through_a_log(tmp_path):
+    workspace = Workspace(tmp_path)
+    capture_lines(workspace.log_dir / "npm-install.log", [f"line {n}" for n in range(1, 21)])
+    with use_workspace(workspace):
+        page = read_log("npm-install.log", start_line=18, max_lines=5)
+        past_end = read_log("npm-install.log", start_line=50)
+        missing = read_log("../npm-missing.log")
+
+    assert page == "Lines 18-20 of 20:\n18: line 18\n19: line 19\n20: line 20"
+    assert past_end == "No lines from 50; the log has 20 lines."
+    assert missing == "Error: Log '../npm-missing.log' does not exist."
+
+
+def test_a_cancelled_command_does_not_leave_the_child_running(tmp_path, monkeypatch):
+    processes = []
+    create = asyncio.create_subprocess_exec
+
+    async def create_and_keep(*args, **kwargs):
+        processes.append(await create(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(tools.asyncio, "create_subprocess_exec", create_and_keep)
+
+    async def main():
+        task = asyncio.ensure_future(run_subprocess([sys.executable, "-c", "import time; time.sleep(30)"]))
+        while not processes:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    with use_workspace(Workspace(tmp_path)):
+        asyncio.run(main())
+    assert processes[0].returncode is not None
@@ -0,0 +1,82 @@
+import asyncio
+from app.agents import ClientManager
+from app.checkpoint import Checkpoint
+from app.workflow import process_workflow, resume_workflow
+from app.workspace import Workspace
+from benchmarks.fake_ollama import FakeOllama
+
+
+def _phases(server):
+    phases = {}
+    for call in server.calls:
+        if call.endpoint == "chat":
+            phases[call.phase] = phases.get(call.phase, 0) + 1
+    return phases
+
+
+def test_resume_skips_finished_phases_and_passed_tasks(tmp_path):
+    workspace = Workspace(tmp_path / "output")
+    previous_host = ClientManager.host
+    try:
+        with FakeOllama(task_count=3) as server:
+            ClientManager.configure(host=server.url)
+            checkpoint = Checkpoint.create("app", workspace, runs_dir=tmp_path / "runs")
+            asyncio.run(process_workflow("app", workspace, checkpoint=checkpoint))
+
+        state = Checkpoint.load(str(checkpoint.directory)).state
+        assert state.phase == "done" and state.summary
+        assert len(state.backlog) == 3
+        assert all(task.status == "passed" for task in state.tasks.values())
+
+        # Pretend the run was interrupted before its last task finished
+        last_task = state.backlog[-1]["task_id"]
+        del checkpoint.state.tasks[last_task]
+        checkpoint.state.summary = None
+        checkpoint.enter_phase("execution")
+
+        with FakeOllama(task_count=3) as server:
+            ClientManager.configure(host=server.url)
+            conversation, summary = asyncio.run(resume_workflow(str(checkpoint.directory)))
+    finally:
+        ClientManager.host = previous_host
+
+    # Only the missing task is developed and checked again
+    assert _phases(server) == {"developer": 2, "qa": 1, "summary": 1}
+    assert summary
+    assert set(Checkpoint.load(str(checkpoint.directory)).state.tasks) == {step["task_id"] for step in state.backlog}
+
+
+def test_tool_call_only_turns_are_saved_with_content(tmp_path):
+    from ollama import Message
+
+    call = Message.ToolCall(function=Message.ToolCall.Function(name="read_file", arguments={"path": "a.py"}))
+    messages = [{"role": "user", "content": "Complete this task: {}"}, Message(role="assistant", tool_calls=[call])]
+    checkpoint = Checkpoint.create("app", Workspace(tmp_path), runs_dir=tmp_path / "runs")
+    checkpoint.record_task({"task_id": "T1"}, messages)
+
+    saved = Checkpoint.load(str(checkpoint.directory)).state.tasks["T1"].messages
+    assert saved[1]["content"] == "" and saved[1]["tool_calls"][0]["function"]["name"] == "read_file"
+
+
+def test_workspace_is_hashed_at_phase_boundaries_and_unrequested_runs_write_nothing(tmp_path, monkeypatch):
+    from app import checkpoint as checkpoint_module
+
+    hashed = []
+    hash_workspace = checkpoint_module.workspace_hash
+    monkeypatch.setattr(checkpoint_module, "workspace_hash", lambda workspace: hashed.append(workspace) or hash_workspace(workspace))
+    monkeypatch.setattr("app.workflow.CHECKPOINT_RUNS", False)
+    monkeypatch.chdir(tmp_path)
+    previous_host = ClientManager.host
+    try:
+        with FakeOllama(task_count=4) as server:
+            ClientManager.configure(host=server.url)
+            checkpoint = Checkpoint.create("app", Workspace(tmp_path / "saved"), runs_dir=tmp_path / "saved-runs")
+            asyncio.run(process_workflow("app", Workspace(tmp_path / "saved"), checkpoint=checkpoint))
+            asyncio.run(process_workflow("app", Workspace(tmp_path / "unsaved")))
+    finally:
+        ClientManager.host = previous_host
+
+    # Entering the summary phase and finishing, not once per task
+    assert len(hashed) == 2
+    assert len(Checkpoint.load(str(checkpoint.directory)).state.tasks) == 4
+    assert not (tmp_path / "runs").exists()
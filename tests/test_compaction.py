@@ -0,0 +1,58 @@
+import json
+from ollama import Message
+from app.agents.compaction import CompactionPolicy, compact_conversation, TASK_PREFIX, WORKSPACE_PREFIX
+
+
+def make_step(task_id, outcome="QA PASSED"):
+    return [
+        {'role': 'system', 'content': f"{WORKSPACE_PREFIX}\n+ app.py"},
+        {'role': 'user', 'content': TASK_PREFIX + json.dumps({'task_id': task_id, 'task_description': f"Build {task_id}"})},
+        Message(role='assistant', content='Writing the file', tool_calls=[
+            Message.ToolCall(function=Message.ToolCall.Function(name='write_file', arguments={'path': 'app.py', 'content': 'x'}))
+        ]),
+        {'role': 'tool', 'content': 'Successfully wrote to app.py', 'name': 'write_file'},
+        {'role': 'assistant', 'content': outcome},
+    ]
+
+
+def test_finished_steps_collapse_into_digests():
+    conversation = [{'role': 'system', 'content': 'PROMPT'}] + make_step('SC-01') + make_step('FE-01', 'QA FAILED: missing tests')
+    step_start = len(conversation)
+    conversation += make_step('DOC-01')
+
+    compacted = compact_conversation(conversation, step_start, CompactionPolicy())
+
+    assert compacted[0] == {'role': 'system', 'content': 'PROMPT'}
+    digest = compacted[1]['content']
+    assert "SC-01: Build SC-01 | tools: write_file(app.py) | QA PASSED" in digest
+    assert "FE-01" in digest and "QA FAILED: missing tests" in digest
+    assert compacted[2:] == conversation[step_start:]
+    assert len(conversation) == step_start + 5
+
+
+def test_stale_tool_outputs_are_truncated():
+    conversation = [{'role': 'system', 'content': 'PROMPT'}]
+    conversation += [{'role': 'tool', 'content': str(i) * 1000} for i in range(3)]
+    policy = CompactionPolicy(keep_tool_outputs=1, stale_tool_output_chars=10)
+
+    compacted = compact_conversation(conversation, 1, policy)
+
+    assert [len(m['content']) < 100 for m in compacted[1:]] == [True, True, False]
+
+
+def test_prefix_is_stable_while_step_grows():
+    conversation = [{'role': 'system', 'content': 'PROMPT'}, {'role': 'user', 'content': TASK_PREFIX + '{}'}]
+    volatile = [{'role': 'system', 'content': f"{WORKSPACE_PREFIX} + app.py"}]
+    policy = CompactionPolicy(keep_tool_outputs=2, stale_tool_output_chars=10)
+
+    sent = []
+    for i in range(5):
+        conversation.append({'role': 'tool', 'content': str(i) * 1000})
+        sent.append(compact_conversation(conversation, 1, policy, volatile))
+
+    assert all(messages[-1] == volatile[0] for messages in sent)
+    # Without the volatile tail, each request extends the previous one until a block of results is truncated
+    assert sent[1][:-2] == sent[0][:-1]
+    assert sent[2][:-2] == sent[1][:-1]
+    assert sent[3][2]['content'] != sent[2][2]['content']
+    assert sent[4][:-2] == sent[3][:-1]
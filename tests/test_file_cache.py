@@ -0,0 +1,60 @@
+import os
+
+from app.tools import edit_file, write_file
+from app.workspace import FileCache, Workspace, use_workspace
+
+
+def test_outside_writes_are_picked_up(tmp_path):
+    path = tmp_path / "app.py"
+    path.write_text("x = 1\n")
+    cache = FileCache()
+    assert cache.read(path) == "x = 1\n"
+
+    path.write_text("x = 100\n")  # New size
+    assert cache.read(path) == "x = 100\n"
+
+    stat = path.stat()
+    path.write_text("x = 200\n")  # Same size, only the mtime moves
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.read(path) == "x = 200\n"
+
+
+def test_replacing_the_file_invalidates_the_entry(tmp_path):
+    path, replacement = tmp_path / "app.py", tmp_path / "app.py.new"
+    path.write_text("old\n")
+    cache = FileCache()
+    assert cache.read(path) == "old\n"
+
+    # Same size and mtime, so only the inode tells the files apart
+    stat = path.stat()
+    replacement.write_text("new\n")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, path)
+    assert cache.read(path) == "new\n"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = {name: tmp_path / name for name in ("a.txt", "b.txt", "c.txt", "big.txt")}
+    for name, path in paths.items():
+        path.write_text("x" * (20 if name == "big.txt" else 4))
+    cache = FileCache(max_bytes=10)
+
+    cache.read(paths["a.txt"])
+    cache.read(paths["b.txt"])
+    cache.read(paths["a.txt"])  # Now b is the least recently used
+    cache.read(paths["c.txt"])
+    cache.read(paths["big.txt"])  # Larger than the whole cache, so never stored
+
+    assert list(cache._entries) == [paths["a.txt"], paths["c.txt"]]
+    assert cache._size == 8
+
+
+def test_tool_writes_keep_the_new_content(tmp_path):
+    with use_workspace(Workspace(tmp_path)) as workspace:
+        cache = workspace.file_cache
+        write_file("app.py", "# begin\nold\n# end\n")
+        assert cache._entries[tmp_path / "app.py"][1] == "# begin\nold\n# end\n"
+
+        edit_file("app.py", "# begin", "# end", "new")
+        assert cache._entries[tmp_path / "app.py"][1] == "# begin\nnew\n# end\n"
+        assert cache.read(tmp_path / "app.py") == (tmp_path / "app.py").read_text()
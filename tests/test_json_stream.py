@@ -0,0 +1,40 @@
+import json
+from app.agents.json_stream import JsonArrayStreamParser
+
+TASKS = [
+    {"task_id": "T1", "task_description": "Use {braces} and [brackets] in strings", "dependencies": []},
+    {"task_id": "T2", "task_description": 'Escaped \\"quotes\\" and a backslash \\\\', "dependencies": ["T1"]},
+    {"task_id": "T3", "task_description": "Nested", "acceptance_criteria": [["a", "b"], {"c": [1, 2]}], "dependencies": ["T1", "T2"]},
+]
+
+
+def feed_in_pieces(text, size):
+    parser = JsonArrayStreamParser()
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start:start + size]))
+    return elements
+
+
+def test_elements_are_returned_whatever_the_chunking():
+    text = json.dumps(TASKS)
+    for size in (1, 2, 7, len(text)):
+        assert [json.loads(element) for element in feed_in_pieces(text, size)] == TASKS
+
+
+def test_array_wrapped_in_an_object():
+    text = json.dumps({"note": "[not the array]", "tasks": TASKS, "after": [{"ignored": True}]})
+    assert [json.loads(element) for element in feed_in_pieces(text, 1)] == TASKS
+
+
+def test_each_element_is_returned_as_soon_as_it_closes():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('[{"task_id": "T1"}, {"task_id": ') == ['{"task_id": "T1"}']
+    assert parser.feed('"T2"}') == ['{"task_id": "T2"}']
+
+
+def test_a_truncated_final_element_is_never_returned():
+    text = json.dumps(TASKS)
+    truncated = text[:text.index('"T3"') + 10]
+    elements = feed_in_pieces(truncated, 1)
+    assert [json.loads(element)["task_id"] for element in elements] == ["T1", "T2"]
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+from app.agents import models
+from app.agents.models import ModelPlan, ModelWarmer
+from app.agents.request_scheduler import Priority, get_request_scheduler
+
+
+class FakeClient:
+    def __init__(self, loaded, sizes):
+        self.loaded = loaded
+        self.sizes = sizes
+        self.calls = []
+
+    async def ps(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=m, size=self.sizes.get(m)) for m in self.loaded])
+
+    async def list(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=m, size=s) for m, s in self.sizes.items()])
+
+    async def generate(self, model, keep_alive=None, options=None):
+        self.calls.append((model, keep_alive))
+
+
+def warm_up(monkeypatch, client, phase, available, busy_with=None):
+    monkeypatch.setattr(models, "get_client", lambda: client)
+    monkeypatch.setattr(models, "available_memory", lambda: available)
+    plan = ModelPlan(analyst="phi4", backlog="coder", developer="coder", qa="coder", summary="qwen2.5")
+
+    async def run():
+        scheduler = get_request_scheduler()
+        if busy_with:
+            await scheduler.acquire(busy_with, Priority.DEVELOPER)
+        warmer = ModelWarmer(plan, enabled=True)
+        warmer.enter_phase(phase)
+        await asyncio.gather(*warmer._pending)
+        return scheduler
+
+    return asyncio.run(run())
+
+
+def test_preloads_next_model_and_unloads_finished_ones(monkeypatch):
+    client = FakeClient(loaded=["phi4:latest", "coder:latest"], sizes={"phi4:latest": 9, "coder:latest": 9, "qwen2.5:latest": 5})
+
+    scheduler = warm_up(monkeypatch, client, "developer", available=100 * 1024 ** 3)
+
+    assert client.calls[0] == ("phi4:latest", 0)
+    assert client.calls[1][0] == "qwen2.5"
+    assert client.calls[1][1] != 0
+    assert scheduler._in_flight["qwen2.5"] == 0
+
+
+def test_skips_preload_without_enough_memory(monkeypatch):
+    client = FakeClient(loaded=["phi4:latest"], sizes={"phi4:latest": 9, "coder:latest": 9 * 1024 ** 3})
+
+    warm_up(monkeypatch, client, "analyst", available=4 * 1024 ** 3)
+
+    assert client.calls == []
+
+
+def test_skips_preload_while_another_model_holds_the_server(monkeypatch):
+    client = FakeClient(loaded=["coder:latest"], sizes={"coder:latest": 9, "qwen2.5:latest": 5})
+
+    warm_up(monkeypatch, client, "developer", available=100 * 1024 ** 3, busy_with="coder")
+
+    assert client.calls == []
@@ -1,3 +1,4 @@
+import asyncio
 from app.tools import ToolRegistry
 from pathlib import Path
 import shutil
@@ -26,7 +27,7 @@ def test_npm_commands():
     
     for cmd in commands:
         print(f"\nTesting command: {cmd}")
-        result = run_npm(cmd)
+        result = asyncio.run(run_npm(cmd))
         print(f"Result:\n{result}")
         print("-" * 60)
 
@@ -40,7 +41,7 @@ def test_npm_commands():
     
     for cmd in blocked_commands:
         print(f"\nTesting blocked command: {cmd}")
-        result = run_npm(cmd)
+        result = asyncio.run(run_npm(cmd))
         print(f"Result:\n{result}")
         print("-" * 60)
 
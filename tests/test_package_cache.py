@@ -0,0 +1,137 @@
+import asyncio
+import json
+from app.package_cache import NpmStore, VenvPool, produced_items
+from app.tools import run_npm, run_pip
+from app.workspace import Workspace, use_workspace
+
+MANIFEST = json.dumps({"name": "demo", "dependencies": {"left-pad": "1.3.0"}})
+
+
+def make_project(root):
+    root.mkdir()
+    (root / "package.json").write_text(MANIFEST)
+    return root
+
+
+def test_restored_node_modules_are_independent_of_the_store(tmp_path):
+    store = NpmStore(tmp_path / "store")
+    first = make_project(tmp_path / "first")
+    args = ["npm", "install"]
+    key = store.key(first, args)
+    (first / "node_modules" / "left-pad").mkdir(parents=True)
+    (first / "node_modules" / "left-pad" / "index.js").write_text("module.exports = pad;\n")
+    (first / "package-lock.json").write_text("{}")
+    store.save(key, first, produced_items(args, [], first), "npm install")
+
+    second = make_project(tmp_path / "second")
+    assert store.key(second, args) == key
+    assert store.key(second, ["npm", "install", "react"]) != key
+    assert store.key(second, ["npm", "run", "build"]) is None
+    assert store.restore(key, second) == ["package.json", "package-lock.json", "node_modules"]
+    restored = second / "node_modules" / "left-pad" / "index.js"
+    assert restored.read_text() == "module.exports = pad;\n"
+
+    # npm and install scripts rewrite files in place; neither the store nor other restores may see it
+    restored.write_text("patched by postinstall\n")
+    third = make_project(tmp_path / "third")
+    store.restore(key, third)
+    assert (third / "node_modules" / "left-pad" / "index.js").read_text() == "module.exports = pad;\n"
+    assert (first / "node_modules" / "left-pad" / "index.js").read_text() == "module.exports = pad;\n"
+
+
+def test_run_npm_uses_the_store_instead_of_npm(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.package_cache.NPM_STORE_DIR", tmp_path / "store")
+    store = NpmStore()
+    source = make_project(tmp_path / "source")
+    (source / "node_modules" / "left-pad").mkdir(parents=True)
+    (source / "node_modules" / "left-pad" / "index.js").write_text("")
+    store.save(store.key(source, ["npm", "install"]), source, ["node_modules"], "npm install")
+
+    workspace = Workspace(make_project(tmp_path / "workspace"))
+    with use_workspace(workspace):
+        result = asyncio.run(run_npm("npm install"))
+
+    assert result.startswith("npm was not run")
+    assert (workspace.root / "node_modules" / "left-pad" / "index.js").exists()
+
+
+def make_venv(root):
+    (root / "bin").mkdir(parents=True)
+    (root / "bin" / "python").write_text("")
+    (root / "bin" / "pip").write_text(f"#!{root}/bin/python\n")
+    site_packages = root / "lib" / "python3" / "site-packages" / "tinypkg"
+    site_packages.mkdir(parents=True)
+    (site_packages / "__init__.py").write_text("VALUE = 1\n")
+    return root
+
+
+def test_pooled_venvs_are_checked_out_relocated(tmp_path):
+    pool = VenvPool(tmp_path / "pool")
+    built = make_venv(tmp_path / "first" / ".venv")
+    pool.record(built, ["tinypkg"])
+    pool.save(pool.key(["TinyPkg"]), built)
+
+    venv = tmp_path / "second" / ".venv"
+    assert not pool.checkout(pool.key(["other"]), venv)
+    assert pool.checkout(pool.key(["tinypkg"]), venv)
+    assert (venv / "bin" / "pip").read_text() == f"#!{venv}/bin/python\n"
+    assert pool.installed(venv) == ["tinypkg"]
+
+    # An upgrade in one checkout rewrites package files in place; the pool must not change
+    module = "lib/python3/site-packages/tinypkg/__init__.py"
+    (venv / module).write_text("VALUE = 2\n")
+    other = tmp_path / "third" / ".venv"
+    assert pool.checkout(pool.key(["tinypkg"]), other)
+    assert (other / module).read_text() == "VALUE = 1\n"
+    assert (built / module).read_text() == "VALUE = 1\n"
+
+    with use_workspace(Workspace(tmp_path / "second")):
+        assert asyncio.run(run_pip("install", "tinypkg")).startswith("pip was not run")
+
+
+def fake_pip(monkeypatch, pool):
+    import app.tools as tools
+
+    calls = []
+
+    async def run_venv_pip(pool, venv, args):
+        calls.append(args)
+        return tools.CommandResult(returncode=0, output="", log_id="pip.log")
+
+    monkeypatch.setattr(tools, "VenvPool", lambda: pool)
+    monkeypatch.setattr(tools, "_run_venv_pip", run_venv_pip)
+    return calls
+
+
+def test_installs_from_files_are_not_recorded_and_stop_pooling(tmp_path, monkeypatch):
+    pool = VenvPool(tmp_path / "pool")
+    calls = fake_pip(monkeypatch, pool)
+    venv = make_venv(tmp_path / "app" / ".venv")
+    pool.record(venv, ["tinypkg"])
+
+    with use_workspace(Workspace(tmp_path / "app")):
+        asyncio.run(run_pip("install", "-r requirements.txt"))
+        assert pool.installed(venv) == ["tinypkg"] and not pool.is_poolable(venv)
+
+        # The same options run pip again, and later installs are neither pooled nor replaced by a pooled venv
+        asyncio.run(run_pip("install", "-r requirements.txt"))
+        asyncio.run(run_pip("install", "otherpkg"))
+    assert sum(args[0] == "install" for args in calls) == 3
+    assert pool.installed(venv) == ["otherpkg", "tinypkg"] and not pool.is_poolable(venv)
+    assert not (pool.root / "venvs").exists()
+
+
+def test_offline_install_is_skipped_without_a_matching_wheel(tmp_path, monkeypatch):
+    from app.tools import _install_from_wheelhouse
+
+    pool = VenvPool(tmp_path / "pool")
+    calls = fake_pip(monkeypatch, pool)
+    venv = tmp_path / ".venv"
+
+    asyncio.run(_install_from_wheelhouse(pool, venv, ["Tiny.Pkg>=1.0"]))
+    assert [args[0] for args in calls] == ["wheel", "install"]
+
+    calls.clear()
+    (pool.wheelhouse / "tiny_pkg-1.0-py3-none-any.whl").write_bytes(b"")
+    asyncio.run(_install_from_wheelhouse(pool, venv, ["Tiny.Pkg>=1.0"]))
+    assert [args[0] for args in calls] == ["install"]
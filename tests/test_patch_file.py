@@ -0,0 +1,52 @@
+from app.tools import patch_file
+from app.workspace import Workspace, use_workspace
+
+SOURCE = "".join(f"line {i}\n" for i in range(1, 41))
+
+
+def test_hunks_apply_together_and_return_only_the_changed_region(tmp_path):
+    (tmp_path / "module.py").write_text(SOURCE)
+    with use_workspace(Workspace(tmp_path)):
+        result = patch_file("module.py", hunks=[
+            {"search": "line 3\n", "replace": "line three\n"},
+            {"search": "line 30\n", "replace": "line thirty\nline thirty-one\n"},
+        ])
+
+    assert result.startswith("Applied 2 hunks to module.py")
+    assert "+line three" in result and "+line thirty-one" in result
+    assert "line 15" not in result
+    content = (tmp_path / "module.py").read_text()
+    assert "line three\n" in content and "line thirty\nline thirty-one\nline 31\n" in content
+
+
+def test_any_bad_hunk_leaves_the_file_unchanged(tmp_path):
+    (tmp_path / "module.py").write_text(SOURCE)
+    with use_workspace(Workspace(tmp_path)):
+        result = patch_file("module.py", hunks=[
+            {"search": "line 5\n", "replace": "line five\n"},
+            {"search": "missing", "replace": "x"},
+            {"search": "line 1", "replace": "x"},
+        ])
+
+    assert result.startswith("Error: No changes were made")
+    assert "hunk 2: search text not found" in result
+    assert "hunk 3: search text matches" in result
+    assert (tmp_path / "module.py").read_text() == SOURCE
+
+
+def test_unified_diff_applies_at_the_matching_lines(tmp_path):
+    (tmp_path / "module.py").write_text(SOURCE)
+    diff = (
+        "--- a/module.py\n"
+        "+++ b/module.py\n"
+        "@@ -19,3 +19,3 @@\n"  # Stated line numbers are slightly off
+        " line 20\n"
+        "-line 21\n"
+        "+line twenty-one\n"
+        " line 22\n"
+    )
+    with use_workspace(Workspace(tmp_path)):
+        result = patch_file("module.py", diff=diff)
+
+    assert result.startswith("Applied 1 hunk to module.py")
+    assert (tmp_path / "module.py").read_text() == SOURCE.replace("line 21\n", "line twenty-one\n")
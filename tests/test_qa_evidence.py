@@ -0,0 +1,70 @@
+import asyncio
+import json
+from app.agents.qa_agent import build_evidence_packet
+from app.package_cache import NpmStore
+from app.tools import create_file, run_npm, write_file
+from app.workspace import Workspace, track_changes, use_workspace
+
+TASK = {"task_id": "T1", "task_description": "Add a greeting", "acceptance_criteria": ["greet() returns 'hi'", "README mentions greet"]}
+
+
+def test_packet_has_criteria_diffs_and_the_steps_tool_results(tmp_path):
+    (tmp_path / "app.py").write_text("def greet():\n    return 'hello'\n")
+    with use_workspace(Workspace(tmp_path)), track_changes(tmp_path) as tracker:
+        write_file("app.py", "def greet():\n    return 'hi'\n")
+        create_file("README.md", "Call greet().\n")
+        changes = tracker.changes()
+
+    messages = [
+        {"role": "user", "content": "Complete this task: ..."},
+        {"role": "tool", "name": "write_file", "content": "File written successfully"},
+        {"role": "system", "content": "The previous tool call failed: Error executing read_file: missing"},
+        {"role": "assistant", "content": "Done."},
+    ]
+    packet = build_evidence_packet(TASK, changes, messages)
+
+    assert "Task T1: Add a greeting" in packet
+    assert "- greet() returns 'hi'\n- README mentions greet" in packet
+    assert "=== app.py (modified) ===" in packet and "-    return 'hello'\n+    return 'hi'" in packet
+    assert "=== README.md (created) ===\nCall greet()." in packet
+    assert "[write_file] File written successfully" in packet
+    assert "[error] The previous tool call failed" in packet
+    assert "Done." not in packet
+
+
+def test_each_step_tracks_only_its_own_changes(tmp_path):
+    async def step(name):
+        with track_changes(tmp_path) as tracker:
+            await asyncio.sleep(0)
+            write_file(f"{name}.py", name)
+            await asyncio.sleep(0)
+            return [change.path for change in tracker.changes()]
+
+    async def main():
+        return await asyncio.gather(step("a"), step("b"))
+
+    with use_workspace(Workspace(tmp_path)):
+        assert asyncio.run(main()) == [["a.py"], ["b.py"]]
+
+
+def test_package_manager_changes_reach_the_packet(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.package_cache.NPM_STORE_DIR", tmp_path / "store")
+    manifest = json.dumps({"name": "demo", "dependencies": {"left-pad": "1.3.0"}})
+    source = tmp_path / "source"
+    (source / "node_modules" / "left-pad").mkdir(parents=True)
+    (source / "node_modules" / "left-pad" / "index.js").write_text("")
+    (source / "package.json").write_text(manifest)
+    store = NpmStore()
+    key = store.key(source, ["npm", "install"])
+    (source / "package-lock.json").write_text("{}")
+    store.save(key, source, ["package-lock.json", "node_modules"], "npm install")
+
+    workspace = Workspace(tmp_path / "workspace")
+    workspace.root.mkdir()
+    (workspace.root / "package.json").write_text(manifest)
+    with use_workspace(workspace), track_changes(workspace.root) as tracker:
+        asyncio.run(run_npm("npm install"))
+
+    assert tracker.commands == ["npm install: created node_modules/, package-lock.json"]
+    packet = build_evidence_packet(TASK, tracker.changes(), [], tracker.commands)
+    assert "Changes made by commands during this step:\n- npm install: created node_modules/, package-lock.json" in packet
@@ -0,0 +1,27 @@
+from app import workspace as workspace_module
+from app.tools import read_file
+from app.workspace import Workspace, use_workspace
+
+
+def test_large_files_are_capped_and_paged_by_line(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.tools.READ_FILE_MAX_BYTES", 100)
+    monkeypatch.setattr(workspace_module, "MMAP_MIN_BYTES", 0)
+    (tmp_path / "big.txt").write_text("".join(f"line {i:03d}\n" for i in range(1, 101)))
+    with use_workspace(Workspace(tmp_path)):
+        first = read_file("big.txt")
+        page = read_file("big.txt", start_line=50, end_line=52)
+        tail = read_file("big.txt", start_line=99)
+
+    assert first.startswith("line 001\n") and "line 012" not in first
+    assert "[Showing lines 1-11 of 100. Use start_line=12 to read more.]" in first
+    assert page == "line 050\nline 051\nline 052\n[Showing lines 50-52 of 100. Use start_line=53 to read more.]"
+    assert tail == "line 099\nline 100\n[Showing lines 99-100 of 100.]"
+
+
+def test_byte_ranges_and_binary_files(tmp_path):
+    (tmp_path / "data.txt").write_text("0123456789")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00")
+    with use_workspace(Workspace(tmp_path)):
+        assert read_file("data.txt", offset=2, length=3) == "234\n[Bytes 2-5 of 10. Use offset=5 to read more.]"
+        assert "appears to be binary" in read_file("image.png")
+        assert read_file("data.txt") == "0123456789"
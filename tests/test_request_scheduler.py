@@ -0,0 +1,149 @@
+import asyncio
+from app.agents.request_scheduler import ModelRequestScheduler, Priority
+
+
+def run_requests(scheduler, requests, hold=0.01):
+    """Start every (model, priority) request at once and return the order they were served in."""
+    served = []
+
+    async def request(model, priority):
+        await scheduler.acquire(model, priority)
+        served.append(model)
+        await asyncio.sleep(hold)
+        scheduler.release(model)
+
+    async def main():
+        await asyncio.gather(*(request(model, priority) for model, priority in requests))
+
+    asyncio.run(main())
+    return served
+
+
+def test_same_model_requests_are_batched():
+    scheduler = ModelRequestScheduler(max_resident=1, concurrency=2, batch_size=10)
+    requests = [("coder", Priority.DEVELOPER), ("phi4", Priority.ANALYST)] * 3
+
+    served = run_requests(scheduler, requests)
+
+    assert served == ["coder"] * 3 + ["phi4"] * 3
+    assert scheduler.swaps == 1
+
+
+def test_priority_picks_next_model_and_batch_size_prevents_starvation():
+    scheduler = ModelRequestScheduler(max_resident=1, concurrency=1, batch_size=2)
+    requests = [("coder", Priority.DEVELOPER)] * 4 + [("phi4", Priority.ANALYST), ("qwen", Priority.QA)]
+
+    served = run_requests(scheduler, requests)
+
+    # coder yields after two requests; QA outranks the waiting analyst work
+    assert served[:3] == ["coder", "coder", "qwen"]
+    assert served.count("coder") == 4 and "phi4" in served
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = ModelRequestScheduler(max_resident=1, concurrency=1)
+
+    async def main():
+        await scheduler.acquire("coder")
+        waiter = asyncio.ensure_future(scheduler.acquire("phi4"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release("coder")
+        await asyncio.wait_for(scheduler.acquire("coder"), 1)
+
+    asyncio.run(main())
+
+
+def test_requests_without_a_priority_are_served_after_workflow_phases():
+    assert Priority.NORMAL is not Priority.DEVELOPER
+    scheduler = ModelRequestScheduler(max_resident=1, concurrency=1, batch_size=1)
+    requests = [("busy", Priority.QA), ("other", Priority.NORMAL), ("coder", Priority.DEVELOPER)]
+
+    assert run_requests(scheduler, requests)[1:] == ["coder", "other"]
+
+def test_chat_timeout_excludes_time_queued_for_the_model():
+    from app.agents import ClientManager, chat
+    from app.agents.request_scheduler import get_request_scheduler
+    from benchmarks.fake_ollama import FakeOllama
+
+    async def main():
+        scheduler = get_request_scheduler()
+        request = dict(model="coder", messages=[{"role": "user", "content": "plan"}], options={"temperature": 0.5})
+
+        # Another model holds the only resident slot for longer than the timeout
+        await scheduler.acquire("phi4", Priority.ANALYST)
+        asyncio.get_running_loop().call_later(0.5, scheduler.release, "phi4")
+        response = await chat(**request, timeout=0.4)
+
+        try:
+            await chat(**request, timeout=0.05)
+        except asyncio.TimeoutError:
+            timed_out = True
+        else:
+            timed_out = False
+        await ClientManager.close()
+        return response, timed_out, scheduler
+
+    previous_host = ClientManager.host
+    with FakeOllama(latency=0.2) as server:
+        ClientManager.configure(host=server.url)
+        try:
+            response, timed_out, scheduler = asyncio.run(main())
+        finally:
+            ClientManager.host = previous_host
+
+    assert response.message.content
+    assert timed_out
+    assert not scheduler._in_flight.get("coder")
+
+
+def test_closing_the_client_releases_its_pooled_connections():
+    from app.agents import ClientManager, chat
+    from benchmarks.fake_ollama import FakeOllama
+
+    async def main():
+        await chat(model="coder", messages=[{"role": "user", "content": "plan"}])
+        transport = ClientManager._transport
+        opened = len(transport._pool.connections)
+        await ClientManager.close()
+        return opened, len(transport._pool.connections)
+
+    previous_host = ClientManager.host
+    with FakeOllama() as server:
+        ClientManager.configure(host=server.url)
+        try:
+            opened, remaining = asyncio.run(main())
+        finally:
+            ClientManager.host = previous_host
+
+    assert opened == 1 and remaining == 0
+    assert ClientManager._client is None and ClientManager._transport is None
+
+
+def test_a_stream_abandoned_early_frees_its_slot():
+    from app.agents import ClientManager, chat
+    from app.agents.client import closing_stream
+    from app.agents.request_scheduler import get_request_scheduler
+    from benchmarks.fake_ollama import FakeOllama
+
+    async def main():
+        scheduler = get_request_scheduler()
+        stream = await chat(model="coder", messages=[{"role": "user", "content": "plan"}], stream=True)
+        try:
+            async with closing_stream(stream):
+                async for chunk in stream:
+                    raise ValueError("consumer failed")
+        except ValueError:
+            pass
+        in_flight = scheduler._in_flight["coder"]
+        await ClientManager.close()
+        return in_flight
+
+    previous_host = ClientManager.host
+    with FakeOllama(stream_chunks=4) as server:
+        ClientManager.configure(host=server.url)
+        try:
+            assert asyncio.run(main()) == 0
+        finally:
+            ClientManager.host = previous_host
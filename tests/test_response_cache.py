@@ -0,0 +1,78 @@
+import os
+import time
+from ollama import ChatResponse, Message
+from app.agents.cache import ResponseCache
+
+
+def make_request(content, temperature=0):
+    return {
+        "model": "qwen2.5",
+        "messages": [{"role": "user", "content": content}],
+        "options": {"temperature": temperature, "num_ctx": 16384},
+    }
+
+
+def make_response(content):
+    return ChatResponse(model="qwen2.5", done=True, message=Message(role="assistant", content=content))
+
+
+def test_key_ignores_message_representation(tmp_path):
+    as_dict = make_request("hello")
+    as_message = dict(as_dict, messages=[Message(role="user", content="hello")])
+
+    assert ResponseCache.make_key(as_dict) == ResponseCache.make_key(as_message)
+    assert ResponseCache.make_key(as_dict) != ResponseCache.make_key(make_request("hello!"))
+
+
+def test_round_trip_and_temperature_bypass(tmp_path):
+    cache = ResponseCache(tmp_path)
+    request = make_request("hello")
+    key = cache.make_key(request)
+
+    assert cache.get(key) is None
+    cache.put(key, make_response("hi"))
+
+    assert cache.get(key).message.content == "hi"
+    assert cache.is_cacheable(request)
+    assert not cache.is_cacheable(make_request("hello", temperature=0.3))
+    assert not cache.is_cacheable({"model": "qwen2.5", "messages": []})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(tmp_path, max_entries=2)
+    keys = [cache.make_key(make_request(str(i))) for i in range(3)]
+
+    for age, key in zip((30, 20), keys[:2]):
+        cache.put(key, make_response(key))
+        os.utime(cache._path(key), (time.time() - age, time.time() - age))
+    cache.get(keys[0])
+    cache.put(keys[2], make_response(keys[2]))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    key = cache.make_key(make_request("hello"))
+    cache.put(key, make_response("hi"))
+    time.sleep(0.01)
+
+    assert cache.get(key) is None
+
+
+def test_writes_only_scan_the_cache_when_a_limit_is_exceeded(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path, max_entries=5)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+
+    for i in range(5):
+        cache.put(cache.make_key(make_request(str(i))), make_response(str(i)))
+    assert len(scans) == 1  # Only the first write, to learn the totals
+
+    cache.put(cache.make_key(make_request("5")), make_response("5"))
+    assert len(scans) == 2
+    assert len(list(tmp_path.glob("*/*.json"))) == 5
+    assert not list(tmp_path.glob("*/*.tmp*"))
@@ -0,0 +1,85 @@
+import asyncio
+from app.agents.scheduler import BacklogScheduler
+
+
+def make_task(task_id, dependencies=()):
+    return {"task_id": task_id, "task_description": task_id, "task_dependencies": list(dependencies)}
+
+
+def run_backlog(backlog, max_concurrency):
+    started, running, peak = [], set(), [0]
+
+    async def run_task(i, step):
+        started.append(step["task_id"])
+        running.add(step["task_id"])
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.01)
+        for dependency in step["task_dependencies"]:
+            assert dependency not in running
+        running.discard(step["task_id"])
+
+    asyncio.run(BacklogScheduler(backlog, max_concurrency).run(run_task))
+    return started, peak[0]
+
+
+def test_independent_tasks_run_concurrently():
+    backlog = [make_task("SC-01"), make_task("DOC-01"), make_task("FE-01", ["SC-01"])]
+    started, peak = run_backlog(backlog, 3)
+
+    assert started.index("FE-01") > started.index("SC-01")
+    assert peak == 2
+
+
+def test_concurrency_limit_is_respected():
+    backlog = [make_task(f"T-{i}") for i in range(5)]
+    _, peak = run_backlog(backlog, 2)
+
+    assert peak == 2
+
+
+def test_cycles_and_unknown_ids_fall_back_to_serial():
+    cyclic = [make_task("A", ["B"]), make_task("B", ["A"]), make_task("C")]
+    unknown = [make_task("A"), make_task("B", ["Z"]), make_task("C")]
+
+    assert BacklogScheduler(cyclic).build_graph() is None
+    assert BacklogScheduler(unknown).build_graph() is None
+    for backlog in (cyclic, unknown):
+        started, peak = run_backlog(backlog, 4)
+        assert started == ["A", "B", "C"]
+        assert peak == 1
+
+
+def test_streamed_tasks_start_before_the_backlog_closes():
+    events = []
+
+    async def run_task(i, step):
+        events.append(f"start {step['task_id']}")
+        await asyncio.sleep(0.01)
+
+    async def main():
+        scheduler = BacklogScheduler(max_concurrency=2)
+        running = asyncio.create_task(scheduler.run(run_task))
+        scheduler.add(make_task("SC-01"))
+        await asyncio.sleep(0.005)
+        events.append("added FE-01")
+        scheduler.add(make_task("FE-01", ["SC-01", "LATE-01"]))
+        scheduler.add(make_task("LATE-01"))
+        scheduler.close()
+        await running
+
+    asyncio.run(main())
+
+    assert events[:2] == ["start SC-01", "added FE-01"]
+    assert events.index("start FE-01") > events.index("start LATE-01")
+
+
+def test_tasks_naming_the_same_file_do_not_overlap():
+    backlog = [
+        dict(make_task("API-01"), task_description="Add a route to src/app.py"),
+        dict(make_task("API-02"), acceptance_criteria=["src/app.py serves /health"]),
+        dict(make_task("DOC-01"), task_description="Write README.md"),
+    ]
+    started, peak = run_backlog(backlog, 3)
+
+    assert peak == 2
+    assert started == ["API-01", "DOC-01", "API-02"]
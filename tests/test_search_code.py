@@ -0,0 +1,42 @@
+from app.tools import search_code, write_file
+from app.workspace import Workspace, use_workspace
+
+
+def test_literal_and_regex_search_follow_edits(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "models.py").write_text("class User(Model):\n    name = 'user'\n")
+    (tmp_path / "src" / "views.py").write_text("from .models import User\n\ndef show(user):\n    return User\n")
+    (tmp_path / "node_modules" / "dep").mkdir(parents=True)
+    (tmp_path / "node_modules" / "dep" / "index.js").write_text("class User {}\n")
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "bundle.js").write_text("class User {}\n")
+    (tmp_path / ".gitignore").write_text("dist/\n")
+
+    with use_workspace(Workspace(tmp_path)):
+        literal = search_code("User")
+        regex = search_code(r"^class\s+User\(", regex=True, case_sensitive=True)
+        write_file("src/admin.py", "class AdminUser(User):\n    pass\n")
+        after_write = search_code("AdminUser")
+        scoped = search_code("User", path="src/views.py")
+
+    assert literal.splitlines() == [
+        "src/models.py:1: class User(Model):",
+        "src/models.py:2: name = 'user'",
+        "src/views.py:1: from .models import User",
+        "src/views.py:3: def show(user):",
+        "src/views.py:4: return User",
+    ]
+    assert regex == "src/models.py:1: class User(Model):"
+    assert after_write == "src/admin.py:1: class AdminUser(User):"
+    assert all(line.startswith("src/views.py:") for line in scoped.splitlines())
+
+
+def test_results_are_capped_and_bad_patterns_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.workspace.SEARCH_MAX_RESULTS", 2)
+    (tmp_path / "data.txt").write_text("match\n" * 5)
+    with use_workspace(Workspace(tmp_path)):
+        capped = search_code("match")
+        invalid = search_code("(unclosed", regex=True)
+
+    assert capped.splitlines()[-1].startswith("... 3 more matches not shown")
+    assert invalid.startswith("Error: Invalid regular expression")
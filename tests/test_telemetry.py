@@ -0,0 +1,36 @@
+import asyncio
+from ollama import ChatResponse, Message
+from app.telemetry import collect_telemetry, record_model_call, record_tool_call, telemetry_tags, set_telemetry_tags
+
+
+def test_records_are_tagged_and_aggregated():
+    response = ChatResponse(
+        model="coder", done=True, message=Message(role="assistant", content="ok"),
+        prompt_eval_count=200, eval_count=50, prompt_eval_duration=2 * 10 ** 9, eval_duration=5 * 10 ** 9, load_duration=10 ** 9,
+    )
+
+    async def step(task_id):
+        with telemetry_tags(agent="developer", task_id=task_id):
+            for attempt in (1, 2):
+                set_telemetry_tags(attempt=attempt)
+                record_model_call("coder", response, 8.0)
+                record_tool_call("write_file", 0.5, error=attempt == 1)
+
+    async def run():
+        with collect_telemetry() as telemetry:
+            await asyncio.gather(step("T-01"), step("T-02"))
+            record_model_call("coder", response, 0.0, cached=True)
+        record_model_call("coder", response, 1.0)  # Outside the run: not collected
+        return telemetry
+
+    telemetry = asyncio.run(run())
+    report = telemetry.report()
+
+    developer = next(m for m in report["models"] if m["agent"] == "developer")
+    assert developer["calls"] == 4 and developer["prompt_tokens"] == 800
+    assert developer["prompt_tokens_per_second"] == 100.0
+    assert developer["generation_tokens_per_second"] == 10.0
+    assert next(m for m in report["models"] if m["agent"] == "")["cached_calls"] == 1
+    assert report["tasks"]["T-01"]["attempts"] == 2
+    assert report["tools"]["write_file"] == {"calls": 4, "errors": 2, "seconds": 2.0, "max_seconds": 0.5}
+    assert 'bespoke_tool_calls_total{tool="write_file"} 4' in telemetry.to_prometheus()
@@ -0,0 +1,61 @@
+import asyncio
+import importlib
+import pytest
+from ollama import ChatResponse, Message
+from app.agents import ContextBudgetExceeded, TokenCounter
+from app.agents.tokens import DEFAULT_CHARS_PER_TOKEN, MESSAGE_OVERHEAD, NUM_CTX, check_context_budget
+from app.agents.compaction import TASK_PREFIX, CompactionPolicy
+from app.workspace import Workspace, use_workspace
+
+developer_module = importlib.import_module("app.agents.developer")
+utility_module = importlib.import_module("app.agents.utility")
+
+
+def test_counts_fall_back_to_chars_per_token_without_a_tokenizer():
+    model = "no-tokenizer-model"
+    assert not TokenCounter.is_exact(model)
+    assert TokenCounter.count_text("", model) == 0
+    assert TokenCounter.count_text("x" * 70, model) == int(70 / DEFAULT_CHARS_PER_TOKEN) + 1
+    messages = [{"role": "user", "content": "x" * 70}]
+    assert TokenCounter.count_request(model, messages) == TokenCounter.count_text("user\n" + "x" * 70, model) + MESSAGE_OVERHEAD
+
+
+def test_budget_check_sets_num_ctx_and_rejects_oversized_requests():
+    request = {"model": "no-tokenizer-model", "messages": [{"role": "user", "content": "hello"}], "options": {"temperature": 0}}
+    assert check_context_budget(request) > 0
+    assert request["options"] == {"temperature": 0, "num_ctx": NUM_CTX}
+
+    oversized = {"model": "no-tokenizer-model", "messages": [{"role": "user", "content": "x" * 10000}], "options": {"num_ctx": 2048}}
+    with pytest.raises(ContextBudgetExceeded, match="num_ctx=2048"):
+        check_context_budget(oversized)
+
+
+def test_developer_turn_is_retried_with_a_tighter_policy(tmp_path, monkeypatch):
+    sent = []
+
+    async def chat(**request):
+        sent.append(request["messages"])
+        if len(sent) == 1:
+            raise ContextBudgetExceeded("too long")
+        return ChatResponse(message=Message(role="assistant", content="Done."))
+
+    monkeypatch.setattr(developer_module, "chat", chat)
+    conversation = [{"role": "user", "content": f"{TASK_PREFIX}{{}}"}]
+    conversation += [{"role": "tool", "content": "y" * 1000, "name": "read_file"} for _ in range(4)]
+    with use_workspace(Workspace(tmp_path)):
+        asyncio.run(developer_module._tool_loop(conversation, 0, 0, CompactionPolicy(keep_tool_outputs=4)))
+
+    assert len(sent) == 2
+    assert sum(len(m["content"]) for m in sent[1]) < sum(len(m["content"]) for m in sent[0])
+
+
+def test_summary_degrades_instead_of_failing(monkeypatch):
+    async def chat(**request):
+        raise ContextBudgetExceeded("too long")
+
+    monkeypatch.setattr(utility_module, "chat", chat)
+    messages = [{"role": "user", "content": TASK_PREFIX + '{"task_id": "T1", "task_description": "Build it"}'},
+                {"role": "assistant", "content": "QA PASSED"}]
+    summary = asyncio.run(utility_module.get_summary(messages))
+
+    assert "T1: Build it" in summary and "QA PASSED" in summary
@@ -0,0 +1,73 @@
+import asyncio
+import importlib
+from ollama import ChatResponse, Message
+from app.workspace import Workspace, use_workspace
+from app.tools import current_workspace
+
+# app.agents re-exports the developer function under the module's name
+developer_module = importlib.import_module("app.agents.developer")
+
+
+def _scripted_chat(responses, calls):
+    async def chat(**kwargs):
+        calls.append(kwargs)
+        return responses[min(len(calls), len(responses)) - 1]
+    return chat
+
+
+def _tool_turn(path):
+    call = Message.ToolCall(function=Message.ToolCall.Function(name="write_file", arguments={"path": path, "content": "x = 1\n"}))
+    return ChatResponse(message=Message(role="assistant", content="", tool_calls=[call]), prompt_eval_count=100, eval_count=20)
+
+
+def _run_loop(tmp_path, monkeypatch, responses):
+    calls = []
+    monkeypatch.setattr(developer_module, "chat", _scripted_chat(responses, calls))
+    conversation = [{"role": "user", "content": "task"}]
+    with use_workspace(Workspace(tmp_path)):
+        conversation = asyncio.run(developer_module._tool_loop(conversation, 0, 0))
+    return calls, conversation
+
+
+def test_loop_stops_when_a_turn_makes_no_tool_calls(tmp_path, monkeypatch):
+    done = ChatResponse(message=Message(role="assistant", content="Done."))
+    calls, conversation = _run_loop(tmp_path, monkeypatch, [_tool_turn("a.py"), _tool_turn("b.py"), done])
+
+    assert len(calls) == 3
+    assert (tmp_path / "a.py").exists() and (tmp_path / "b.py").exists()
+    # Later turns see the earlier tool calls and their results
+    assert any(getattr(message, "tool_calls", None) for message in calls[-1]["messages"])
+    assert conversation[-1].content == "Done."
+
+
+def test_loop_stops_at_the_turn_and_token_caps(tmp_path, monkeypatch):
+    monkeypatch.setattr(developer_module, "MAX_STEP_TURNS", 3)
+    calls, _ = _run_loop(tmp_path, monkeypatch, [_tool_turn("a.py")])
+    assert len(calls) == 3
+
+    monkeypatch.setattr(developer_module, "MAX_STEP_TOKENS", 200)  # Each turn uses 120
+    calls, _ = _run_loop(tmp_path, monkeypatch, [_tool_turn("a.py")])
+    assert len(calls) == 2
+
+
+def test_the_tree_is_sent_once_and_each_step_gets_a_delta(tmp_path, monkeypatch):
+    views, prefixes = {}, {}
+
+    async def develop_step(step, conversation, max_retries, compaction_policy, workspace_view):
+        views[step["task_id"]] = workspace_view
+        prefixes[step["task_id"]] = [m["content"] for m in conversation]
+        (tmp_path / f"{step['task_id']}.py").write_text("")
+        current_workspace().index.mark_dirty()
+        return conversation
+
+    monkeypatch.setattr(developer_module, "develop_step", develop_step)
+    (tmp_path / "existing.py").write_text("")
+    backlog = [{"task_id": "T1", "dependencies": []}, {"task_id": "T2", "dependencies": ["T1"]}]
+    with use_workspace(Workspace(tmp_path)):
+        asyncio.run(developer_module.developer(backlog, {}))
+
+    tree = [c for c in prefixes["T1"] if c.startswith(developer_module.WORKSPACE_TREE_PREFIX)]
+    assert len(tree) == 1 and "existing.py" in tree[0]
+    assert prefixes["T2"][:len(prefixes["T1"])] == prefixes["T1"]
+    assert views["T1"].endswith("No changes.")
+    assert "+ T1.py" in views["T2"] and "existing.py" not in views["T2"]
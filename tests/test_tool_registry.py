@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+from ollama import ChatResponse, Message
+
+from app.agents.utility import handle_tool_call
+from app.tools import ToolRegistry
+from app.workspace import record_change, track_changes
+
+
+def _isolate_registry(monkeypatch):
+    monkeypatch.setattr(ToolRegistry, "_tools", dict(ToolRegistry._tools))
+
+
+def _response(*calls):
+    tool_calls = [Message.ToolCall(function=Message.ToolCall.Function(name=name, arguments=arguments)) for name, arguments in calls]
+    return ChatResponse(message=Message(role="assistant", content="", tool_calls=tool_calls))
+
+
+def test_sync_tools_run_off_the_loop_with_the_callers_context(tmp_path, monkeypatch):
+    _isolate_registry(monkeypatch)
+    threads = []
+
+    @ToolRegistry.register(name="touch", input_schema={"path": {"type": "string"}})
+    def touch(path: str) -> str:
+        threads.append(threading.get_ident())
+        record_change(tmp_path / path)
+        return "done"
+
+    async def main():
+        with track_changes(tmp_path) as tracker:
+            result = await ToolRegistry.call("touch", path="a.py")
+        return result, tracker
+
+    result, tracker = asyncio.run(main())
+    assert result == "done"
+    assert threads and threads[0] != threading.get_ident()
+    assert list(tracker.originals) == [tmp_path / "a.py"]
+
+
+def test_coroutine_tools_are_awaited(monkeypatch):
+    _isolate_registry(monkeypatch)
+
+    @ToolRegistry.register(name="later", input_schema={"value": {"type": "integer"}})
+    async def later(value: int) -> int:
+        await asyncio.sleep(0)
+        return value * 2
+
+    assert asyncio.run(ToolRegistry.call("later", value=21)) == 42
+
+
+def test_independent_calls_overlap_and_results_keep_call_order(monkeypatch):
+    _isolate_registry(monkeypatch)
+    events = []
+
+    async def run(call_id: str, delay: float) -> str:
+        events.append(f"start {call_id}")
+        await asyncio.sleep(delay)
+        events.append(f"end {call_id}")
+        return call_id
+
+    @ToolRegistry.register(name="probe", input_schema={"id": {"type": "string"}, "path": {"type": "string"}, "delay": {"type": "number"}})
+    async def probe(id: str, path: str, delay: float = 0) -> str:
+        return await run(id, delay)
+
+    @ToolRegistry.register(name="install", input_schema={"id": {"type": "string"}}, exclusive=True)
+    async def install(id: str) -> str:
+        return await run(id, 0)
+
+    response = _response(
+        ("probe", {"id": "1", "path": "a.py", "delay": 0.05}),
+        ("probe", {"id": "2", "path": "b.py"}),
+        ("probe", {"id": "3", "path": "a.py"}),  # Same path as 1, so it waits
+        ("install", {"id": "4"}),
+        ("probe", {"id": "5", "path": "c.py"}),
+    )
+    conversation = asyncio.run(handle_tool_call(response, []))
+
+    assert [m["content"] for m in conversation] == ["1", "2", "3", "4", "5"]
+    assert events == [
+        "start 1", "start 2", "end 2", "end 1",
+        "start 3", "end 3",
+        "start 4", "end 4",
+        "start 5", "end 5",
+    ]
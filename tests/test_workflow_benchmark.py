@@ -0,0 +1,18 @@
+import asyncio
+import json
+from benchmarks.workflow import run_benchmark
+
+
+def test_workflow_runs_end_to_end_against_fake_server():
+    results = asyncio.run(run_benchmark(task_count=3))
+
+    phases = results["phases"]
+    assert set(phases) == {"analyst", "backlog", "developer", "qa", "summary"}
+    # One tool call and a follow-up per task, then one QA check each
+    assert phases["developer"]["calls"] == 6
+    assert phases["developer"]["tool_calls"] == 3
+    assert phases["qa"]["calls"] == 3
+    assert results["files_written"] == 3
+    assert results["model_calls"] == sum(phase["calls"] for phase in phases.values())
+    assert all(size > 0 for size in phases["developer"]["prompt_bytes_per_call"])
+    json.dumps(results)